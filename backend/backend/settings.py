@@ -13,8 +13,9 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 import os
 from pathlib import Path
 from urllib.parse import urlparse
-import nltk
-nltk.data.path.append('/home/codesandesh/nltk_data')
+# Extra NLTK data directory; read by nltk when it is first imported, so
+# settings don't pay for importing it.
+os.environ.setdefault('NLTK_DATA', '/home/codesandesh/nltk_data')
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -119,6 +120,114 @@ CELERY_BEAT_SCHEDULE = {
     },
 }
 
+# Search
+# Default page size of a search, and the largest ?limit= / ?offset= accepted
+SEARCH_RESULTS_LIMIT = 50
+SEARCH_MAX_RESULTS_LIMIT = 100
+SEARCH_MAX_RESULTS_OFFSET = 1000
+# Characters of abstract returned by ?fields=...,snippet
+SEARCH_SNIPPET_LENGTH = 200
+# MaxScore early termination in the inverted-index engine (exact top-k)
+SEARCH_EARLY_TERMINATION = True
+# Default ranking when a search doesn't pass ?ranking=: 'tfidf' or 'bm25'
+SEARCH_RANKING = 'tfidf'
+# BM25F: term-frequency saturation, and per-field weight and length
+# normalization (b=0 ignores field length, b=1 normalizes fully)
+SEARCH_BM25_K1 = 1.2
+SEARCH_BM25_FIELDS = {
+    'title': {'weight': 2.0, 'b': 0.75},
+    'abstract': {'weight': 1.0, 'b': 0.75},
+}
+# Seconds to coalesce Publication changes before applying them to the index
+SEARCH_INDEX_UPDATE_DEBOUNCE = 30
+# Text analysis shared by index builds and queries: 'nltk' or 'regex'
+SEARCH_TOKENIZER = 'nltk'
+SEARCH_STEM_CACHE_SIZE = 100_000
+# Processes used to analyze the corpus during full builds (None = all cores)
+SEARCH_INDEX_BUILD_PROCESSES = None
+# Rows fetched per round trip while streaming publications into a build
+SEARCH_INDEX_BUILD_CHUNK_SIZE = 2000
+# On-disk, memory-mapped index segments shared by all workers on a host
+# (set to None to rely on the cache payload only)
+SEARCH_INDEX_DIR = BASE_DIR / 'search_index'
+SEARCH_INDEX_KEEP_SEGMENTS = 2
+# Build a missing index in a background thread when a server process starts
+SEARCH_INDEX_WARMUP_ON_STARTUP = True
+SEARCH_INDEX_BUILD_LOCK_TIMEOUT = 30 * 60
+# Seconds a search waits for another process's first-ever build
+SEARCH_INDEX_COLD_START_WAIT = 10
+# XFetch beta: >1 refreshes the cached index earlier before it expires
+SEARCH_INDEX_REFRESH_BETA = 1.0
+# Search metrics: per-phase latency histograms and index build counters,
+# exposed at /metrics. When off, the search path skips all timing.
+SEARCH_METRICS_ENABLED = True
+# Let clients send "X-Search-Profile: 1" to get the phase breakdown of a
+# search back in a Server-Timing header
+SEARCH_PROFILE_HEADER_ENABLED = True
+# Authors returned by ?facets=authors, most publications among the matches first
+SEARCH_AUTHOR_FACET_SIZE = 10
+# Type-ahead suggestions (/api/search/suggest/): default and maximum
+# suggestions per request, minimum document frequency for a term to be
+# suggested, and prefixes of up to SEARCH_SUGGEST_TOP_PREFIX_LENGTH
+# characters matching at least SEARCH_SUGGEST_TOP_MIN_RANGE entries get
+# their best suggestions precomputed at build time
+SEARCH_SUGGEST_LIMIT = 8
+SEARCH_SUGGEST_MAX_LIMIT = 20
+SEARCH_SUGGEST_MIN_TERM_DF = 2
+SEARCH_SUGGEST_TOP_PREFIX_LENGTH = 3
+SEARCH_SUGGEST_TOP_MIN_RANGE = 1000
+# Query result cache: in-process LRU entries and shared (Redis) tier TTL in
+# seconds; 0 disables the respective tier
+SEARCH_RESULT_CACHE_SIZE = 1024
+SEARCH_RESULT_CACHE_TIMEOUT = 60 * 60
+
+# Scraping
+# 'http' fetches server-rendered pages with a pooled HTTP client and only
+# falls back to Selenium for pages that do not parse; 'selenium' always
+# drives Firefox
+SCRAPE_BACKEND = 'http'
+# Selenium: page load timeout (s) of every pooled browser, detail retries
+# per link with exponential backoff starting at SCRAPE_RETRY_BACKOFF
+# seconds, and pages per browser before it is replaced
+SCRAPE_PAGE_TIMEOUT = 45
+SCRAPE_DETAIL_MAX_RETRIES = 2
+SCRAPE_RETRY_BACKOFF = 2.0
+SCRAPE_DRIVER_RECYCLE_AFTER = 100
+# Browser pool kept warm in each worker process: idle browsers kept, and
+# maximum browser age in seconds before it is replaced
+SCRAPE_DRIVER_POOL_SIZE = 8
+SCRAPE_DRIVER_MAX_AGE = 30 * 60
+# geckodriver binary; when unset it is resolved by webdriver_manager once
+# and the result cached in SCRAPE_DRIVER_PATH_CACHE
+SCRAPE_GECKODRIVER_PATH = os.environ.get('GECKODRIVER_PATH')
+SCRAPE_DRIVER_PATH_CACHE = BASE_DIR / '.geckodriver_path.json'
+# 'eager' stops waiting at DOMContentLoaded; the scraper only reads the DOM
+SCRAPE_PAGE_LOAD_STRATEGY = 'eager'
+# Any of 'images', 'fonts', 'css', 'media'
+SCRAPE_BLOCK_RESOURCES = ('images', 'fonts', 'media')
+# Publications upserted per bulk statement/transaction by run_full_scrape
+SCRAPE_PERSIST_CHUNK_SIZE = 500
+# Pipeline: listing items waiting for detail workers / results waiting for
+# the writer before producers block, and records saved per writer batch
+SCRAPE_QUEUE_SIZE = 200
+SCRAPE_WRITE_BATCH_SIZE = 100
+# Minimum seconds between progress updates published to the task state
+SCRAPE_PROGRESS_INTERVAL = 2.0
+# Incremental scrapes: stop the listing after this many already-stored links
+# in a row, skip detail pages scraped less than SCRAPE_RECHECK_AFTER seconds
+# ago and re-index only publications whose content changed
+SCRAPE_INCREMENTAL = True
+SCRAPE_KNOWN_RUN_STOP = 100
+SCRAPE_RECHECK_AFTER = 30 * 24 * 60 * 60
+# Distributed scrapes: run_full_scrape becomes a group of listing shards
+# followed by a chord of detail batches, spread over every Celery worker.
+# The rate limit applies per worker (Celery syntax, e.g. '30/m'; None = off)
+SCRAPE_DISTRIBUTED = False
+SCRAPE_LISTING_SHARD_PAGES = 5
+SCRAPE_DETAIL_BATCH_SIZE = 50
+SCRAPE_DETAIL_BATCH_RATE_LIMIT = None
+SCRAPE_LINK_CLAIM_TIMEOUT = 30 * 60
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
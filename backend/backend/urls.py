@@ -16,8 +16,11 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from core.views import MetricsView
 
 urlpatterns = [
+    # Conventional Prometheus path; also served as /api/metrics/
+    path('metrics', MetricsView.as_view(), name='prometheus-metrics'),
     path('admin/', admin.site.urls),
     path('api/', include('core.urls')),
     path('api-auth/', include('rest_framework.urls'))
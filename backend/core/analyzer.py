@@ -0,0 +1,147 @@
+# core/analyzer.py
+import os
+import re
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Runs of letters/digits only; the same tokens word_tokenize + isalnum() keeps
+# for ordinary prose, without NLTK's sentence splitting.
+WORD_RE = re.compile(r"[^\W_]+", flags=re.UNICODE)
+
+# Below this many documents a process pool costs more than it saves
+MIN_PARALLEL_DOCS = 2000
+
+
+def ensure_nltk_resources():
+    """Download NLTK resources if not already present."""
+    import nltk
+    try:
+        nltk.data.find('corpora/stopwords')
+        nltk.data.find('tokenizers/punkt_tab')
+    except LookupError:
+        logger.info("Downloading NLTK stopwords and punkt")
+        nltk.download('stopwords', quiet=True)
+        nltk.download('punkt', quiet=True)
+
+
+class Analyzer:
+    """Lower-case, tokenize, drop stop words and Porter-stem text.
+
+    Stems are memoized in a bounded LRU cache: abstracts share most of their
+    vocabulary, so after warm-up almost every token is a cache hit.
+    ``tokenizer`` is either ``'nltk'`` (word_tokenize) or ``'regex'``.
+    """
+
+    def __init__(self, tokenizer: str = 'nltk', stem_cache_size: int = 100_000):
+        if tokenizer not in ('nltk', 'regex'):
+            raise ValueError(f"Unknown tokenizer: {tokenizer}")
+        ensure_nltk_resources()
+        from nltk.corpus import stopwords
+        from nltk.stem import PorterStemmer
+
+        self.tokenizer = tokenizer
+        self.stem_cache_size = stem_cache_size
+        self.stop_words = frozenset(stopwords.words('english'))
+        self.stem = lru_cache(maxsize=stem_cache_size)(PorterStemmer().stem)
+
+    def tokenize(self, text: str) -> List[str]:
+        text = text.lower()
+        if self.tokenizer == 'regex':
+            return WORD_RE.findall(text)
+        from nltk.tokenize import word_tokenize
+        return [token for token in word_tokenize(text) if token.isalnum()]
+
+    def analyze(self, text: str) -> List[str]:
+        stem, stop_words = self.stem, self.stop_words
+        return [stem(token) for token in self.tokenize(text or '') if token not in stop_words]
+
+    __call__ = analyze
+
+    def snippet(self, text: str, terms: Iterable[str], length: int = 200) -> str:
+        """About ``length`` characters of ``text`` starting near the first word whose stem is a query term."""
+        text = text or ''
+        if len(text) <= length:
+            return text
+        terms = set(terms)
+        start = 0
+        for match in WORD_RE.finditer(text):
+            word = match.group().lower()
+            if word not in self.stop_words and self.stem(word) in terms:
+                # A little leading context, cut at a word boundary
+                start = max(match.start() - length // 4, 0)
+                if start:
+                    space = text.find(' ', start, match.start())
+                    start = space + 1 if space >= 0 else match.start()
+                break
+        end = start + length
+        if end < len(text):
+            space = text.rfind(' ', start, end)
+            end = space if space > start else end
+        return ('...' if start else '') + text[start:end].strip() + ('...' if end < len(text) else '')
+
+    def analyze_iter(self, texts: Iterable[str], processes: Optional[int] = None,
+                     chunk_size: int = 500, total: Optional[int] = None) -> Iterator[List[str]]:
+        """Lazily analyze a stream of texts, preserving order.
+
+        In pool mode at most ``processes * chunk_size`` texts are in flight at
+        once, so memory stays bounded however long the stream is. ``total``
+        (when known) lets small corpora skip the pool start-up cost.
+        """
+        processes = processes or os.cpu_count() or 1
+        # Celery prefork children are daemonic and may not spawn processes
+        if (processes <= 1 or (total is not None and total < MIN_PARALLEL_DOCS)
+                or multiprocessing.current_process().daemon):
+            for text in texts:
+                yield self.analyze(text)
+            return
+
+        logger.info(f"Analyzing documents with {processes} processes")
+        texts = iter(texts)
+        # Spawned (not forked) workers never inherit the streaming DB cursor
+        with ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(self.tokenizer, self.stem_cache_size),
+        ) as executor:
+            while True:
+                batch = list(islice(texts, processes * chunk_size))
+                if not batch:
+                    break
+                yield from executor.map(_analyze_in_worker, batch, chunksize=chunk_size)
+
+    def cache_info(self):
+        return self.stem.cache_info()
+
+
+# ---------------------- Process Pool Workers ----------------------
+
+_worker_analyzer: Optional[Analyzer] = None
+
+
+def _init_worker(tokenizer: str, stem_cache_size: int):
+    global _worker_analyzer
+    _worker_analyzer = Analyzer(tokenizer, stem_cache_size)
+
+
+def _analyze_in_worker(text: str) -> List[str]:
+    return _worker_analyzer.analyze(text)
+
+
+_default_analyzer: Optional[Analyzer] = None
+
+
+def get_analyzer() -> Analyzer:
+    """Process-wide analyzer configured from settings, shared by indexing and search."""
+    global _default_analyzer
+    if _default_analyzer is None:
+        _default_analyzer = Analyzer(settings.SEARCH_TOKENIZER, settings.SEARCH_STEM_CACHE_SIZE)
+    return _default_analyzer
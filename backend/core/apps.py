@@ -1,32 +1,82 @@
 from django.apps import AppConfig
+import os
+import sys
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
+def _is_management_command() -> bool:
+    """True for manage.py commands other than runserver (migrate, shell, ...)."""
+    return os.path.basename(sys.argv[0]) == 'manage.py' and sys.argv[1:2] != ['runserver']
+
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
 
     def ready(self):
-        # Avoid circular imports by importing inside ready()
-        from django.core.cache import cache
-        from django.db.models.signals import post_save, post_delete
-        from .models import Publication
-        from .utils import build_tfidf_and_index
+        # Keep ready() cheap: no cache/DB access and no numpy/NLTK imports here;
+        # index modules are imported lazily by the handlers below.
+        from django.conf import settings
+        from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+        from .models import Publication, Author
 
-        # Signal to rebuild TF-IDF cache on Publication changes
+        # Queue changed publications for a debounced incremental index update
         def update_tfidf_cache(sender, instance, **kwargs):
-            logger.info("Updating TF-IDF cache due to Publication change")
-            build_tfidf_and_index()
+            from .utils import schedule_index_update, index_updates_suppressed
+            if index_updates_suppressed():
+                return
+            logger.info(f"Queueing TF-IDF update for Publication {instance.pk}")
+            schedule_index_update(instance.pk)
 
         post_save.connect(update_tfidf_cache, sender=Publication)
         post_delete.connect(update_tfidf_cache, sender=Publication)
 
-        # Initialize cache if empty (non-blocking)
-        if not cache.get('tfidf_data'):
-            try:
-                logger.info("Initializing TF-IDF cache at startup")
-                build_tfidf_and_index()
-                logger.info("TF-IDF cache initialized successfully")
-            except Exception as e:
-                logger.error(f"Failed to initialize TF-IDF cache at startup: {e}")
+        # Author postings change with the authorship links and author names,
+        # so those queue the affected publications as well
+        def queue_publications(pub_ids, reason):
+            from .utils import schedule_index_updates, index_updates_suppressed
+            pub_ids = list(pub_ids or ())
+            if not pub_ids or index_updates_suppressed():
+                return
+            logger.info(f"Queueing TF-IDF update for {len(pub_ids)} publications ({reason})")
+            schedule_index_updates(pub_ids)
+
+        def update_authorship(sender, instance, action, reverse, pk_set, **kwargs):
+            # Forward (author.publications.*): pk_set holds publication ids;
+            # reverse (publication.authors.*): the instance is the publication
+            if action == 'pre_clear' and not reverse:
+                instance._cleared_publication_ids = list(instance.publications.values_list('id', flat=True))
+            elif action in ('post_add', 'post_remove', 'post_clear'):
+                if reverse:
+                    pub_ids = [instance.pk]
+                elif action == 'post_clear':
+                    pub_ids = getattr(instance, '_cleared_publication_ids', ())
+                else:
+                    pub_ids = pk_set
+                queue_publications(pub_ids, f"authorship {action}")
+
+        def update_author(sender, instance, created=False, **kwargs):
+            if not created:
+                queue_publications(instance.publications.values_list('id', flat=True), f"Author {instance.pk} changed")
+
+        def remember_author_publications(sender, instance, **kwargs):
+            from .utils import index_updates_suppressed
+            # The links are gone by post_delete; skip the query for bulk deletes that rebuild anyway
+            if not index_updates_suppressed():
+                instance._deleted_publication_ids = list(instance.publications.values_list('id', flat=True))
+
+        def delete_author(sender, instance, **kwargs):
+            queue_publications(getattr(instance, '_deleted_publication_ids', ()), f"Author {instance.pk} deleted")
+
+        m2m_changed.connect(update_authorship, sender=Author.publications.through)
+        post_save.connect(update_author, sender=Author)
+        pre_delete.connect(remember_author_publications, sender=Author)
+        post_delete.connect(delete_author, sender=Author)
+
+        # Warm the index in the background; only the process holding the
+        # build lock actually builds, everyone else picks up the published
+        # generation on their next search.
+        if settings.SEARCH_INDEX_WARMUP_ON_STARTUP and not _is_management_command():
+            from .utils import warm_up_index
+            threading.Thread(target=warm_up_index, name='tfidf-warmup', daemon=True).start()
@@ -0,0 +1,138 @@
+# core/authors.py
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from .suggest import heaviest, normalize
+
+ARRAYS = ('author_ids', 'token_ptr', 'token_authors', 'author_ptr', 'author_docs', 'doc_ids', 'doc_ptr', 'doc_authors')
+
+
+def _csr(keys: np.ndarray, values: np.ndarray, num_keys: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Group ``values`` by ``keys`` (0..num_keys-1): (ptr, values sorted by key, then value)."""
+    order = np.lexsort((values, keys))
+    ptr = np.zeros(num_keys + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=num_keys), out=ptr[1:])
+    return ptr, values[order]
+
+
+def _gather(ptr: np.ndarray, values: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    """Concatenated value lists of ``keys`` in a CSR layout, without a Python loop."""
+    starts, lengths = ptr[keys], ptr[keys + 1] - ptr[keys]
+    if not len(lengths) or not lengths.sum():
+        return values[:0]
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return values[offsets + np.arange(offsets.size)]
+
+
+class AuthorIndex:
+    """Author postings: name tokens -> authors -> publications, and publications -> authors.
+
+    Authors are addressed by position in ``author_ids`` (sorted Author
+    primary keys). Every list is a sorted slice of a flat array, like the
+    postings of InvertedIndex:
+
+    * ``token_ptr``/``token_authors``: authors whose normalized name has the token
+    * ``author_ptr``/``author_docs``: publication ids of each author
+    * ``doc_ptr``/``doc_authors``: authors of each publication in ``doc_ids``
+
+    Filtering and facet counting are array operations on these lists; no
+    query touches the database.
+    """
+
+    def __init__(self, author_ids, names: List[str], tokens: Dict[str, int], token_ptr, token_authors,
+                 author_ptr, author_docs, doc_ids, doc_ptr, doc_authors):
+        self.author_ids = author_ids
+        self.names = names
+        self.tokens = tokens
+        self.token_ptr = token_ptr
+        self.token_authors = token_authors
+        self.author_ptr = author_ptr
+        self.author_docs = author_docs
+        self.doc_ids = doc_ids
+        self.doc_ptr = doc_ptr
+        self.doc_authors = doc_authors
+
+    @classmethod
+    def build(cls, names_by_id: Dict[int, str], links: np.ndarray) -> 'AuthorIndex':
+        """Index ``names_by_id`` (Author id -> name) and ``links``, an (n, 2) array of (author id, publication id)."""
+        author_ids = np.array(sorted(names_by_id), dtype=np.int64)
+        names = [names_by_id[author_id] for author_id in author_ids.tolist()]
+        links = np.unique(np.asarray(links, dtype=np.int64).reshape(-1, 2), axis=0)
+        # Links of authors we have no name for (created after the names were read) are dropped
+        positions = np.minimum(np.searchsorted(author_ids, links[:, 0]), max(len(author_ids) - 1, 0))
+        known = author_ids[positions] == links[:, 0] if len(author_ids) else np.zeros(len(links), dtype=bool)
+        positions, docs = positions[known], links[known, 1]
+
+        author_ptr, author_docs = _csr(positions, docs, len(author_ids))
+        doc_ids, doc_keys = np.unique(docs, return_inverse=True)
+        doc_ptr, doc_authors = _csr(doc_keys.reshape(-1), positions, len(doc_ids))
+
+        postings: Dict[str, List[int]] = {}
+        for position, name in enumerate(names):
+            for token in set(normalize(name).split()):
+                postings.setdefault(token, []).append(position)
+        tokens = {token: row for row, token in enumerate(sorted(postings))}
+        token_ptr = np.zeros(len(tokens) + 1, dtype=np.int64)
+        np.cumsum([len(postings[token]) for token in tokens], out=token_ptr[1:])
+        token_authors = np.array([p for token in tokens for p in postings[token]], dtype=np.int32)
+
+        return cls(author_ids, names, tokens, token_ptr, token_authors,
+                   author_ptr, author_docs, doc_ids, doc_ptr, doc_authors.astype(np.int32))
+
+    def links(self) -> np.ndarray:
+        """Every (author id, publication id) pair, as given to ``build``."""
+        counts = np.diff(self.author_ptr)
+        return np.column_stack([np.repeat(self.author_ids, counts), self.author_docs])
+
+    def apply_delta(self, doc_ids: Iterable[int], names_by_id: Dict[int, str], links: np.ndarray) -> 'AuthorIndex':
+        """A new index where the publications ``doc_ids`` have exactly the authors in ``links``.
+
+        ``names_by_id`` adds or renames authors. Authors left without
+        publications stay until the next full build.
+        """
+        kept = self.links()
+        kept = kept[~np.isin(kept[:, 1], np.fromiter(doc_ids, dtype=np.int64))]
+        names = dict(zip(self.author_ids.tolist(), self.names))
+        names.update(names_by_id)
+        return AuthorIndex.build(names, np.concatenate([kept, np.asarray(links, dtype=np.int64).reshape(-1, 2)]))
+
+    @property
+    def num_authors(self) -> int:
+        return len(self.author_ids)
+
+    def match_name(self, query: str) -> np.ndarray:
+        """Positions of the authors whose name contains every word of ``query``."""
+        matched = None
+        for token in normalize(query).split():
+            row = self.tokens.get(token)
+            if row is None:
+                return np.empty(0, dtype=np.int32)
+            authors = self.token_authors[self.token_ptr[row]:self.token_ptr[row + 1]]
+            matched = authors if matched is None else np.intersect1d(matched, authors, assume_unique=True)
+        return np.empty(0, dtype=np.int32) if matched is None else np.asarray(matched)
+
+    def match_ids(self, author_ids: Iterable[int]) -> np.ndarray:
+        """Positions of the given Author ids; unknown ids are skipped."""
+        author_ids = np.fromiter(author_ids, dtype=np.int64)
+        if not len(self.author_ids) or not len(author_ids):
+            return np.empty(0, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.author_ids, author_ids), len(self.author_ids) - 1)
+        return np.unique(positions[self.author_ids[positions] == author_ids])
+
+    def documents(self, authors: np.ndarray) -> np.ndarray:
+        """Sorted publication ids written by any of ``authors`` (positions)."""
+        return np.unique(_gather(self.author_ptr, self.author_docs, np.asarray(authors, dtype=np.int64)))
+
+    def facets(self, doc_ids: np.ndarray, size: int) -> List[Dict]:
+        """The ``size`` authors with most publications among ``doc_ids``, with those counts."""
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        if not len(self.doc_ids) or not len(doc_ids) or size <= 0:
+            return []
+        positions = np.minimum(np.searchsorted(self.doc_ids, doc_ids), len(self.doc_ids) - 1)
+        positions = positions[self.doc_ids[positions] == doc_ids]
+        counts = np.bincount(_gather(self.doc_ptr, self.doc_authors, positions), minlength=self.num_authors)
+        return [
+            {'id': int(self.author_ids[a]), 'name': self.names[a], 'count': int(counts[a])}
+            for a in heaviest(counts, size) if counts[a]
+        ]
@@ -0,0 +1,390 @@
+# core/benchmark.py
+import sys
+import time
+import logging
+import platform
+import resource
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.test import Client
+from django.test.utils import override_settings
+
+from .fixture_server import PurePortalFixtureServer
+from .models import Publication, Author
+from .result_cache import result_cache
+from .search_index import tfidf_index
+from .tasks import run_full_scrape
+from .utils import build_tfidf_and_index, suppress_index_updates
+
+logger = logging.getLogger(__name__)
+
+SEARCH_URL = '/api/search/'
+
+# Vocabulary sizes and lengths roughly matching the scraped portal: abstracts
+# are mostly 100-300 words, titles 6-15.
+VOCABULARY_SIZE = 20_000
+ABSTRACT_WORDS_MEDIAN = 170
+ABSTRACT_WORDS_SIGMA = 0.45
+TITLE_WORDS = (6, 15)
+NO_ABSTRACT_RATE = 0.05
+AUTHORS_PER_DOC = (1, 5)
+ZIPF_EXPONENT = 1.1
+
+
+LOCMEM_CACHE = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark'}
+
+
+def fakeredis_cache() -> Dict:
+    """django-redis backed by an in-process fake server: Redis serialization costs without a Redis."""
+    import fakeredis
+    return {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': 'redis://127.0.0.1:6379/0',
+        'OPTIONS': {'CONNECTION_POOL_KWARGS': {'connection_class': fakeredis.FakeConnection}},
+    }
+
+
+@contextmanager
+def isolated_settings(cache_backend: str = 'locmem'):
+    """Keep a benchmark's index segments and cache keys away from the live ones.
+
+    ``cache_backend`` is 'locmem', 'fakeredis' or 'default' (CACHES from
+    settings, which overwrites the published index).
+    """
+    overrides = {}
+    if cache_backend == 'fakeredis':
+        overrides['CACHES'] = {'default': fakeredis_cache()}
+    elif cache_backend == 'locmem':
+        overrides['CACHES'] = {'default': LOCMEM_CACHE}
+    with tempfile.TemporaryDirectory(prefix='benchmark-index-') as index_dir, \
+            override_settings(SEARCH_INDEX_DIR=index_dir, **overrides):
+        tfidf_index.clear()
+        try:
+            yield
+        finally:
+            tfidf_index.clear()
+            result_cache.clear()
+
+
+# ---------------------- Synthetic Corpus ----------------------
+
+class SyntheticCorpus:
+    """Deterministic Publication-like documents with a Zipfian vocabulary.
+
+    Word frequencies follow a power law like natural text, so posting-list
+    lengths (and therefore query costs) have a realistic skew. Words are
+    made-up pronounceable strings; the analyzer stems them like any other.
+    """
+
+    def __init__(self, num_docs: int, seed: int = 0, vocabulary_size: int = VOCABULARY_SIZE):
+        self.num_docs = num_docs
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        syllables = np.array([c + v for c in 'bcdfghklmnprstvz' for v in 'aeiou'])
+        words = set()
+        while len(words) < vocabulary_size:
+            words.add(''.join(rng.choice(syllables, size=int(rng.integers(2, 5)))))
+        self.words = np.array(sorted(words))
+        rng.shuffle(self.words)
+        ranks = np.arange(1, vocabulary_size + 1, dtype=np.float64)
+        weights = ranks ** -ZIPF_EXPONENT
+        self.cumulative = np.cumsum(weights / weights.sum())
+        self.num_authors = max(num_docs // 5, 1)
+
+    def _sample_words(self, rng: np.random.Generator, n: int) -> np.ndarray:
+        return self.words[np.minimum(np.searchsorted(self.cumulative, rng.random(n)), len(self.words) - 1)]
+
+    def documents(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Dict]:
+        """Documents start..stop-1; each one is generated from its own seed, so any slice is reproducible."""
+        stop = self.num_docs if stop is None else stop
+        for n in range(start, stop):
+            rng = np.random.default_rng((self.seed, n))
+            title = ' '.join(self._sample_words(rng, int(rng.integers(*TITLE_WORDS)))).capitalize()
+            abstract = None
+            if rng.random() >= NO_ABSTRACT_RATE:
+                length = max(int(rng.lognormal(np.log(ABSTRACT_WORDS_MEDIAN), ABSTRACT_WORDS_SIGMA)), 20)
+                abstract = ' '.join(self._sample_words(rng, length)).capitalize() + '.'
+            yield {
+                'title': title[:200],
+                'abstract': abstract,
+                'link': f"https://bench.invalid/publications/{self.seed}-{n}",
+                'published_date': f"{int(rng.integers(1, 29))} Jan {int(rng.integers(2000, 2026))}",
+                'authors': sorted(set(int(a) for a in rng.integers(0, self.num_authors, int(rng.integers(*AUTHORS_PER_DOC))))),
+            }
+
+    def queries(self, n: int, max_terms: int = 3) -> List[str]:
+        """Query strings of 1..max_terms words, drawn from the same word distribution as the documents."""
+        rng = np.random.default_rng((self.seed, self.num_docs, n))
+        return [' '.join(self._sample_words(rng, int(rng.integers(1, max_terms + 1)))) for _ in range(n)]
+
+
+def load_corpus(corpus: SyntheticCorpus, batch_size: int = 5000) -> int:
+    """Replace every Publication and Author with the synthetic corpus, in batches."""
+    # The index is rebuilt from scratch afterwards; don't queue a delta per deleted row
+    with suppress_index_updates():
+        Author.objects.all().delete()
+        Publication.objects.all().delete()
+
+    authors = Author.objects.bulk_create([
+        Author(name=f"Author {i}", profile_url=f"https://bench.invalid/persons/{corpus.seed}-{i}")
+        for i in range(corpus.num_authors)
+    ], batch_size=batch_size)
+    author_ids = [a.id for a in authors]
+    if author_ids[0] is None:
+        # Backends that don't return ids from bulk_create
+        author_ids = list(Author.objects.order_by('id').values_list('id', flat=True))
+
+    Through = Author.publications.through
+    for start in range(0, corpus.num_docs, batch_size):
+        docs = list(corpus.documents(start, min(start + batch_size, corpus.num_docs)))
+        with transaction.atomic():
+            Publication.objects.bulk_create([
+                Publication(title=d['title'], abstract=d['abstract'], link=d['link'], published_date=d['published_date'])
+                for d in docs
+            ])
+            # Bulk inserts send no post_save, so no incremental index updates are queued
+            pub_ids = dict(Publication.objects.filter(link__in=[d['link'] for d in docs]).values_list('link', 'id'))
+            Through.objects.bulk_create([
+                Through(author_id=author_ids[a], publication_id=pub_ids[d['link']])
+                for d in docs for a in d['authors']
+            ])
+        logger.info(f"Loaded {min(start + batch_size, corpus.num_docs)}/{corpus.num_docs} synthetic publications")
+    return corpus.num_docs
+
+
+# ---------------------- Measurements ----------------------
+
+def peak_rss_mb(children: bool = False) -> float:
+    """Peak resident set size of this process (or of its finished children, e.g. analyzer workers)."""
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def current_rss_mb() -> Optional[float]:
+    """Resident set size of this process right now (Linux only)."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+class RssSampler:
+    """Background thread recording the peak of current_rss_mb() while active."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak = current_rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='rss-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            rss = current_rss_mb()
+            if rss is not None and (self.peak is None or rss > self.peak):
+                self.peak = rss
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def percentiles(seconds: Sequence[float]) -> Dict[str, float]:
+    if not len(seconds):
+        return {'count': 0}
+    ms = np.asarray(seconds) * 1000
+    return {
+        'count': len(ms),
+        'mean_ms': round(float(ms.mean()), 3),
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(ms, 95)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3),
+        'max_ms': round(float(ms.max()), 3),
+        'qps': round(len(ms) / (ms.sum() / 1000), 1) if ms.sum() else None,
+    }
+
+
+def bench_build() -> Dict:
+    """Full index build: wall time, peak memory and resulting index sizes."""
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
+    models = build_tfidf_and_index('benchmark')
+    seconds = time.perf_counter() - start
+    tfidf_index.clear()
+    start = time.perf_counter()
+    indexes = tfidf_index.get()['indexes']
+    return {
+        'seconds': round(seconds, 3),
+        'docs_per_sec': round(models['tfidf'].num_docs / seconds, 1) if seconds else None,
+        'index_load_seconds': round(time.perf_counter() - start, 4),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'peak_rss_before_mb': round(rss_before, 1),
+        'peak_rss_children_mb': round(peak_rss_mb(children=True), 1),
+        'num_docs': models['tfidf'].num_docs,
+        'vocabulary': {ranking: len(model.vocabulary) for ranking, model in models.items()},
+        'postings': {ranking: int(index.post_rows.shape[0]) for ranking, index in indexes.items()},
+    }
+
+
+def bench_queries(queries: Sequence[str], params: Optional[Dict] = None, repeat: int = 1) -> Dict:
+    """Latency of SearchArticleView over ``queries``, first with an empty result cache, then warm.
+
+    The 'miss' figures time ranking plus hydration; 'hit' figures are the
+    same requests answered by the result cache. Only successful requests are
+    timed; the others are counted in 'errors' with their status codes.
+    """
+    # The default 'testserver' host is only allowed under the test runner
+    client = Client(HTTP_HOST='localhost')
+    params = params or {}
+    # Untimed request: loads the tokenizer and the resident index. Its offset
+    # keeps it out of the cache entries of the timed requests; the cache itself
+    # is not cleared, since that would also drop the published index.
+    client.get(SEARCH_URL, {'query': queries[0], **params, 'offset': 1})
+    result_cache.clear()
+    passes = {'miss': [], 'hit': []}
+    statuses: Dict[int, int] = {}
+    for phase in passes:
+        for _ in range(repeat if phase == 'hit' else 1):
+            for query in queries:
+                start = time.perf_counter()
+                response = client.get(SEARCH_URL, {'query': query, **params})
+                elapsed = time.perf_counter() - start
+                if response.status_code == 200:
+                    passes[phase].append(elapsed)
+                else:
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    return {
+        'errors': sum(statuses.values()),
+        'error_statuses': {str(code): count for code, count in sorted(statuses.items())},
+        **{phase: percentiles(seconds) for phase, seconds in passes.items()},
+    }
+
+
+def run_benchmark(num_docs: int, num_queries: int = 200, seed: int = 0, rankings: Sequence[str] = ('tfidf', 'bm25'),
+                  limit: Optional[int] = None, fields: Optional[str] = None, repeat: int = 1,
+                  batch_size: int = 5000) -> Dict:
+    """Load a synthetic corpus of ``num_docs``, build the index and time queries against it."""
+    corpus = SyntheticCorpus(num_docs, seed)
+    start = time.perf_counter()
+    load_corpus(corpus, batch_size=batch_size)
+    load_seconds = time.perf_counter() - start
+
+    result = {
+        'num_docs': num_docs,
+        'load_seconds': round(load_seconds, 3),
+        'build': bench_build(),
+        'queries': {},
+    }
+    queries = corpus.queries(num_queries)
+    params = {}
+    if limit is not None:
+        params['limit'] = limit
+    if fields:
+        params['fields'] = fields
+    for ranking in rankings:
+        result['queries'][ranking] = bench_queries(queries, {'ranking': ranking, **params}, repeat=repeat)
+    return result
+
+
+def environment() -> Dict:
+    """Settings and versions that affect the numbers, stored next to them for comparisons."""
+    import django
+    import scipy
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'django': django.get_version(),
+        'numpy': np.__version__,
+        'scipy': scipy.__version__,
+        'database': settings.DATABASES['default']['ENGINE'],
+        'cache': settings.CACHES['default']['BACKEND'],
+        'search': {
+            name: getattr(settings, name) for name in (
+                'SEARCH_TOKENIZER', 'SEARCH_EARLY_TERMINATION', 'SEARCH_RESULTS_LIMIT', 'SEARCH_RANKING',
+                'SEARCH_BM25_K1', 'SEARCH_RESULT_CACHE_SIZE', 'SEARCH_RESULT_CACHE_TIMEOUT',
+                'SEARCH_INDEX_BUILD_PROCESSES',
+            )
+        },
+    }
+
+
+# ---------------------- Scraper ----------------------
+
+def bench_scrape(server: PurePortalFixtureServer, workers: int, delay: float, backend: str = 'http',
+                 incremental: bool = False) -> Dict:
+    """One run_full_scrape against the fixture server: throughput, stage timings and memory.
+
+    Detail workers are threads (plus one browser each for the Selenium
+    backend), so memory per worker is the peak process growth during the run
+    divided by the worker count; browsers show up in the children's peak RSS.
+    """
+    requests_before, errors_before = server.requests_served, server.errors_served
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    with RssSampler() as sampler:
+        result = run_full_scrape.apply(kwargs={
+            'max_pages': server.listing_depth + 1, 'workers': workers, 'delay': delay, 'backend': backend,
+            'base_url': server.base_url, 'incremental': incremental, 'distributed': False,
+        }).get()
+    seconds = time.perf_counter() - start
+    rss_after = sampler.peak
+    worker_stats = list(result.get('workers', {}).values())
+    busy = [w['avg_seconds'] for w in worker_stats if w['pages'] + w['errors']]
+    pages_per_sec = result.get('pages_per_sec', 0.0)
+    growth = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+    return {
+        'backend': backend,
+        'workers': workers,
+        'delay': delay,
+        'seconds': round(seconds, 3),
+        'saved': result.get('count', 0),
+        'failed': len(result.get('failed_urls', [])),
+        'selenium_fallbacks': result.get('selenium_fallbacks', 0),
+        'requests': server.requests_served - requests_before,
+        'errors_served': server.errors_served - errors_before,
+        'pages_per_sec': pages_per_sec,
+        'pages_per_sec_per_worker': round(pages_per_sec / workers, 3),
+        'avg_page_seconds': round(float(np.mean(busy)), 4) if busy else None,
+        'stage_seconds': result.get('stage_seconds', {}),
+        'peak_rss_mb': round(rss_after, 1) if rss_after is not None else None,
+        'rss_growth_mb': round(growth, 1) if growth is not None else None,
+        'rss_per_worker_mb': round(growth / workers, 2) if growth is not None else None,
+        'peak_rss_children_mb': round(peak_rss_mb(children=True), 1),
+    }
+
+
+def run_scrape_benchmark(num_publications: int, worker_counts: Sequence[int], delays: Sequence[float] = (0.0,),
+                         backend: str = 'http', page_size: int = 50, listing_latency: float = 0.0,
+                         detail_latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                         error_status: int = 503, seed: int = 0) -> Dict:
+    """Scrape a fixture portal once per (delay, workers) combination; every run is a full scrape."""
+    fixture = {
+        'num_publications': num_publications, 'page_size': page_size, 'listing_latency': listing_latency,
+        'detail_latency': detail_latency, 'jitter': jitter, 'error_rate': error_rate,
+        'error_status': error_status, 'seed': seed,
+    }
+    runs = []
+    with PurePortalFixtureServer(**fixture) as server:
+        fixture['listing_pages'] = server.listing_depth
+        # Untimed: the first full scrape would otherwise also pay for the
+        # index builder's one-time allocations and imports
+        build_tfidf_and_index('benchmark')
+        for delay in delays:
+            for workers in worker_counts:
+                logger.info(f"Benchmarking {backend} scrape: {workers} workers, delay {delay}s")
+                runs.append(bench_scrape(server, workers, delay, backend))
+    return {'fixture': fixture, 'runs': runs}
@@ -0,0 +1,92 @@
+# core/bm25.py
+import logging
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
+import scipy.sparse as sp
+
+from .engine import InvertedIndex, BM25, count_vector
+from .tfidf import TermCounter
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ('title', 'abstract')
+
+
+def bm25_idf(df: np.ndarray, n_docs: int) -> np.ndarray:
+    """Robertson/Sparck Jones IDF; the +1 inside the log keeps very common terms positive (as in Lucene)."""
+    return np.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+
+
+class Bm25Model:
+    """BM25F over separately counted title and abstract fields.
+
+    Each field's term frequencies are divided by that document's length norm
+    ``1 - b + b * len / avg_len`` and summed with the field weights; the
+    saturated, IDF-weighted result is stored per (document, term). Norms and
+    weights are all computed at build time, so a query is a sparse dot
+    product of its term counts with these impacts.
+    """
+
+    def __init__(self, vocabulary: Dict[str, int], field_counts: Dict[str, sp.csr_matrix],
+                 doc_ids: Sequence[int], k1: float, fields: Dict[str, Dict]):
+        self.vocabulary = vocabulary
+        self.field_counts = field_counts
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        self.k1 = k1
+        self.fields = fields
+        self.refresh()
+
+    @property
+    def num_docs(self) -> int:
+        return len(self.doc_ids)
+
+    def refresh(self):
+        """Recompute length norms, IDF and the impact of every posting."""
+        n_terms = len(self.vocabulary)
+        tf = sp.csr_matrix((self.num_docs, n_terms), dtype=np.float64)
+        self.norms: Dict[str, np.ndarray] = {}
+        for name in FIELDS:
+            counts = self.field_counts[name]
+            if counts.shape[1] != n_terms:
+                counts.resize((counts.shape[0], n_terms))
+            lengths = np.asarray(counts.sum(axis=1), dtype=np.float64).ravel()
+            avg = lengths.mean() if len(lengths) else 0.0
+            b = self.fields[name]['b']
+            norm = (1.0 - b + b * lengths / avg) if avg else np.ones_like(lengths)
+            self.norms[name] = norm
+            tf = tf + sp.diags(self.fields[name]['weight'] / norm) @ counts.astype(np.float64)
+        tf = sp.csr_matrix(tf)
+        tf.eliminate_zeros()
+        self.idf = bm25_idf(np.bincount(tf.indices, minlength=n_terms), self.num_docs)
+        impacts = tf.copy()
+        impacts.data = self.idf[tf.indices] * tf.data * (self.k1 + 1.0) / (tf.data + self.k1)
+        self.weights = impacts
+
+    def apply_delta(self, upserts: Dict[int, Sequence[List[str]]], deletes: Iterable[int] = ()):
+        """Replace/insert documents (token lists in FIELDS order) and drop deleted ids.
+
+        Length averages and IDF depend on the whole corpus, so every impact
+        is recomputed; that is a pass over the count arrays, no re-tokenizing.
+        """
+        removed = set(deletes) | set(upserts)
+        keep = ~np.isin(self.doc_ids, list(removed)) if removed else np.ones(self.num_docs, dtype=bool)
+        counters = [TermCounter(self.vocabulary) for _ in FIELDS]
+        for field_tokens in upserts.values():
+            for counter, tokens in zip(counters, field_tokens):
+                counter.add(tokens)
+        n_terms = len(self.vocabulary)
+        for name, counter in zip(FIELDS, counters):
+            old = self.field_counts[name][keep]
+            old.resize((old.shape[0], n_terms))
+            new = counter.matrix()
+            new.resize((new.shape[0], n_terms))
+            self.field_counts[name] = sp.vstack([old, new], format='csr')
+        self.doc_ids = np.concatenate([self.doc_ids[keep], np.asarray(list(upserts), dtype=np.int64)])
+        self.refresh()
+
+    def vectorize(self, tokens: List[str]) -> sp.csr_matrix:
+        return count_vector(self.vocabulary, tokens)
+
+    def to_index(self) -> InvertedIndex:
+        return InvertedIndex.from_tfidf(self.weights, self.doc_ids, self.vocabulary, self.idf, scoring=BM25)
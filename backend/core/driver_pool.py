@@ -0,0 +1,242 @@
+# core/driver_pool.py
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from selenium import webdriver
+from selenium.webdriver.firefox.service import Service as FirefoxService
+from selenium.webdriver.firefox.options import Options as FirefoxOptions
+from selenium.common.exceptions import WebDriverException
+
+logger = logging.getLogger(__name__)
+
+# Firefox prefs that stop the browser from downloading each resource type
+BLOCKABLE_RESOURCES = {
+    'images': {'permissions.default.image': 2},
+    'fonts': {'browser.display.use_document_fonts': 0, 'gfx.downloadable_fonts.enabled': False},
+    'css': {'permissions.default.stylesheet': 2},
+    'media': {'media.autoplay.default': 5, 'media.play-stand-alone': False},
+}
+
+_driver_path_lock = threading.Lock()
+_driver_path: Optional[str] = None
+
+
+# ---------------------- Driver Startup ----------------------
+
+def resolve_driver_path() -> str:
+    """Path of the geckodriver binary.
+
+    Resolved once per process and cached on disk in SCRAPE_DRIVER_PATH_CACHE,
+    so GeckoDriverManager (a network version lookup) only runs when the
+    cached binary is missing. SCRAPE_GECKODRIVER_PATH skips all of this.
+    """
+    global _driver_path
+    if settings.SCRAPE_GECKODRIVER_PATH:
+        return settings.SCRAPE_GECKODRIVER_PATH
+    with _driver_path_lock:
+        if _driver_path and os.path.exists(_driver_path):
+            return _driver_path
+        cache_file = Path(settings.SCRAPE_DRIVER_PATH_CACHE) if settings.SCRAPE_DRIVER_PATH_CACHE else None
+        if cache_file is not None and cache_file.exists():
+            try:
+                path = json.loads(cache_file.read_text())['path']
+                if os.path.exists(path):
+                    _driver_path = path
+                    return path
+            except (ValueError, KeyError, OSError) as e:
+                logger.warning(f"Ignoring unreadable geckodriver path cache {cache_file}: {e}")
+
+        from webdriver_manager.firefox import GeckoDriverManager
+        _driver_path = GeckoDriverManager().install()
+        if cache_file is not None:
+            try:
+                cache_file.parent.mkdir(parents=True, exist_ok=True)
+                tmp = cache_file.with_suffix('.tmp')
+                tmp.write_text(json.dumps({'path': _driver_path}))
+                os.replace(tmp, cache_file)
+            except OSError as e:
+                logger.warning(f"Could not cache geckodriver path in {cache_file}: {e}")
+        return _driver_path
+
+
+def build_firefox_options(headless: bool) -> FirefoxOptions:
+    opts = FirefoxOptions()
+    if headless:
+        opts.add_argument("--headless")
+    opts.add_argument("--window-size=1366,900")
+    opts.add_argument("--disable-gpu")
+    opts.add_argument("--no-sandbox")
+    opts.add_argument("--disable-dev-shm-usage")
+    opts.add_argument("--lang=en-US")
+    opts.add_argument("--disable-notifications")
+    opts.add_argument("--no-default-browser-check")
+    opts.add_argument("--disable-extensions")
+    opts.add_argument("--disable-popup-blocking")
+    opts.set_preference("dom.webnotifications.enabled", False)
+    opts.set_preference("general.useragent.override",
+                       "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:129.0) Gecko/20100101 Firefox/129.0")
+    # 'eager' returns once the DOM is parsed instead of waiting for every subresource
+    opts.page_load_strategy = settings.SCRAPE_PAGE_LOAD_STRATEGY
+    for resource in settings.SCRAPE_BLOCK_RESOURCES:
+        for name, value in BLOCKABLE_RESOURCES[resource].items():
+            opts.set_preference(name, value)
+    return opts
+
+
+def make_driver() -> webdriver.Firefox:
+    """Create a headless Firefox WebDriver; Celery workers have no display."""
+    try:
+        service = FirefoxService(
+            executable_path=resolve_driver_path(),
+            log_output=open(os.devnull, 'w')  # suppress geckodriver logs
+        )
+
+        driver = webdriver.Firefox(service=service, options=build_firefox_options(headless=True))
+
+        # Hide webdriver detection
+        try:
+            driver.execute_script(
+                "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"
+            )
+        except Exception as e:
+            logger.warning(f"Failed to hide webdriver: {e}")
+
+        return driver
+
+    except Exception as e:
+        logger.error(f"Failed to start Firefox WebDriver: {e}", exc_info=True)
+        raise
+
+
+def quit_driver(driver: webdriver.Firefox):
+    try:
+        driver.quit()
+    except Exception as e:
+        logger.debug(f"Error while quitting WebDriver: {e}")
+
+
+# ---------------------- Pool ----------------------
+
+class DriverPool:
+    """Warm Firefox instances shared by the scrape tasks of one worker process.
+
+    ``driver()`` lends out an idle browser (or starts one) and takes it back
+    afterwards. Browsers are health-checked before reuse, replaced after
+    ``max_age`` seconds or ``max_pages`` page loads, and discarded when a
+    WebDriverException escapes while they are lent out. At most ``size`` idle
+    browsers are kept; the number in use is bounded by the callers' workers.
+
+    Every loan sets the page-load timeout afresh (``page_timeout`` unless the
+    caller asks for another), so no caller inherits the previous one's. The
+    launch prefs (load strategy, blocked resources) are fixed per browser, so
+    browsers started under other settings are retired instead of reused.
+    """
+
+    def __init__(self, size: int, max_age: float, max_pages: int, page_timeout: float):
+        self.size = size
+        self.max_age = max_age
+        self.max_pages = max_pages
+        self.page_timeout = page_timeout
+        self._lock = threading.Lock()
+        self._idle: List[webdriver.Firefox] = []
+        self._meta: Dict[int, Dict] = {}
+        self.started = 0
+        self.reused = 0
+
+    @staticmethod
+    def _launch_prefs():
+        return settings.SCRAPE_PAGE_LOAD_STRATEGY, tuple(settings.SCRAPE_BLOCK_RESOURCES)
+
+    def _expired(self, driver: webdriver.Firefox) -> bool:
+        meta = self._meta[id(driver)]
+        return (time.monotonic() - meta['created'] > self.max_age or meta['pages'] >= self.max_pages
+                or meta['prefs'] != self._launch_prefs())
+
+    @staticmethod
+    def _healthy(driver: webdriver.Firefox) -> bool:
+        try:
+            driver.execute_script("return 1")
+            return True
+        except WebDriverException:
+            return False
+
+    def _retire(self, driver: webdriver.Firefox):
+        with self._lock:
+            self._meta.pop(id(driver), None)
+        quit_driver(driver)
+
+    def acquire(self, page_timeout: Optional[float] = None) -> webdriver.Firefox:
+        driver = self._reuse()
+        if driver is None:
+            driver = make_driver()
+            with self._lock:
+                self._meta[id(driver)] = {'created': time.monotonic(), 'pages': 0, 'prefs': self._launch_prefs()}
+                self.started += 1
+        try:
+            driver.set_page_load_timeout(self.page_timeout if page_timeout is None else page_timeout)
+        except WebDriverException:
+            self._retire(driver)
+            raise
+        return driver
+
+    def _reuse(self) -> Optional[webdriver.Firefox]:
+        while True:
+            with self._lock:
+                driver = self._idle.pop() if self._idle else None
+            if driver is None:
+                return None
+            if not self._expired(driver) and self._healthy(driver):
+                with self._lock:
+                    self.reused += 1
+                return driver
+            self._retire(driver)
+
+    def release(self, driver: webdriver.Firefox):
+        with self._lock:
+            self._meta[id(driver)]['pages'] += 1
+            keep = len(self._idle) < self.size and not self._expired(driver)
+            if keep:
+                self._idle.append(driver)
+        if not keep:
+            self._retire(driver)
+
+    @contextmanager
+    def driver(self, page_timeout: Optional[float] = None):
+        driver = self.acquire(page_timeout)
+        try:
+            yield driver
+        except WebDriverException:
+            # Possibly wedged or crashed; never hand it out again
+            self._retire(driver)
+            raise
+        except BaseException:
+            self.release(driver)
+            raise
+        else:
+            self.release(driver)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for driver in idle:
+            self._retire(driver)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'idle': len(self._idle), 'alive': len(self._meta), 'started': self.started, 'reused': self.reused}
+
+
+# One pool per worker process, so browsers stay warm between tasks
+driver_pool = DriverPool(
+    settings.SCRAPE_DRIVER_POOL_SIZE, settings.SCRAPE_DRIVER_MAX_AGE, settings.SCRAPE_DRIVER_RECYCLE_AFTER,
+    settings.SCRAPE_PAGE_TIMEOUT,
+)
+atexit.register(driver_pool.close)
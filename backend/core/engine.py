@@ -0,0 +1,248 @@
+# core/engine.py
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+
+logger = logging.getLogger(__name__)
+
+
+TFIDF, BM25 = 'tfidf', 'bm25'
+
+
+class InvertedIndex:
+    """Postings-list view of a TF-IDF (or BM25 impact) matrix.
+
+    For every vocabulary term the index stores the rows (documents) containing
+    it, sorted by row, together with their precomputed weight. Scoring a query
+    only touches the postings of its terms, so query cost grows with the
+    number of postings read rather than with the size of the corpus.
+
+    ``scoring`` decides how queries are vectorized: TF-IDF queries are
+    IDF-weighted and L2-normalised (cosine similarity), BM25 postings already
+    hold the full per-term contribution so queries are plain term counts.
+    """
+
+    def __init__(self, term_ptr: np.ndarray, post_rows: np.ndarray, post_weights: np.ndarray,
+                 doc_ids: Sequence[int], vocabulary: Optional[Dict[str, int]] = None,
+                 idf: Optional[np.ndarray] = None, max_weights: Optional[np.ndarray] = None,
+                 scoring: str = TFIDF):
+        self.vocabulary = vocabulary or {}
+        self.idf = idf
+        self.scoring = scoring
+        self.term_ptr = term_ptr
+        self.post_rows = post_rows
+        self.post_weights = post_weights
+        self.doc_ids = np.asarray(doc_ids)
+        # (rows in doc id order, doc ids in that order), computed on first use by rows_of()
+        self._doc_id_order = None
+        # Per-term upper bound on the contribution of a single posting (MaxScore)
+        if max_weights is None:
+            max_weights = np.zeros(len(term_ptr) - 1, dtype=post_weights.dtype)
+            nonempty = np.diff(term_ptr) > 0
+            if nonempty.any():
+                max_weights[nonempty] = np.maximum.reduceat(post_weights, term_ptr[:-1][nonempty])
+        self.max_weights = max_weights
+
+    @classmethod
+    def from_tfidf(cls, tfidf_matrix, doc_ids: Sequence[int], vocabulary: Optional[Dict[str, int]] = None,
+                   idf: Optional[np.ndarray] = None, scoring: str = TFIDF) -> 'InvertedIndex':
+        """Build postings from a (documents x terms) sparse weight matrix."""
+        csc = tfidf_matrix.tocsc()
+        csc.sort_indices()
+        return cls(
+            csc.indptr.astype(np.int64),
+            csc.indices.astype(np.int32),
+            csc.data.astype(np.float32),
+            doc_ids,
+            vocabulary,
+            idf,
+            scoring=scoring,
+        )
+
+    @property
+    def num_docs(self) -> int:
+        return len(self.doc_ids)
+
+    def vectorize(self, tokens: List[str]) -> sp.csr_matrix:
+        """Query vector for already pre-processed tokens."""
+        if self.scoring == BM25:
+            return count_vector(self.vocabulary, tokens)
+        return query_vector(self.vocabulary, self.idf, tokens)
+
+    def _postings(self, term: int) -> Tuple[np.ndarray, np.ndarray]:
+        start, end = self.term_ptr[term], self.term_ptr[term + 1]
+        return self.post_rows[start:end], self.post_weights[start:end]
+
+    @staticmethod
+    def _accumulate(rows: List[np.ndarray], scores: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """Sum the scores of equal rows; returns (unique rows, summed scores)."""
+        if not rows:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float64)
+        rows = np.concatenate(rows)
+        scores = np.concatenate(scores)
+        uniq, inverse = np.unique(rows, return_inverse=True)
+        return uniq, np.bincount(inverse, weights=scores, minlength=len(uniq))
+
+    @staticmethod
+    def _top_k(rows: np.ndarray, scores: np.ndarray, k: int) -> np.ndarray:
+        """Positions of the k best scores, best first, ties broken by row order."""
+        if len(scores) > k:
+            part = np.argpartition(-scores, k - 1)[:k]
+        else:
+            part = np.arange(len(scores))
+        order = np.lexsort((rows[part], -scores[part]))
+        return part[order]
+
+    @staticmethod
+    def _lookup(post_rows: np.ndarray, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Which of ``rows`` occur in the sorted ``post_rows``, and the positions of those that do."""
+        pos = np.minimum(np.searchsorted(post_rows, rows), len(post_rows) - 1)
+        hit = post_rows[pos] == rows
+        return hit, pos[hit]
+
+    def rows_of(self, doc_ids: np.ndarray) -> np.ndarray:
+        """Sorted rows of the given doc ids; ids not in the index are skipped."""
+        doc_ids = np.asarray(doc_ids)
+        if self.num_docs == 0 or len(doc_ids) == 0:
+            return np.empty(0, dtype=np.int64)
+        # getattr: indexes pickled before this attribute existed
+        if getattr(self, '_doc_id_order', None) is None:
+            order = np.argsort(self.doc_ids, kind='stable')
+            self._doc_id_order = (order, self.doc_ids[order])
+        order, sorted_ids = self._doc_id_order
+        _, pos = self._lookup(sorted_ids, doc_ids)
+        return np.sort(order[pos])
+
+    def match(self, query_vector, rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Every row scoring above zero for the query and its score, without ranking.
+
+        With ``rows`` (sorted, e.g. from ``rows_of``) only those documents are
+        scored: each is looked up in the query terms' postings, so a small
+        filter costs a few binary searches instead of reading every posting.
+        """
+        query_vector = query_vector.tocsr()
+        terms, weights = query_vector.indices, query_vector.data
+        if rows is None:
+            postings = [self._postings(t) for t in terms]
+            rows, scores = self._accumulate(
+                [p[0] for p in postings],
+                [p[1].astype(np.float64) * w for p, w in zip(postings, weights)],
+            )
+        else:
+            scores = np.zeros(len(rows), dtype=np.float64)
+            for term, weight in zip(terms, weights):
+                post_rows, post_weights = self._postings(term)
+                if len(post_rows) == 0:
+                    continue
+                hit, pos = self._lookup(post_rows, rows)
+                scores[hit] += post_weights[pos] * weight
+        keep = scores > 0
+        return rows[keep], scores[keep]
+
+    def rank(self, rows: np.ndarray, scores: np.ndarray, k: int = 50, offset: int = 0) -> List[Tuple[int, float]]:
+        """The (doc_id, score) pairs ranked ``offset`` to ``offset + k`` among matched rows."""
+        if k <= 0:
+            return []
+        top = self._top_k(rows, scores, offset + k)[offset:]
+        return [(self.doc_ids[rows[i]].item(), float(scores[i])) for i in top]
+
+    def _threshold(self, scores: np.ndarray, k: int) -> float:
+        if len(scores) < k:
+            return 0.0
+        return float(np.partition(scores, len(scores) - k)[len(scores) - k])
+
+    def search(self, query_vector, k: int = 50, early_termination: bool = False,
+               offset: int = 0) -> List[Tuple[int, float]]:
+        """Return up to k (doc_id, score) pairs ranked by dot product with the query.
+
+        ``query_vector`` is a 1 x vocabulary sparse row, e.g. the output of
+        ``vectorize``. ``offset`` skips that many of the best hits (a result
+        page); only the ``offset + k`` best are ranked and only the requested
+        window is materialized. With ``early_termination`` the MaxScore
+        strategy stops admitting new candidates once no unseen document can
+        reach the current top-k threshold; the remaining terms are then only
+        looked up for the surviving candidates.
+        """
+        query_vector = query_vector.tocsr()
+        terms = query_vector.indices
+        weights = query_vector.data
+        if k <= 0 or len(terms) == 0 or self.num_docs == 0:
+            return []
+
+        if early_termination:
+            rows, scores = self._search_maxscore(terms, weights, offset + k)
+            keep = scores > 0
+            rows, scores = rows[keep], scores[keep]
+        else:
+            rows, scores = self.match(query_vector)
+        return self.rank(rows, scores, k, offset)
+
+    def _search_maxscore(self, terms: np.ndarray, weights: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        bounds = weights * self.max_weights[terms]
+        order = np.argsort(-bounds, kind='stable')
+        terms, weights, bounds = terms[order], weights[order], bounds[order]
+        # remaining[i] = best score any document can still gain from terms[i:]
+        remaining = np.append(np.cumsum(bounds[::-1])[::-1], 0.0)
+
+        rows = np.empty(0, dtype=np.int32)
+        scores = np.empty(0, dtype=np.float64)
+        i = 0
+        # Essential phase: every posting may introduce a new candidate
+        while i < len(terms):
+            if len(rows) >= k and self._threshold(scores, k) > remaining[i]:
+                break
+            post_rows, post_weights = self._postings(terms[i])
+            rows, scores = self._accumulate(
+                [rows, post_rows], [scores, post_weights.astype(np.float64) * weights[i]]
+            )
+            i += 1
+
+        if i == len(terms):
+            return rows, scores
+
+        # Non-essential phase: unseen documents cannot enter the top-k any more;
+        # only refine candidates that can still beat the threshold.
+        logger.debug(f"MaxScore pruning after {i}/{len(terms)} query terms")
+        for j in range(i, len(terms)):
+            threshold = self._threshold(scores, k)
+            alive = scores + remaining[j] >= threshold
+            rows, scores = rows[alive], scores[alive]
+            post_rows, post_weights = self._postings(terms[j])
+            if len(post_rows) == 0:
+                continue
+            hit, pos = self._lookup(post_rows, rows)
+            scores[hit] += post_weights[pos] * weights[j]
+        return rows, scores
+
+
+def _term_counts(vocabulary: Dict[str, int], tokens: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    counts: Dict[int, int] = {}
+    for token in tokens:
+        col = vocabulary.get(token)
+        if col is not None:
+            counts[col] = counts.get(col, 0) + 1
+    cols = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+    data = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+    return cols, data
+
+
+def _row(vocabulary: Dict[str, int], cols: np.ndarray, data: np.ndarray) -> sp.csr_matrix:
+    order = np.argsort(cols)
+    return sp.csr_matrix((data[order], cols[order], [0, len(cols)]), shape=(1, len(vocabulary)))
+
+
+def query_vector(vocabulary: Dict[str, int], idf: np.ndarray, tokens: List[str]) -> sp.csr_matrix:
+    """L2-normalised TF-IDF row for a tokenized query; unknown terms are ignored."""
+    cols, data = _term_counts(vocabulary, tokens)
+    data = data * idf[cols]
+    norm = np.sqrt((data ** 2).sum())
+    if norm:
+        data /= norm
+    return _row(vocabulary, cols, data)
+
+
+def count_vector(vocabulary: Dict[str, int], tokens: List[str]) -> sp.csr_matrix:
+    """Raw query term counts, for indexes whose postings hold the full term weight (BM25)."""
+    return _row(vocabulary, *_term_counts(vocabulary, tokens))
@@ -0,0 +1,197 @@
+# core/fixture_server.py
+import time
+import random
+import hashlib
+import logging
+import threading
+from html import escape
+from pathlib import Path
+from string import Template
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+logger = logging.getLogger(__name__)
+
+TESTDATA_DIR = Path(__file__).resolve().parent / 'testdata' / 'pureportal'
+LISTING_PATH = '/en/organisations/fixture-school/publications/'
+DETAIL_PREFIX = '/en/publications/fixture-'
+
+WORDS = (
+    "market finance risk bank credit equity bond volatility portfolio asset pricing inflation "
+    "monetary policy firm governance audit accounting tax debt liquidity return investor fund "
+    "growth emerging economy trade currency exchange rate option derivative hedge insurance"
+).split()
+SURNAMES = "Smith Jones Patel Khan Brown Taylor Wilson Evans Walker Wright Okafor Nguyen".split()
+
+
+def _template(name: str) -> Template:
+    return Template((TESTDATA_DIR / name).read_text())
+
+
+class PurePortalFixtureServer:
+    """Local stand-in for the Pure portal, serving pages built from saved HTML.
+
+    Listing pages and detail pages use the same markup as the live portal, so
+    the HTTP and Selenium scrapers can both be pointed at ``base_url``.
+    Content is generated deterministically from the publication number.
+    Listings are newest (highest number) first, as on the portal, and detail
+    pages carry an ETag honoured by If-None-Match.
+
+    For benchmarks the server can imitate a slow or flaky portal: every
+    response is delayed by ``listing_latency`` / ``detail_latency`` seconds
+    (plus up to ``jitter``), and ``error_rate`` of the requests are answered
+    with ``error_status``. The listing is ``num_publications / page_size``
+    pages deep. Latency and errors are drawn from a generator seeded with
+    ``seed``.
+    """
+
+    def __init__(self, num_publications: int = 120, page_size: int = 50, host: str = '127.0.0.1', port: int = 0,
+                 listing_latency: float = 0.0, detail_latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 503, seed: int = 0):
+        self.num_publications = num_publications
+        self.page_size = page_size
+        self.listing_latency = listing_latency
+        self.detail_latency = detail_latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._rng = random.Random(seed)
+        self.listing = _template('listing.html')
+        self.listing_item = _template('listing_item.html')
+        self.listing_empty = (TESTDATA_DIR / 'listing_empty.html').read_text()
+        self.detail = _template('detail.html')
+        self.detail_person = _template('detail_person.html')
+        self.requests_served = 0
+        self.not_modified_served = 0
+        self.errors_served = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    # ---------------------- Content ----------------------
+
+    def publication(self, n: int) -> dict:
+        rng = random.Random(n)
+        authors = [
+            (f"{rng.choice(SURNAMES)}, {chr(65 + rng.randrange(26))}.", f"/en/persons/fixture-person-{rng.randrange(200)}")
+            for _ in range(rng.randint(1, 4))
+        ]
+        return {
+            'title': ' '.join(rng.choices(WORDS, k=6)).capitalize(),
+            'date': f"{rng.randint(1, 28)} {rng.choice(['Jan', 'Mar', 'Jun', 'Sep', 'Dec'])} {rng.randint(2005, 2025)}",
+            'abstract': ' '.join(rng.choices(WORDS, k=rng.randint(60, 200))).capitalize() + '.',
+            'authors': authors,
+        }
+
+    def listing_page(self, page: int) -> str:
+        start = self.num_publications - 1 - page * self.page_size
+        numbers = range(start, max(start - self.page_size, -1), -1)
+        if not numbers:
+            return self.listing_empty
+        items = []
+        for n in numbers:
+            pub = self.publication(n)
+            name, href = pub['authors'][0]
+            items.append(self.listing_item.substitute(
+                href=f"{DETAIL_PREFIX}{n}", title=escape(pub['title']),
+                person=escape(name), person_href=href, date=pub['date'],
+            ))
+        return self.listing.substitute(results=''.join(items), pagination=f"page {page + 1}")
+
+    def detail_page(self, n: int) -> str:
+        pub = self.publication(n)
+        persons = [
+            self.detail_person.substitute(href=href, name=escape(name), sep=',' if i < len(pub['authors']) - 1 else '')
+            for i, (name, href) in enumerate(pub['authors'])
+        ]
+        return self.detail.substitute(
+            title=escape(pub['title']), persons=''.join(persons), date=pub['date'],
+            abstract=f"<p>{escape(pub['abstract'])}</p>",
+        )
+
+    @property
+    def listing_depth(self) -> int:
+        """Number of non-empty listing pages."""
+        return -(-self.num_publications // self.page_size)
+
+    def route(self, path: str, query: dict):
+        """Return (status, body) for a request path."""
+        if path == LISTING_PATH:
+            try:
+                page = int(query.get('page', ['0'])[0])
+            except ValueError:
+                return 400, 'bad page'
+            return 200, self.listing_page(page)
+        if path.startswith(DETAIL_PREFIX):
+            try:
+                n = int(path[len(DETAIL_PREFIX):].strip('/'))
+            except ValueError:
+                return 404, 'not found'
+            if 0 <= n < self.num_publications:
+                return 200, self.detail_page(n)
+        return 404, 'not found'
+
+    # ---------------------- Server ----------------------
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                latency = server.detail_latency if parsed.path.startswith(DETAIL_PREFIX) else server.listing_latency
+                with server._lock:
+                    server.requests_served += 1
+                    latency += server.jitter * server._rng.random()
+                    fail = server.error_rate and server._rng.random() < server.error_rate
+                    if fail:
+                        server.errors_served += 1
+                if latency:
+                    time.sleep(latency)
+                if fail:
+                    status, body = server.error_status, 'fixture error'
+                else:
+                    status, body = server.route(parsed.path, parse_qs(parsed.query))
+                payload = body.encode('utf-8')
+                etag = None
+                if status == 200 and parsed.path.startswith(DETAIL_PREFIX):
+                    etag = '"%s"' % hashlib.sha1(payload).hexdigest()
+                    if self.headers.get('If-None-Match') == etag:
+                        with server._lock:
+                            server.not_modified_served += 1
+                        status, payload = 304, b''
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(payload)))
+                if etag:
+                    self.send_header('ETag', etag)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        return Handler
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}{LISTING_PATH}"
+
+    def start(self) -> 'PurePortalFixtureServer':
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='pureportal-fixture', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
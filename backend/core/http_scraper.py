@@ -0,0 +1,219 @@
+# core/http_scraper.py
+import re
+import time
+import logging
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from urllib.parse import urljoin
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from lxml import html as lxml_html
+
+from .pipeline import WorkQueue
+from .progress import ScrapeProgress, OK, FALLBACK
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:129.0) Gecko/20100101 Firefox/129.0"
+REQUEST_TIMEOUT = 30
+
+# Same selectors the Selenium scraper reads; the Pure portal renders them server-side
+LISTING_LINK_SELECTOR = ".result-container h3.title a"
+TITLE_SELECTOR = "h1"
+PERSON_SELECTOR = ".relations.persons a[href*='/en/persons/']"
+DATE_SELECTORS = ["span.date", "time[datetime]", "time"]
+ABSTRACT_SELECTORS = ["section#abstract .textblock", "section.abstract .textblock", "div.abstract .textblock"]
+
+_SPACES = re.compile(r"[ \t\r\f\v\xa0]+")
+_BLANK_LINES = re.compile(r"\n\s*\n+")
+
+
+class PageNotParsed(Exception):
+    """The fetched HTML lacks the server-rendered content we expect (JS-only page)."""
+
+
+class KnownLinkCutoff:
+    """Tells the listing scrapers to stop after a run of already-stored links.
+
+    The portal lists newest publications first, so once ``threshold``
+    consecutive links are known the rest of the archive is too.
+    """
+
+    def __init__(self, is_known: Callable[[Iterable[str]], Set[str]], threshold: int):
+        self.is_known = is_known
+        self.threshold = threshold
+        self.run = 0
+
+    def reached(self, rows: List[Dict]) -> bool:
+        known = self.is_known([r["link"] for r in rows])
+        for r in rows:
+            self.run = self.run + 1 if r["link"] in known else 0
+            if self.run >= self.threshold:
+                return True
+        return False
+
+
+# ---------------------- HTTP Session ----------------------
+
+def make_session(pool_size: int = 16) -> requests.Session:
+    """Keep-alive session with a connection pool sized for ``pool_size`` threads."""
+    session = requests.Session()
+    retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=frozenset(['GET']))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({
+        'User-Agent': USER_AGENT,
+        'Accept-Language': 'en-US,en;q=0.9',
+    })
+    return session
+
+
+def fetch(session: requests.Session, url: str) -> str:
+    response = session.get(url, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response.text
+
+
+# ---------------------- Parsing ----------------------
+
+def element_text(el) -> str:
+    """Visible-ish text of an element: collapsed spaces, paragraphs kept on their own lines."""
+    for br in el.iter('br'):
+        br.tail = '\n' + (br.tail or '')
+    for block in el.iter('p', 'div', 'li'):
+        block.tail = '\n' + (block.tail or '')
+    text = _SPACES.sub(' ', el.text_content())
+    text = '\n'.join(line.strip() for line in text.split('\n'))
+    return _BLANK_LINES.sub('\n', text).strip()
+
+
+def parse_listing(page_html: str, page_url: str) -> List[Dict]:
+    doc = lxml_html.fromstring(page_html)
+    rows: List[Dict] = []
+    for a in doc.cssselect(LISTING_LINK_SELECTOR):
+        title = element_text(a)
+        href = a.get('href')
+        if title and href:
+            rows.append({"title": title, "link": urljoin(page_url, href)})
+    if not rows and "No results" not in page_html and not doc.cssselect(".result-container"):
+        raise PageNotParsed(f"No result containers in listing page {page_url}")
+    return rows
+
+
+def parse_detail(page_html: str, link: str, title_hint: str = "") -> Dict:
+    doc = lxml_html.fromstring(page_html)
+
+    # TITLE
+    h1 = doc.cssselect(TITLE_SELECTOR)
+    if not h1:
+        raise PageNotParsed(f"No title in detail page {link}")
+    title = element_text(h1[0]) or title_hint or ""
+
+    # AUTHORS
+    authors, seen = [], set()
+    for a in doc.cssselect(PERSON_SELECTOR):
+        name = element_text(a)
+        url = urljoin(link, a.get('href'))
+        if name and (name, url) not in seen:
+            seen.add((name, url))
+            authors.append({"name": name, "profile_url": url})
+
+    # PUBLISHED DATE
+    published_date = None
+    for sel in DATE_SELECTORS:
+        found = doc.cssselect(sel)
+        if found:
+            published_date = found[0].get('datetime') or element_text(found[0])
+            if published_date:
+                break
+
+    # ABSTRACT
+    abstract_txt = None
+    for sel in ABSTRACT_SELECTORS:
+        found = doc.cssselect(sel)
+        if found:
+            txt = element_text(found[0])
+            if txt and len(txt) > 15:
+                abstract_txt = txt
+                break
+
+    return {
+        "title": title,
+        "link": link,
+        "authors": authors,
+        "published_date": published_date,
+        "abstract": abstract_txt or ""
+    }
+
+
+# ---------------------- Scraping ----------------------
+
+def iter_listing_pages(session: requests.Session, base_url: str, max_pages: int,
+                       cutoff: Optional[KnownLinkCutoff] = None, start_page: int = 0) -> Iterator[Tuple[int, List[Dict]]]:
+    """Yield (page index, rows) for each listing page as soon as it is parsed."""
+    for i in range(start_page, max_pages):
+        url = f"{base_url}?page={i}"
+        logger.info(f"[HTTP] Processing listing page {i + 1}/{max_pages}: {url}")
+        rows = parse_listing(fetch(session, url), url)
+        if not rows:
+            logger.info(f"[HTTP] Empty at page {i + 1}; stopping early.")
+            return
+        yield i, rows
+        if cutoff is not None and cutoff.reached(rows):
+            logger.info(f"[HTTP] {cutoff.threshold} known links in a row at page {i + 1}; stopping early.")
+            return
+
+
+def extract_detail_for_link(session: requests.Session, link: str, title_hint: str, delay: float,
+                            validators: Optional[Dict] = None) -> Optional[Dict]:
+    """Scrape one detail page; None if the stored ``validators`` say it is unchanged (304)."""
+    headers = {}
+    if validators:
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+    response = session.get(link, timeout=REQUEST_TIMEOUT, headers=headers)
+    if response.status_code == 304:
+        time.sleep(delay)
+        return None
+    response.raise_for_status()
+    rec = parse_detail(response.text, link, title_hint)
+    rec["etag"] = response.headers.get('ETag', '')
+    rec["last_modified"] = response.headers.get('Last-Modified', '')
+    time.sleep(delay)
+    return rec
+
+
+def detail_worker(session: requests.Session, work: WorkQueue, delay: float,
+                  emit: Callable[[Tuple[str, object]], None], fallback: Callable[[Dict], None],
+                  progress: Optional[ScrapeProgress] = None):
+    """Pull listing items until the queue is drained.
+
+    Emits ('record', rec) or ('not_modified', link); items that cannot be
+    scraped over HTTP are handed to ``fallback`` (the Selenium stage).
+    """
+    while True:
+        job = work.get()
+        if job is None:
+            return
+        item = job['item']
+        start = time.monotonic()
+        try:
+            rec = extract_detail_for_link(session, item["link"], item.get("title", ""), delay, item.get("validators"))
+        except (requests.RequestException, PageNotParsed) as e:
+            logger.warning(f"[HTTP] Falling back for {item['link']}: {e}")
+            fallback(item)
+            outcome = FALLBACK
+        else:
+            if rec is None:
+                emit(('not_modified', item["link"]))
+            else:
+                emit(('record', rec))
+            outcome = OK
+        work.succeeded(job)
+        if progress is not None:
+            progress.detail_done(time.monotonic() - start, outcome)
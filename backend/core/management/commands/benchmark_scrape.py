@@ -0,0 +1,56 @@
+import json
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+from core.benchmark import run_scrape_benchmark, environment, isolated_settings
+from core.models import Publication
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = ('Benchmarks run_full_scrape against the local fixture portal for several worker counts and delays. '
+            'Writes the scraped publications to the configured database: use a local one.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--publications', type=int, default=500, help='Publications on the fixture portal')
+        parser.add_argument('--page-size', type=int, default=50, help='Listing page size (sets pagination depth)')
+        parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8, 12])
+        parser.add_argument('--delays', type=float, nargs='+', default=[0.0, 0.35],
+                            help='Per-page politeness delays to compare')
+        parser.add_argument('--backend', choices=['http', 'selenium'], default='http')
+        parser.add_argument('--listing-latency', type=float, default=0.05, help='Seconds added to each listing response')
+        parser.add_argument('--detail-latency', type=float, default=0.1, help='Seconds added to each detail response')
+        parser.add_argument('--jitter', type=float, default=0.05, help='Up to this many extra seconds per response')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with an error')
+        parser.add_argument('--error-status', type=int, default=503)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the JSON results to this file instead of stdout')
+        parser.add_argument('--force', action='store_true', help='Run even if the database already has publications')
+
+    def handle(self, *args, **options):
+        if Publication.objects.exists() and not options['force']:
+            raise CommandError("The database already has publications and the benchmark adds fixture ones; "
+                               "point it at a scratch database or pass --force")
+
+        with isolated_settings():
+            report = {'environment': environment()}
+            report.update(run_scrape_benchmark(
+                options['publications'], options['workers'], options['delays'], backend=options['backend'],
+                page_size=options['page_size'], listing_latency=options['listing_latency'],
+                detail_latency=options['detail_latency'], jitter=options['jitter'],
+                error_rate=options['error_rate'], error_status=options['error_status'], seed=options['seed'],
+            ))
+        for run in report['runs']:
+            self.stderr.write(
+                f"{run['workers']} workers, delay {run['delay']}s: {run['pages_per_sec']} pages/s "
+                f"({run['pages_per_sec_per_worker']}/worker), {run['saved']} saved, {run['failed']} failed, "
+                f"+{run['rss_growth_mb']} MB peak; stages {run['stage_seconds']}"
+            )
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Benchmark results written to {options['output']}"))
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,75 @@
+import json
+import logging
+import importlib.util
+
+from django.core.management.base import BaseCommand, CommandError
+from core.analyzer import ensure_nltk_resources
+from core.benchmark import run_benchmark, environment, isolated_settings
+from core.models import Publication
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = ('Benchmarks index builds and search latency on synthetic corpora. '
+            'Replaces every Publication in the configured database: use a local one.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--docs', type=int, nargs='+', default=[1000, 10_000],
+                            help='Corpus sizes to benchmark, e.g. --docs 1000 100000 1000000')
+        parser.add_argument('--queries', type=int, default=200, help='Distinct queries per ranking')
+        parser.add_argument('--repeat', type=int, default=1, help='Warm (cached) passes over the queries')
+        parser.add_argument('--rankings', nargs='+', default=['tfidf', 'bm25'])
+        parser.add_argument('--limit', type=int, help='?limit= sent with each search')
+        parser.add_argument('--fields', help='?fields= sent with each search')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per insert while loading a corpus')
+        parser.add_argument('--cache', choices=['locmem', 'fakeredis', 'default'], default='locmem',
+                            help="Cache backend; 'default' uses CACHES from settings (and overwrites the live index keys)")
+        parser.add_argument('--output', help='Write the JSON results to this file instead of stdout')
+        parser.add_argument('--force', action='store_true', help='Run even if the database already has publications')
+
+    def handle(self, *args, **options):
+        if Publication.objects.exists() and not options['force']:
+            raise CommandError("The database already has publications and the benchmark deletes them; "
+                               "point it at a scratch database or pass --force")
+        if options['cache'] == 'fakeredis' and importlib.util.find_spec('fakeredis') is None:
+            raise CommandError("--cache fakeredis needs the fakeredis package")
+        ensure_nltk_resources()
+
+        with isolated_settings(options['cache']):
+            report = {'environment': environment(), 'runs': []}
+            for num_docs in options['docs']:
+                logger.info(f"Benchmarking search on {num_docs} synthetic publications")
+                run = run_benchmark(
+                    num_docs, num_queries=options['queries'], seed=options['seed'], rankings=options['rankings'],
+                    limit=options['limit'], fields=options['fields'], repeat=options['repeat'],
+                    batch_size=options['batch_size'],
+                )
+                report['runs'].append(run)
+                for ranking, stats in run['queries'].items():
+                    if stats['errors']:
+                        self.stderr.write(self.style.ERROR(
+                            f"{num_docs} docs: {ranking} had {stats['errors']} failed requests "
+                            f"(status codes {stats['error_statuses']})"
+                        ))
+                    if not stats['miss']['count']:
+                        continue
+                    self.stderr.write(
+                        f"{num_docs} docs: build {run['build']['seconds']}s, peak RSS {run['build']['peak_rss_mb']} MB; "
+                        f"{ranking} p50/p95/p99 {stats['miss']['p50_ms']}/{stats['miss']['p95_ms']}/"
+                        f"{stats['miss']['p99_ms']} ms"
+                    )
+
+        errors = sum(stats['errors'] for run in report['runs'] for stats in run['queries'].values())
+        # Latencies of a run with failed requests are not comparable; mark the whole report
+        report['failed'] = errors > 0
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+            if not errors:
+                self.stdout.write(self.style.SUCCESS(f"Benchmark results written to {options['output']}"))
+        else:
+            self.stdout.write(output)
+        if errors:
+            raise CommandError(f"{errors} search requests failed; the latency figures above exclude them")
@@ -1,5 +1,6 @@
+from django.conf import settings
 from django.core.management.base import BaseCommand
-from core.utils import build_tfidf_and_index, ensure_nltk_resources
+from core.utils import build_tfidf_and_index, ensure_nltk_resources, index_build_lock
 import logging
 
 logger = logging.getLogger(__name__)
@@ -10,6 +11,10 @@ class Command(BaseCommand):
     def handle(self, *args, **kwargs):
         logger.info("Starting TF-IDF cache rebuild")
         ensure_nltk_resources()
-        documents, vectorizer, tfidf_matrix = build_tfidf_and_index()
-        doc_count = len(documents)
+        with index_build_lock(wait=settings.SEARCH_INDEX_BUILD_LOCK_TIMEOUT) as acquired:
+            if not acquired:
+                self.stderr.write(self.style.ERROR("Another TF-IDF rebuild is still running"))
+                return
+            models = build_tfidf_and_index('command')
+        doc_count = models['tfidf'].num_docs
         self.stdout.write(self.style.SUCCESS(f"TF-IDF cache rebuilt successfully: {doc_count} documents processed"))
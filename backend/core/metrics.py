@@ -0,0 +1,210 @@
+# core/metrics.py
+import time
+import logging
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Optional, Sequence
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Seconds; search phases are mostly sub-millisecond, index loads and builds much longer
+PHASE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+LOAD_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+
+# What caused an index build; counted in the shared cache because builds run
+# in Celery workers and management commands, not in the processes serving /metrics
+BUILD_TRIGGERS = ('command', 'scrape', 'search', 'cold_start', 'warmup', 'delta', 'delta_fallback', 'benchmark', 'manual')
+INDEX_BUILDS_KEY = 'metrics:index_builds:{}'
+INDEX_BUILD_MS_KEY = 'metrics:index_build_ms:{}'
+
+
+class Histogram:
+    """Cumulative-bucket histogram with one label, rendered in Prometheus text format."""
+
+    def __init__(self, name: str, documentation: str, label: str, buckets: Sequence[float]):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counts: Dict[str, List[int]] = {}
+        self._sums: Dict[str, float] = {}
+
+    def observe(self, value: str, seconds: float):
+        # The last slot counts observations above every bucket (+Inf only)
+        slot = bisect_left(self.buckets, seconds)
+        with self._lock:
+            counts = self._counts.get(value)
+            if counts is None:
+                counts = self._counts[value] = [0] * (len(self.buckets) + 1)
+                self._sums[value] = 0.0
+            counts[slot] += 1
+            self._sums[value] += seconds
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {value: (list(counts), self._sums[value]) for value, counts in self._counts.items()}
+        for value, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{self.label}="{value}",le="{bound}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{self.name}_bucket{{{self.label}="{value}",le="+Inf"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{self.label}="{value}"}} {total}')
+            lines.append(f'{self.name}_count{{{self.label}="{value}"}} {cumulative}')
+        return lines
+
+
+search_phase_seconds = Histogram(
+    'search_phase_seconds', 'Time spent in each phase of a search request.', 'phase', PHASE_BUCKETS,
+)
+suggest_phase_seconds = Histogram(
+    'suggest_phase_seconds', 'Time spent in each phase of a type-ahead suggest request.', 'phase', PHASE_BUCKETS,
+)
+index_load_seconds = Histogram(
+    'search_index_load_seconds', 'Time to load a published index generation into this process.', 'source',
+    LOAD_BUCKETS,
+)
+
+
+# ---------------------- Request Timing ----------------------
+
+class PhaseTimer:
+    """Wall time per named phase of one request, recorded into ``histogram``."""
+
+    def __init__(self, histogram: Histogram = search_phase_seconds):
+        self.histogram = histogram
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.notes: Dict[str, str] = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def note(self, name: str, value: str):
+        self.notes[name] = value
+
+    def finish(self, record: bool = True):
+        self.phases['total'] = time.perf_counter() - self.started
+        if record:
+            for name, seconds in self.phases.items():
+                self.histogram.observe(name, seconds)
+
+    def server_timing(self) -> str:
+        """Phase breakdown as a Server-Timing header value (durations in milliseconds)."""
+        entries = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in self.phases.items()]
+        entries += [f'{name};desc="{value}"' for name, value in self.notes.items()]
+        return ', '.join(entries)
+
+
+class NullTimer:
+    """Stand-in when neither metrics nor profiling is on: every call is a no-op."""
+
+    phases: Dict[str, float] = {}
+    _context = nullcontext()
+
+    def phase(self, name: str):
+        return self._context
+
+    def note(self, name: str, value: str):
+        pass
+
+    def finish(self, record: bool = True):
+        pass
+
+
+NULL_TIMER = NullTimer()
+
+
+def phase_timer(enabled: bool, histogram: Histogram = search_phase_seconds):
+    return PhaseTimer(histogram) if enabled else NULL_TIMER
+
+
+# ---------------------- Index Builds ----------------------
+
+def record_index_build(trigger: str, seconds: float):
+    """Count a full build or delta by trigger in the shared cache; never raises."""
+    if not settings.SEARCH_METRICS_ENABLED:
+        return
+    try:
+        for key, amount in ((INDEX_BUILDS_KEY.format(trigger), 1), (INDEX_BUILD_MS_KEY.format(trigger), int(seconds * 1000))):
+            cache.add(key, 0, timeout=None)
+            cache.incr(key, amount)
+    except Exception as e:
+        logger.debug(f"Failed to record index build metrics: {e}")
+
+
+# ---------------------- Exposition ----------------------
+
+def _metric(lines: List[str], name: str, kind: str, documentation: str, samples: Dict[str, float]):
+    lines.append(f"# HELP {name} {documentation}")
+    lines.append(f"# TYPE {name} {kind}")
+    for labels, value in samples.items():
+        lines.append(f"{name}{{{labels}}} {value}" if labels else f"{name} {value}")
+
+
+def render_metrics(index_data: Optional[Dict], cache_stats: Dict) -> str:
+    """Prometheus text exposition of this process's search metrics plus the shared build counters.
+
+    ``index_data`` is the index resident in this process (None if nothing is
+    loaded yet); nothing here triggers a load or a rebuild.
+    """
+    from .utils import INDEX_QUEUE_SEQ_KEY, INDEX_QUEUE_DONE_KEY, TFIDF_META_KEY
+
+    lines = search_phase_seconds.render() + suggest_phase_seconds.render() + index_load_seconds.render()
+
+    if index_data is not None:
+        indexes = index_data['indexes']
+        _metric(lines, 'search_index_documents', 'gauge', 'Documents in the resident index.',
+                {f'ranking="{r}"': index.num_docs for r, index in sorted(indexes.items())})
+        _metric(lines, 'search_index_vocabulary_terms', 'gauge', 'Terms in the resident index vocabulary.',
+                {f'ranking="{r}"': len(index.vocabulary) for r, index in sorted(indexes.items())})
+        _metric(lines, 'search_index_postings', 'gauge', 'Postings in the resident index.',
+                {f'ranking="{r}"': int(index.post_rows.shape[0]) for r, index in sorted(indexes.items())})
+        _metric(lines, 'search_index_generation', 'gauge', 'Generation id of the resident index.',
+                {'': index_data['generation'] or 0})
+        if index_data.get('suggest') is not None:
+            _metric(lines, 'search_suggest_entries', 'gauge', 'Entries in the resident type-ahead suggestion index.',
+                    {'': len(index_data['suggest'])})
+        if index_data.get('authors') is not None:
+            _metric(lines, 'search_author_index_authors', 'gauge', 'Authors in the resident author postings.',
+                    {'': index_data['authors'].num_authors})
+
+    tiers = cache_stats['tiers']
+    _metric(lines, 'search_result_cache_requests_total', 'counter', 'Searches by the tier that answered them.',
+            {f'tier="{tier}"': stats['count'] for tier, stats in sorted(tiers.items())})
+    _metric(lines, 'search_result_cache_entries', 'gauge', 'Entries in the in-process result cache.',
+            {'': cache_stats['entries']})
+
+    try:
+        keys = [INDEX_BUILDS_KEY.format(t) for t in BUILD_TRIGGERS] + [INDEX_BUILD_MS_KEY.format(t) for t in BUILD_TRIGGERS]
+        shared = cache.get_many(keys + [INDEX_QUEUE_SEQ_KEY, INDEX_QUEUE_DONE_KEY, TFIDF_META_KEY])
+    except Exception as e:
+        logger.warning(f"Failed to read shared index metrics: {e}")
+        shared = None
+    if shared is not None:
+        _metric(lines, 'search_index_builds_total', 'counter', 'Index builds and deltas published, by trigger.',
+                {f'trigger="{t}"': shared.get(INDEX_BUILDS_KEY.format(t), 0) for t in BUILD_TRIGGERS})
+        _metric(lines, 'search_index_build_seconds_total', 'counter', 'Time spent in index builds, by trigger.',
+                {f'trigger="{t}"': shared.get(INDEX_BUILD_MS_KEY.format(t), 0) / 1000 for t in BUILD_TRIGGERS})
+        queued, done = shared.get(INDEX_QUEUE_SEQ_KEY, 0), shared.get(INDEX_QUEUE_DONE_KEY, 0)
+        _metric(lines, 'search_index_updates_queued_total', 'counter',
+                'Publication changes queued for the index by model signals.', {'': queued})
+        _metric(lines, 'search_index_updates_pending', 'gauge', 'Queued changes not yet applied to the index.',
+                {'': max(queued - done, 0)})
+        meta = shared.get(TFIDF_META_KEY)
+        if meta:
+            _metric(lines, 'search_index_last_build_seconds', 'gauge', 'Duration of the last full build.',
+                    {'': meta.get('build_seconds', 0.0)})
+    return '\n'.join(lines) + '\n'
@@ -9,6 +9,11 @@ class Publication(models.Model):
     published_date = models.CharField(max_length=100, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Change detection for incremental scrapes
+    content_hash = models.CharField(max_length=40, blank=True, default='')
+    etag = models.CharField(max_length=200, blank=True, default='')
+    last_modified = models.CharField(max_length=100, blank=True, default='')
+    last_scraped_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         indexes = [
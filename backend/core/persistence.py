@@ -0,0 +1,206 @@
+# core/persistence.py
+import hashlib
+import logging
+from datetime import timedelta
+from typing import Dict, Iterable, List, Set, Tuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Publication, Author
+
+logger = logging.getLogger(__name__)
+
+AuthorKey = Tuple[str, str]
+PUBLICATION_UPDATE_FIELDS = [
+    'title', 'published_date', 'abstract', 'updated_at',
+    'content_hash', 'etag', 'last_modified', 'last_scraped_at',
+]
+
+
+def _author_key(auth: Dict) -> AuthorKey:
+    return auth['name'].strip(), auth.get('profile_url') or ''
+
+
+def content_hash(rec: Dict) -> str:
+    """Fingerprint of the fields we store, independent of author order."""
+    authors = sorted(f"{name}\t{url}" for name, url in map(_author_key, rec['authors']))
+    parts = [rec['title'], rec.get('published_date') or '', rec.get('abstract') or ''] + authors
+    return hashlib.sha1('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+def _dedupe(records: Iterable[Dict]) -> List[Dict]:
+    """Last record wins for a repeated link."""
+    return list({rec['link']: rec for rec in records}.values())
+
+
+def _resolve_authors(keys: Set[AuthorKey]) -> Dict[AuthorKey, int]:
+    """Map (name, profile_url) to author ids, creating missing authors in one insert."""
+    ids: Dict[AuthorKey, int] = {}
+    existing = Author.objects.filter(name__in={name for name, _ in keys}).order_by('id')
+    for author_id, name, profile_url in existing.values_list('id', 'name', 'profile_url'):
+        # Oldest row wins if historical duplicates exist
+        ids.setdefault((name, profile_url), author_id)
+
+    missing = [key for key in keys if key not in ids]
+    if missing:
+        created = Author.objects.bulk_create([Author(name=name, profile_url=url) for name, url in missing])
+        for key, author in zip(missing, created):
+            if author.pk is not None:
+                ids[key] = author.pk
+        if len(ids) < len(keys):
+            # Backend did not return primary keys; look the new rows up
+            for author_id, name, profile_url in Author.objects.filter(
+                name__in={name for name, _ in missing}
+            ).order_by('id').values_list('id', 'name', 'profile_url'):
+                ids.setdefault((name, profile_url), author_id)
+    return ids
+
+
+def _publication_fields(rec: Dict, scraped_at) -> Dict:
+    return {
+        'title': rec['title'],
+        'published_date': rec['published_date'],
+        'abstract': rec['abstract'],
+        'content_hash': content_hash(rec),
+        'etag': rec.get('etag') or '',
+        'last_modified': rec.get('last_modified') or '',
+        'last_scraped_at': scraped_at,
+    }
+
+
+def _persist_chunk(records: List[Dict]):
+    now = timezone.now()
+    Publication.objects.bulk_create(
+        [Publication(link=rec['link'], **_publication_fields(rec, now)) for rec in records],
+        update_conflicts=True,
+        unique_fields=['link'],
+        update_fields=PUBLICATION_UPDATE_FIELDS,
+    )
+    pub_ids = dict(
+        Publication.objects.filter(link__in=[rec['link'] for rec in records]).values_list('link', 'id')
+    )
+
+    author_ids = _resolve_authors({_author_key(auth) for rec in records for auth in rec['authors']})
+    wanted = {
+        (pub_ids[rec['link']], author_ids[_author_key(auth)])
+        for rec in records for auth in rec['authors']
+    }
+
+    # Diff the author links against what is stored instead of clearing them
+    Through = Author.publications.through
+    current = {
+        (pub_id, author_id): link_id
+        for link_id, pub_id, author_id in Through.objects.filter(
+            publication_id__in=pub_ids.values()
+        ).values_list('id', 'publication_id', 'author_id')
+    }
+    stale = [link_id for pair, link_id in current.items() if pair not in wanted]
+    if stale:
+        Through.objects.filter(id__in=stale).delete()
+    Through.objects.bulk_create(
+        [Through(publication_id=pub_id, author_id=author_id) for pub_id, author_id in wanted - current.keys()],
+        ignore_conflicts=True,
+    )
+
+
+def _persist_record(rec: Dict):
+    """Row-by-row path, used to isolate the bad record when a chunk fails."""
+    pub, _ = Publication.objects.update_or_create(
+        link=rec['link'],
+        defaults=_publication_fields(rec, timezone.now()),
+    )
+    author_ids = _resolve_authors({_author_key(auth) for auth in rec['authors']})
+    pub.authors.set(author_ids.values())
+
+
+def persist_publications(records: Iterable[Dict], chunk_size: int = 500) -> List[str]:
+    """Upsert scraped publications and their authors; returns the links that failed.
+
+    Records are written in chunks, each in its own short transaction, with a
+    handful of queries per chunk regardless of its size.
+    """
+    records = _dedupe(records)
+    failed: List[str] = []
+    for start in range(0, len(records), chunk_size):
+        chunk = records[start:start + chunk_size]
+        try:
+            with transaction.atomic():
+                _persist_chunk(chunk)
+        except Exception as e:
+            logger.warning(f"Bulk save of {len(chunk)} publications failed ({e}); retrying one by one")
+            for rec in chunk:
+                try:
+                    with transaction.atomic():
+                        _persist_record(rec)
+                except Exception as e:
+                    logger.error(f"Failed to save publication {rec['link']}: {e}")
+                    failed.append(rec['link'])
+    return failed
+
+
+# ---------------------- Change Detection ----------------------
+
+def known_links(links: Iterable[str]) -> Set[str]:
+    """Subset of ``links`` already stored."""
+    return set(Publication.objects.filter(link__in=list(links)).values_list('link', flat=True))
+
+
+def scrape_state(links: Iterable[str]) -> Dict[str, Dict]:
+    """Stored hash, HTTP validators and last scrape time for known links."""
+    rows = Publication.objects.filter(link__in=list(links)).values(
+        'link', 'content_hash', 'etag', 'last_modified', 'last_scraped_at'
+    )
+    return {row.pop('link'): row for row in rows}
+
+
+def split_recent(items: List[Dict], state: Dict[str, Dict], recheck_after: int) -> Tuple[List[Dict], List[Dict]]:
+    """Split listing items into (to fetch, scraped less than ``recheck_after`` seconds ago)."""
+    cutoff = timezone.now() - timedelta(seconds=recheck_after)
+    fetch, recent = [], []
+    for item in items:
+        scraped_at = state.get(item['link'], {}).get('last_scraped_at')
+        (recent if scraped_at and scraped_at >= cutoff else fetch).append(item)
+    return fetch, recent
+
+
+def split_changed(records: List[Dict], state: Dict[str, Dict]) -> Tuple[List[Dict], List[Dict]]:
+    """Split scraped records into (new or changed content, same content as stored)."""
+    changed, unchanged = [], []
+    for rec in records:
+        stored = state.get(rec['link'])
+        if stored and stored['content_hash'] == content_hash(rec):
+            unchanged.append(rec)
+        else:
+            changed.append(rec)
+    return changed, unchanged
+
+
+def mark_scraped(links: Iterable[str]) -> int:
+    """Record a scrape that found no changes without touching ``updated_at``."""
+    links = list(links)
+    if not links:
+        return 0
+    return Publication.objects.filter(link__in=links).update(last_scraped_at=timezone.now())
+
+
+def save_scraped(records: List[Dict], not_modified: Iterable[str] = (), incremental: bool = True,
+                 chunk_size: int = 500) -> Tuple[List[str], List[str]]:
+    """Persist one batch of scrape output; returns (links with new or changed content, failed links).
+
+    In incremental mode records whose content hash matches the stored one
+    are not rewritten (only their scrape time and HTTP validators are).
+    """
+    state = scrape_state(rec['link'] for rec in records) if incremental else {}
+    changed, unchanged = split_changed(records, state)
+    # Same content but new HTTP validators: store them, but nothing changed for the index
+    revalidated = [
+        rec for rec in unchanged
+        if (rec.get('etag') or '', rec.get('last_modified') or '')
+        != (state[rec['link']]['etag'], state[rec['link']]['last_modified'])
+    ]
+    failed = persist_publications(changed + revalidated, chunk_size=chunk_size)
+    revalidated_links = {rec['link'] for rec in revalidated}
+    mark_scraped(list(not_modified) + [rec['link'] for rec in unchanged if rec['link'] not in revalidated_links])
+    failed_links = set(failed)
+    return [rec['link'] for rec in changed if rec['link'] not in failed_links], failed
@@ -0,0 +1,165 @@
+# core/pipeline.py
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# How often a producer blocked on a full queue checks that its consumers are still running
+PUT_POLL_SECONDS = 1.0
+
+
+class QueueAbandoned(RuntimeError):
+    """Raised by ``WorkQueue.put`` when the queue is full and nothing is left to drain it."""
+
+
+class WorkQueue:
+    """Bounded queue of scrape jobs shared by a pool of worker threads.
+
+    Producers ``put`` items (blocking while ``maxsize`` jobs are waiting,
+    which is what throttles the listing stage) and ``close`` the queue when
+    done. Workers ``get`` jobs until the queue is closed and drained, then
+    report each one as ``succeeded`` or ``errored``. Errored jobs are
+    re-queued with exponential backoff until they run out of attempts;
+    retries bypass the size bound so a worker never blocks on its own queue.
+    A producer passing ``alive`` stops waiting, with QueueAbandoned, once
+    it returns False, so a pool whose workers all crashed cannot hang it.
+    """
+
+    def __init__(self, max_retries: int = 0, backoff: float = 0.0, maxsize: int = 0,
+                 items: Optional[Iterable[Dict]] = None):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.maxsize = maxsize
+        self.total = 0
+        self.done = 0
+        self.failed: List[Dict] = []
+        self._jobs = deque()
+        self._active = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        if items is not None:
+            for item in items:
+                self.put(item)
+            self.close()
+
+    def put(self, item: Dict, alive: Optional[Callable[[], bool]] = None):
+        with self._cond:
+            while self.maxsize and len(self._jobs) >= self.maxsize:
+                if alive is not None and not alive():
+                    raise QueueAbandoned(f"{len(self._jobs)} jobs waiting and no consumer left")
+                self._cond.wait(PUT_POLL_SECONDS if alive is not None else None)
+            self._jobs.append({'item': item, 'attempt': 0, 'not_before': 0.0})
+            self.total += 1
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def get(self) -> Optional[Dict]:
+        """Next job, or None once the queue is closed and every job (including retries) has finished."""
+        with self._cond:
+            while not self._jobs:
+                if self._closed and self._active == 0:
+                    return None
+                self._cond.wait()
+            job = self._jobs.popleft()
+            self._active += 1
+            self._cond.notify_all()
+        wait = job['not_before'] - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        return job
+
+    def succeeded(self, job: Dict):
+        with self._cond:
+            self.done += 1
+            self._active -= 1
+            self._cond.notify_all()
+
+    def errored(self, job: Dict, error: Exception) -> bool:
+        """Re-queue the job if it has attempts left; returns False once it is given up on."""
+        link = job['item'].get('link')
+        with self._cond:
+            self._active -= 1
+            if job['attempt'] < self.max_retries:
+                delay = self.backoff * (2 ** job['attempt'])
+                logger.warning(f"Retrying {link} in {delay:.1f}s after: {error}")
+                self._jobs.append({'item': job['item'], 'attempt': job['attempt'] + 1,
+                                   'not_before': time.monotonic() + delay})
+                self._cond.notify_all()
+                return True
+            logger.error(f"Giving up on {link}: {error}")
+            self.failed.append(job['item'])
+            self.done += 1
+            self._cond.notify_all()
+            return False
+
+
+class BatchWriter:
+    """Background thread that saves pipeline output in batches as it arrives.
+
+    ``put`` blocks once ``maxsize`` items are waiting, so a slow database
+    slows the scrapers down instead of letting results pile up in memory.
+    ``flush`` is called with at most ``batch_size`` items at a time; a
+    batch it raises on is logged and kept in ``failed``, with the exception
+    in ``errors``, so the caller can report it once the writer is closed.
+    """
+
+    def __init__(self, flush: Callable[[List[Any]], None], batch_size: int, maxsize: int = 0):
+        self.flush = flush
+        self.batch_size = batch_size
+        self.queue = WorkQueue(maxsize=maxsize)
+        self.errors: List[Exception] = []
+        self.failed: List[Any] = []
+        self._thread = threading.Thread(target=self._run, name='scrape-writer', daemon=True)
+
+    def start(self) -> 'BatchWriter':
+        self._thread.start()
+        return self
+
+    def put(self, item: Any):
+        self.queue.put(item, alive=self._thread.is_alive)
+
+    def _write(self, batch: List[Any]):
+        try:
+            self.flush(batch)
+        except Exception as e:
+            logger.error(f"Failed to write batch of {len(batch)}: {e}", exc_info=True)
+            self.errors.append(e)
+            self.failed.extend(batch)
+
+    def _run(self):
+        batch: List[Any] = []
+        try:
+            while True:
+                job = self.queue.get()
+                if job is None:
+                    break
+                batch.append(job['item'])
+                self.queue.succeeded(job)
+                if len(batch) >= self.batch_size:
+                    self._write(batch)
+                    batch = []
+            if batch:
+                self._write(batch)
+        finally:
+            # This thread's own database connection
+            connections.close_all()
+
+    def close(self):
+        """Flush whatever is left and wait for the writer to finish."""
+        self.queue.close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
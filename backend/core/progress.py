@@ -0,0 +1,140 @@
+# core/progress.py
+import time
+import logging
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+PROGRESS = 'PROGRESS'
+
+OK, FALLBACK, RETRY, FAILED = 'ok', 'fallback', 'retry', 'failed'
+
+
+class ScrapeProgress:
+    """Thread-safe scrape counters, published as Celery task state.
+
+    Stages may overlap (the scrape is pipelined), so each stage accumulates
+    its own wall time and ``stage`` in the snapshot lists the ones active
+    right now. ``publish`` is throttled to one state update per
+    ``interval`` seconds unless forced.
+    """
+
+    def __init__(self, task=None, interval: float = 2.0):
+        self.task = task
+        self.interval = interval
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._last_publish = 0.0
+        self._active: Dict[str, int] = defaultdict(int)
+        self._stage_seconds: Dict[str, float] = defaultdict(float)
+        self._details_started = None
+        self._last_detail = None
+        self.listing_done = False
+        self.counts = {
+            'pages_listed': 0, 'links_listed': 0, 'details_queued': 0,
+            'details_done': 0, 'details_failed': 0, 'fallbacks': 0, 'retries': 0, 'saved': 0,
+            'write_failed': 0,
+        }
+        self._workers: Dict[str, Dict] = {}
+
+    # ---------------------- Recording ----------------------
+
+    @contextmanager
+    def stage(self, name: str):
+        with self._lock:
+            self._active[name] += 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active[name] -= 1
+                self._stage_seconds[name] += time.monotonic() - start
+            self.publish()
+
+    def page_listed(self, links: int):
+        with self._lock:
+            self.counts['pages_listed'] += 1
+            self.counts['links_listed'] += links
+        self.publish()
+
+    def queued(self, n: int):
+        with self._lock:
+            self.counts['details_queued'] += n
+            if self._details_started is None and n:
+                self._details_started = time.monotonic()
+
+    def detail_done(self, seconds: float, outcome: str = OK):
+        """Record one detail fetch by the calling worker thread."""
+        name = threading.current_thread().name
+        with self._lock:
+            self._last_detail = time.monotonic()
+            worker = self._workers.setdefault(name, {'pages': 0, 'errors': 0, 'busy_seconds': 0.0})
+            worker['busy_seconds'] += seconds
+            if outcome == OK:
+                worker['pages'] += 1
+                self.counts['details_done'] += 1
+            else:
+                worker['errors'] += 1
+                key = {FALLBACK: 'fallbacks', RETRY: 'retries', FAILED: 'details_failed'}[outcome]
+                self.counts[key] += 1
+        self.publish()
+
+    def saved(self, n: int):
+        with self._lock:
+            self.counts['saved'] += n
+        self.publish()
+
+    def write_failed(self, n: int):
+        """Record ``n`` scraped pages whose batch could not be saved."""
+        with self._lock:
+            self.counts['write_failed'] += n
+        self.publish(force=True)
+
+    # ---------------------- Reporting ----------------------
+
+    def timings(self) -> Dict[str, float]:
+        with self._lock:
+            return {name: round(seconds, 3) for name, seconds in self._stage_seconds.items()}
+
+    def snapshot(self) -> Dict:
+        now = time.monotonic()
+        with self._lock:
+            counts = dict(self.counts)
+            finished = counts['details_done'] + counts['details_failed'] + counts['fallbacks']
+            remaining = max(counts['details_queued'] - finished, 0)
+            # Once every detail page is done the rate stops decaying during indexing
+            end = self._last_detail if self.listing_done and not remaining and self._last_detail else now
+            details_elapsed = end - self._details_started if self._details_started else 0.0
+            rate = finished / details_elapsed if details_elapsed > 0 else 0.0
+            return {
+                'stage': sorted(name for name, n in self._active.items() if n > 0),
+                **counts,
+                'listing_done': self.listing_done,
+                'elapsed': round(now - self.started, 3),
+                'pages_per_sec': round(rate, 3),
+                # Lower bound while the listing is still running
+                'eta_seconds': round(remaining / rate, 1) if rate else None,
+                'stage_seconds': {name: round(s, 3) for name, s in self._stage_seconds.items()},
+                'workers': {
+                    name: dict(w, busy_seconds=round(w['busy_seconds'], 3),
+                               avg_seconds=round(w['busy_seconds'] / max(w['pages'] + w['errors'], 1), 3))
+                    for name, w in self._workers.items()
+                },
+            }
+
+    def publish(self, force: bool = False):
+        if self.task is None or not self.task.request.id:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_publish < self.interval:
+                return
+            self._last_publish = now
+        try:
+            self.task.update_state(state=PROGRESS, meta=self.snapshot())
+        except Exception as e:
+            logger.debug(f"Failed to publish scrape progress: {e}")
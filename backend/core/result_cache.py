@@ -0,0 +1,120 @@
+# core/result_cache.py
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_KEY = 'search_results:{generation}:{digest}'
+
+LOCAL, SHARED, MISS = 'local', 'shared', 'miss'
+
+
+class QueryResultCache:
+    """Two-tier cache of hydrated search result pages.
+
+    Entries are keyed by the analyzed query terms and the index generation
+    they were computed against, so publishing a new generation invalidates
+    everything at once. The in-process tier is a bounded LRU; misses fall
+    through to the shared cache (Redis) before the query is actually run.
+    """
+
+    def __init__(self, max_entries: int, timeout: int):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, Dict]' = OrderedDict()
+        self._generation = None
+        self._counts = {LOCAL: 0, SHARED: 0, MISS: 0}
+        self._seconds = {LOCAL: 0.0, SHARED: 0.0, MISS: 0.0}
+
+    @staticmethod
+    def make_key(generation, tokens: List[str], **params) -> str:
+        # Term order does not affect TF-IDF scoring, so "risk credit" and
+        # "credit risk" share an entry.
+        normalized = ' '.join(sorted(tokens))
+        extra = '&'.join(f'{name}={params[name]}' for name in sorted(params))
+        digest = hashlib.sha1(f'{normalized}?{extra}'.encode('utf-8')).hexdigest()
+        return RESULT_CACHE_KEY.format(generation=generation, digest=digest)
+
+    def _reset_if_stale(self, generation):
+        # Caller holds self._lock
+        if generation != self._generation:
+            self._entries.clear()
+            self._generation = generation
+
+    def get(self, key: str, generation) -> Tuple[Optional[Dict], str]:
+        """Return (results or None, tier that answered)."""
+        with self._lock:
+            self._reset_if_stale(generation)
+            results = self._entries.get(key)
+            if results is not None:
+                self._entries.move_to_end(key)
+                return results, LOCAL
+
+        if self.timeout:
+            results = cache.get(key)
+            if results is not None:
+                self._remember(key, generation, results)
+                return results, SHARED
+        return None, MISS
+
+    def set(self, key: str, generation, results: Dict):
+        self._remember(key, generation, results)
+        if self.timeout:
+            try:
+                cache.set(key, results, timeout=self.timeout)
+            except Exception as e:
+                logger.warning(f"Failed to store search results in shared cache: {e}")
+
+    def _remember(self, key: str, generation, results: Dict):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._reset_if_stale(generation)
+            self._entries[key] = results
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop this process's entries and counters (the shared tier expires on its own)."""
+        with self._lock:
+            self._entries.clear()
+            self._counts = dict.fromkeys(self._counts, 0)
+            self._seconds = dict.fromkeys(self._seconds, 0.0)
+
+    def record(self, tier: str, seconds: float):
+        with self._lock:
+            self._counts[tier] += 1
+            self._seconds[tier] += seconds
+
+    def stats(self) -> Dict:
+        """Per-process hit rate and mean latency per tier."""
+        with self._lock:
+            total = sum(self._counts.values())
+            hits = self._counts[LOCAL] + self._counts[SHARED]
+            return {
+                'pid': os.getpid(),
+                'generation': self._generation,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'requests': total,
+                'hit_rate': hits / total if total else 0.0,
+                'tiers': {
+                    tier: {
+                        'count': count,
+                        'avg_ms': 1000 * self._seconds[tier] / count if count else 0.0,
+                    }
+                    for tier, count in self._counts.items()
+                },
+            }
+
+
+result_cache = QueryResultCache(settings.SEARCH_RESULT_CACHE_SIZE, settings.SEARCH_RESULT_CACHE_TIMEOUT)
@@ -0,0 +1,142 @@
+# core/search_index.py
+import time
+import pickle
+import logging
+import threading
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .engine import TFIDF
+from .metrics import index_load_seconds
+from .segment import current_generation, load_segment
+from .utils import (
+    TFIDF_CACHE_KEY, TFIDF_VERSION_KEY, TFIDF_META_KEY, rebuild_index_single_flight,
+    request_index_rebuild, should_refresh_early, wait_for_index,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class TfidfIndexHolder:
+    """Keeps the search indexes (one per ranking) resident in the current worker process.
+
+    The index is only reloaded when the generation published under
+    TFIDF_VERSION_KEY differs from the one already loaded, so a steady-state
+    search costs a single small cache read. Loads prefer the memory-mapped
+    segment on disk and fall back to the pickled payload in the cache.
+
+    Once any index is resident, searches never wait for a rebuild: a stale
+    index keeps being served while a single background rebuild runs.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data: Optional[Dict] = None
+        self._generation = None
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def _is_current(self, generation) -> bool:
+        if self._data is None:
+            return False
+        # Without a published generation (e.g. Redis was flushed) keep serving what we have
+        return generation is None or generation == self._generation
+
+    def _set(self, indexes, generation, source: str, suggest=None, authors=None):
+        # 'index' stays the TF-IDF index for callers that don't pick a ranking
+        self._data = {
+            'indexes': indexes, 'index': indexes[TFIDF], 'suggest': suggest, 'authors': authors,
+            'generation': generation,
+        }
+        self._generation = generation
+        logger.info(
+            f"Loaded TF-IDF index generation {generation} from {source} "
+            f"({indexes[TFIDF].num_docs} documents, rankings: {', '.join(sorted(indexes))})"
+        )
+
+    def loaded(self) -> Optional[Dict]:
+        """The resident index, without checking for (or loading) a newer generation."""
+        return self._data
+
+    def _load_segment(self, generation=None) -> bool:
+        directory = settings.SEARCH_INDEX_DIR
+        if not directory:
+            return False
+        start = time.perf_counter()
+        if generation is None:
+            generation = current_generation(directory)
+        segment = load_segment(directory, generation) if generation is not None else None
+        if segment is None:
+            return False
+        index_load_seconds.observe('disk', time.perf_counter() - start)
+        self._set(segment['indexes'], generation, 'disk', segment['suggest'], segment['authors'])
+        return True
+
+    def _load_from_cache(self) -> bool:
+        start = time.perf_counter()
+        raw = cache.get(TFIDF_CACHE_KEY)
+        if not raw:
+            return False
+        data = pickle.loads(raw)
+        if 'indexes' not in data:
+            # Payload from before per-ranking indexes; wait for the next build
+            return False
+        index_load_seconds.observe('cache', time.perf_counter() - start)
+        self._set(data['indexes'], data.get('generation'), 'cache', data.get('suggest'), data.get('authors'))
+        return True
+
+    def _load(self, generation) -> bool:
+        if generation is not None:
+            return self._load_segment(generation) or self._load_from_cache()
+        # Nothing published in the cache: the last segment written on this host still serves
+        return self._load_segment() or self._load_from_cache()
+
+    def get(self) -> Optional[Dict]:
+        """Return the current index, reloading it only if a newer generation exists."""
+        values = cache.get_many([TFIDF_VERSION_KEY, TFIDF_META_KEY])
+        generation = values.get(TFIDF_VERSION_KEY)
+        if self._is_current(generation):
+            if generation is None:
+                request_index_rebuild("no generation published in the cache")
+            elif should_refresh_early(values.get(TFIDF_META_KEY), settings.SEARCH_INDEX_REFRESH_BETA):
+                request_index_rebuild("cached index close to expiry")
+            return self._data
+
+        with self._lock:
+            # Another thread may have reloaded while we waited for the lock
+            if self._is_current(generation):
+                return self._data
+            if self._load(generation):
+                return self._data
+            if self._data is not None:
+                # Newer generation announced but not loadable here: serve stale
+                request_index_rebuild(f"generation {generation} not loadable")
+                return self._data
+            if generation is not None:
+                # Built elsewhere but expired from the cache; don't block the request
+                request_index_rebuild(f"generation {generation} expired")
+                return None
+            return self._cold_start()
+
+    def _cold_start(self) -> Optional[Dict]:
+        """No index exists anywhere yet: build it once, other callers wait for it."""
+        logger.info("TF-IDF index missing from cache and disk, rebuilding")
+        if not rebuild_index_single_flight(trigger='cold_start'):
+            wait_for_index(settings.SEARCH_INDEX_COLD_START_WAIT)
+        if not self._load(cache.get(TFIDF_VERSION_KEY)):
+            self._data = None
+            self._generation = None
+        return self._data
+
+    def clear(self):
+        with self._lock:
+            self._data = None
+            self._generation = None
+
+
+# One holder per process; shared by every request handled by this worker
+tfidf_index = TfidfIndexHolder()
@@ -0,0 +1,191 @@
+# core/segment.py
+import os
+import json
+import shutil
+import logging
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+from .engine import InvertedIndex
+from .suggest import SuggestIndex, ARRAYS as SUGGEST_ARRAYS
+from .authors import AuthorIndex, ARRAYS as AUTHOR_ARRAYS
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the file layout below changes; older segments are ignored
+SEGMENT_FORMAT_VERSION = 2
+CURRENT_FILE = 'CURRENT'
+META_FILE = 'meta.json'
+VOCABULARY_FILE = 'vocabulary.json'
+SUGGEST_DIR = 'suggest'
+SUGGEST_TOP_FILE = 'top.json'
+AUTHORS_DIR = 'authors'
+AUTHOR_NAMES_FILE = 'names.json'
+AUTHOR_TOKENS_FILE = 'tokens.json'
+ARRAYS = ('term_ptr', 'post_rows', 'post_weights', 'max_weights', 'doc_ids', 'idf')
+
+# Index segment layout, one directory per generation and one index per ranking:
+#
+#   gen-<generation>/meta.json                  format version, generation, rankings
+#   gen-<generation>/<ranking>/meta.json        scoring, sizes
+#   gen-<generation>/<ranking>/vocabulary.json  terms in column order
+#   gen-<generation>/<ranking>/<array>.npy      CSR-style postings and per-term/doc arrays
+#   gen-<generation>/suggest/<array>.npy        sorted suggestion keys, texts and weights (optional)
+#   gen-<generation>/suggest/top.json           precomputed best suggestions of short prefixes
+#   gen-<generation>/authors/<array>.npy        author postings (name tokens, publications, facets)
+#   gen-<generation>/authors/names.json         author names by position
+#   gen-<generation>/authors/tokens.json        name tokens in row order
+#   CURRENT                                     name of the live segment directory
+#
+# Arrays are loaded with mmap_mode='r', so every worker on the host shares
+# the same page-cached copy instead of unpickling its own.
+
+
+def segment_name(generation: int) -> str:
+    return f'gen-{generation}'
+
+
+def _write_index(index: InvertedIndex, path: Path):
+    path.mkdir()
+    for name in ARRAYS:
+        np.save(path / f'{name}.npy', np.ascontiguousarray(getattr(index, name)))
+    terms = [None] * len(index.vocabulary)
+    for term, col in index.vocabulary.items():
+        terms[col] = term
+    with open(path / VOCABULARY_FILE, 'w') as fh:
+        json.dump(terms, fh)
+    with open(path / META_FILE, 'w') as fh:
+        json.dump({'scoring': index.scoring, 'num_docs': int(index.num_docs), 'num_terms': len(terms)}, fh)
+
+
+def _load_index(path: Path) -> InvertedIndex:
+    with open(path / META_FILE) as fh:
+        meta = json.load(fh)
+    with open(path / VOCABULARY_FILE) as fh:
+        vocabulary = {term: col for col, term in enumerate(json.load(fh))}
+    arrays = {name: np.load(path / f'{name}.npy', mmap_mode='r') for name in ARRAYS}
+    return InvertedIndex(
+        arrays['term_ptr'], arrays['post_rows'], arrays['post_weights'], arrays['doc_ids'],
+        vocabulary, arrays['idf'], max_weights=arrays['max_weights'], scoring=meta['scoring'],
+    )
+
+
+def _write_suggest(suggest: SuggestIndex, path: Path):
+    path.mkdir()
+    for name in SUGGEST_ARRAYS:
+        np.save(path / f'{name}.npy', np.ascontiguousarray(getattr(suggest, name)))
+    with open(path / SUGGEST_TOP_FILE, 'w') as fh:
+        json.dump(suggest.top, fh)
+
+
+def _load_suggest(path: Path) -> SuggestIndex:
+    arrays = {name: np.load(path / f'{name}.npy', mmap_mode='r') for name in SUGGEST_ARRAYS}
+    with open(path / SUGGEST_TOP_FILE) as fh:
+        top = json.load(fh)
+    return SuggestIndex(top=top, **arrays)
+
+
+def _write_authors(authors: AuthorIndex, path: Path):
+    path.mkdir()
+    for name in AUTHOR_ARRAYS:
+        np.save(path / f'{name}.npy', np.ascontiguousarray(getattr(authors, name)))
+    tokens = [None] * len(authors.tokens)
+    for token, row in authors.tokens.items():
+        tokens[row] = token
+    with open(path / AUTHOR_TOKENS_FILE, 'w') as fh:
+        json.dump(tokens, fh)
+    with open(path / AUTHOR_NAMES_FILE, 'w') as fh:
+        json.dump(authors.names, fh)
+
+
+def _load_authors(path: Path) -> AuthorIndex:
+    arrays = {name: np.load(path / f'{name}.npy', mmap_mode='r') for name in AUTHOR_ARRAYS}
+    with open(path / AUTHOR_TOKENS_FILE) as fh:
+        tokens = {token: row for row, token in enumerate(json.load(fh))}
+    with open(path / AUTHOR_NAMES_FILE) as fh:
+        names = json.load(fh)
+    return AuthorIndex(names=names, tokens=tokens, **arrays)
+
+
+def write_segment(indexes: Dict[str, InvertedIndex], directory: Path, generation: int, keep: int = 2,
+                  suggest: Optional[SuggestIndex] = None, authors: Optional[AuthorIndex] = None) -> Path:
+    """Write ``indexes`` (ranking name -> index), ``suggest`` and ``authors`` as a new segment and make it current."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(prefix='.tmp-', dir=directory))
+    try:
+        for ranking, index in indexes.items():
+            _write_index(index, tmp / ranking)
+        if suggest is not None:
+            _write_suggest(suggest, tmp / SUGGEST_DIR)
+        if authors is not None:
+            _write_authors(authors, tmp / AUTHORS_DIR)
+        with open(tmp / META_FILE, 'w') as fh:
+            json.dump({
+                'format_version': SEGMENT_FORMAT_VERSION,
+                'generation': generation,
+                'rankings': sorted(indexes),
+                'suggest': suggest is not None,
+                'authors': authors is not None,
+            }, fh)
+        target = directory / segment_name(generation)
+        os.rename(tmp, target)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    # Point CURRENT at the new segment with an atomic replace
+    pointer = directory / f'.{CURRENT_FILE}.tmp'
+    pointer.write_text(target.name)
+    os.replace(pointer, directory / CURRENT_FILE)
+    prune_segments(directory, keep)
+    return target
+
+
+def prune_segments(directory: Path, keep: int):
+    """Delete all but the ``keep`` newest segments (mapped files stay valid until unmapped)."""
+    segments = sorted(
+        (p for p in Path(directory).glob('gen-*') if p.is_dir()),
+        key=lambda p: int(p.name.split('-', 1)[1]),
+    )
+    for old in segments[:-keep] if keep > 0 else segments:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def current_generation(directory: Path) -> Optional[int]:
+    try:
+        name = (Path(directory) / CURRENT_FILE).read_text().strip()
+        return int(name.split('-', 1)[1])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def load_segment(directory: Path, generation: Optional[int] = None) -> Optional[Dict]:
+    """Memory-map a segment (the current one by default); None if unavailable.
+
+    Returns ``{'indexes': ranking name -> index, 'suggest': SuggestIndex or None,
+    'authors': AuthorIndex or None}``.
+    """
+    directory = Path(directory)
+    if generation is None:
+        generation = current_generation(directory)
+        if generation is None:
+            return None
+    path = directory / segment_name(generation)
+    try:
+        with open(path / META_FILE) as fh:
+            meta = json.load(fh)
+        if meta.get('format_version') != SEGMENT_FORMAT_VERSION:
+            logger.warning(f"Ignoring segment {path} with format {meta.get('format_version')}")
+            return None
+        return {
+            'indexes': {ranking: _load_index(path / ranking) for ranking in meta['rankings']},
+            'suggest': _load_suggest(path / SUGGEST_DIR) if meta.get('suggest') else None,
+            'authors': _load_authors(path / AUTHORS_DIR) if meta.get('authors') else None,
+        }
+    except (OSError, ValueError, KeyError) as e:
+        logger.debug(f"Segment {path} not loadable: {e}")
+        return None
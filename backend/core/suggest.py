@@ -0,0 +1,199 @@
+# core/suggest.py
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from .analyzer import WORD_RE
+
+TERM, AUTHOR, TITLE = 'term', 'author', 'title'
+KINDS = (TERM, AUTHOR, TITLE)
+ARRAYS = ('key_bytes', 'key_ptr', 'text_bytes', 'text_ptr', 'weights', 'kinds')
+
+
+def normalize(text: str) -> str:
+    """Lower-cased words separated by single spaces; punctuation is dropped."""
+    return ' '.join(WORD_RE.findall((text or '').lower()))
+
+
+def heaviest(weights: np.ndarray, limit: int) -> List[int]:
+    """Positions of the ``limit`` largest weights, heaviest first and ties in position order, in O(n)."""
+    if len(weights) > limit:
+        threshold = np.partition(weights, len(weights) - limit)[len(weights) - limit]
+        above = np.flatnonzero(weights > threshold)
+        ties = np.flatnonzero(weights == threshold)[:limit - len(above)]
+        candidates = np.concatenate([above, ties])
+    else:
+        candidates = np.arange(len(weights))
+    return sorted(candidates.tolist(), key=lambda i: (-int(weights[i]), i))
+
+
+class _Keys:
+    """Read-only sequence view of the sorted keys, so bisect can search them in place."""
+
+    def __init__(self, data: np.ndarray, ptr: np.ndarray):
+        self.data = data
+        self.ptr = ptr
+
+    def __len__(self):
+        return len(self.ptr) - 1
+
+    def __getitem__(self, i: int) -> bytes:
+        return self.data[self.ptr[i]:self.ptr[i + 1]].tobytes()
+
+
+class SuggestIndex:
+    """Type-ahead completions over titles, author names and frequent terms.
+
+    Normalized keys are stored UTF-8 encoded, concatenated and sorted, so the
+    completions of a prefix are one contiguous range found by two binary
+    searches; the ``limit`` heaviest entries of that range are returned.
+    For short prefixes, whose ranges cover a large part of the index, the
+    best entries are precomputed in ``top``.
+    """
+
+    def __init__(self, key_bytes, key_ptr, text_bytes, text_ptr, weights, kinds, top: Dict[str, List[int]]):
+        self.key_bytes = key_bytes
+        self.key_ptr = key_ptr
+        self.text_bytes = text_bytes
+        self.text_ptr = text_ptr
+        self.weights = weights
+        self.kinds = kinds
+        self.top = top
+        self._keys = _Keys(key_bytes, key_ptr)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_keys']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._keys = _Keys(self.key_bytes, self.key_ptr)
+
+    def text(self, i: int) -> str:
+        return self.text_bytes[self.text_ptr[i]:self.text_ptr[i + 1]].tobytes().decode()
+
+    def _range(self, prefix: str) -> Tuple[int, int]:
+        start = prefix.encode()
+        # 0xff never occurs in UTF-8, so it sorts after every key starting with the prefix
+        return bisect_left(self._keys, start), bisect_left(self._keys, start + b'\xff')
+
+    def _best(self, prefix: str, limit: int) -> List[int]:
+        top = self.top.get(prefix)
+        if top is not None and len(top) >= limit:
+            return list(top[:limit])
+        lo, hi = self._range(prefix)
+        return [lo + i for i in heaviest(self.weights[lo:hi], limit)]
+
+    def suggest(self, query: str, limit: int = 10) -> List[Dict]:
+        """Completions of ``query``, heaviest first.
+
+        When the whole query has fewer than ``limit`` completions, its last
+        word is completed as a term after the words before it.
+        """
+        prefix = normalize(query)
+        if not prefix or not len(self):
+            return []
+        suggestions = [self._entry(i) for i in self._best(prefix, limit)]
+        head, _, last = prefix.rpartition(' ')
+        if head and last and len(suggestions) < limit:
+            seen = {s['text'].lower() for s in suggestions}
+            for i in self._best(last, limit * 2):
+                if self.kinds[i] != KINDS.index(TERM):
+                    continue
+                entry = self._entry(i)
+                entry['text'] = f"{head} {entry['text']}"
+                if entry['text'] not in seen:
+                    suggestions.append(entry)
+                    seen.add(entry['text'])
+                if len(suggestions) == limit:
+                    break
+        return suggestions
+
+    def _entry(self, i: int) -> Dict:
+        return {'text': self.text(i), 'kind': KINDS[self.kinds[i]], 'weight': int(self.weights[i])}
+
+
+class SuggestBuilder:
+    """Collects suggestion sources while the search index is built.
+
+    Titles are fed one at a time; their words also provide the surface form
+    shown for each stemmed term (stems themselves are not words). Terms that
+    never occur in a title therefore get no suggestion.
+    """
+
+    def __init__(self, analyzer):
+        self.analyzer = analyzer
+        self._entries: Dict[Tuple[str, int], List] = {}
+        self._words: Counter = Counter()
+
+    def _add(self, kind: str, text: str, weight: int):
+        key = normalize(text)
+        if not key:
+            return
+        entry = self._entries.get((key, KINDS.index(kind)))
+        if entry is None:
+            self._entries[(key, KINDS.index(kind))] = [text.strip(), weight]
+        else:
+            entry[1] += weight
+
+    def add_title(self, title: str):
+        self._add(TITLE, title, 1)
+        self._words.update(WORD_RE.findall((title or '').lower()))
+
+    def add_authors(self, authors: Iterable[Tuple[str, int]]):
+        """``(name, publication count)`` pairs; names shared by several authors are merged."""
+        for name, publications in authors:
+            if publications:
+                self._add(AUTHOR, name, publications)
+
+    def add_terms(self, vocabulary: Dict[str, int], document_frequency: np.ndarray, min_df: int):
+        """Frequent stems (``vocabulary`` column -> ``document_frequency``), shown as their commonest title word."""
+        surface: Dict[str, Tuple[int, str]] = {}
+        stem, stop_words = self.analyzer.stem, self.analyzer.stop_words
+        for word, count in self._words.items():
+            if word in stop_words:
+                continue
+            term = stem(word)
+            if count > surface.get(term, (0, ''))[0]:
+                surface[term] = (count, word)
+        for term, (_, word) in surface.items():
+            col = vocabulary.get(term)
+            if col is not None and document_frequency[col] >= min_df:
+                self._add(TERM, word, int(document_frequency[col]))
+
+    def build(self, top_prefix_length: int, top_size: int, top_min_range: int) -> SuggestIndex:
+        entries = sorted((key.encode(), kind, text, weight) for (key, kind), (text, weight) in self._entries.items())
+        self._entries, self._words = {}, Counter()
+
+        key_ptr = np.zeros(len(entries) + 1, dtype=np.int64)
+        text_ptr = np.zeros(len(entries) + 1, dtype=np.int64)
+        encoded_texts = [text.encode() for _, _, text, _ in entries]
+        np.cumsum([len(key) for key, _, _, _ in entries], out=key_ptr[1:])
+        np.cumsum([len(text) for text in encoded_texts], out=text_ptr[1:])
+        key_bytes = np.frombuffer(b''.join(key for key, _, _, _ in entries), dtype=np.uint8)
+        text_bytes = np.frombuffer(b''.join(encoded_texts), dtype=np.uint8)
+        weights = np.array([weight for _, _, _, weight in entries], dtype=np.int32)
+        kinds = np.array([kind for _, kind, _, _ in entries], dtype=np.int8)
+
+        # Precompute the best entries of every short prefix with a large range
+        top: Dict[str, List[int]] = {}
+        keys = [key.decode() for key, _, _, _ in entries]
+        for length in range(1, top_prefix_length + 1):
+            start = 0
+            while start < len(keys):
+                prefix = keys[start][:length]
+                if len(prefix) < length:
+                    start += 1
+                    continue
+                end = bisect_left(keys, prefix + '\uffff', start)
+                if end - start >= max(top_min_range, top_size + 1):
+                    top[prefix] = [start + i for i in heaviest(weights[start:end], top_size)]
+                start = end
+        return SuggestIndex(key_bytes, key_ptr, text_bytes, text_ptr, weights, kinds, top)
+
@@ -1,27 +1,38 @@
 # scraper_app/tasks.py
-import os
 import time
 import json
 import logging
 import re
-from math import ceil
-from typing import List, Dict
+import hashlib
+import threading
+from uuid import uuid4
+from typing import Callable, List, Dict, Optional, Tuple
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from django.db import transaction
-from celery import shared_task
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+import requests
+from celery import shared_task, group, chord
+from celery.canvas import Signature
 from celery.utils.log import get_task_logger
+from celery.signals import worker_process_shutdown
 from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.firefox.service import Service as FirefoxService
-from selenium.webdriver.firefox.options import Options as FirefoxOptions
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
-from webdriver_manager.firefox import GeckoDriverManager
 
-from .models import Publication, Author
-from core.utils import build_tfidf_and_index  # Import TF-IDF rebuild utility
+from . import http_scraper
+from .driver_pool import driver_pool
+from .persistence import known_links, scrape_state, split_recent, save_scraped
+from .pipeline import WorkQueue, BatchWriter
+from .progress import ScrapeProgress, PROGRESS, RETRY, FAILED
+from .models import Publication
+from core.utils import (
+    apply_index_updates, suppress_index_updates, rebuild_index_single_flight, schedule_index_updates,
+    INDEX_UPDATE_SCHEDULED_KEY, INDEX_REBUILD_SCHEDULED_KEY
+)
 
 logger = get_task_logger(__name__)
 
@@ -29,6 +40,12 @@ BASE_URL = (
     "https://pureportal.coventry.ac.uk/en/organisations/fbl-school-of-economics-finance-and-accounting/publications/"
 )
 
+# Held while a distributed detail batch scrapes a link, so overlapping runs skip it
+SCRAPE_LINK_CLAIM_KEY = 'scrape_link:{}'
+# Detail pages finished by the batches of one distributed scrape
+SCRAPE_PROGRESS_KEY = 'scrape_progress:{}'
+SCRAPE_PROGRESS_TIMEOUT = 24 * 60 * 60
+
 FIRST_DIGIT = re.compile(r"\d")
 NAME_PAIR = re.compile(
     r"[A-Z][A-Za-z'’\-]+,\s*(?:[A-Z](?:\.)?)(?:\s*[A-Z](?:\.)?)*",
@@ -37,49 +54,6 @@ NAME_PAIR = re.compile(
 
 # ---------------------- Selenium Helpers ----------------------
 
-def build_firefox_options(headless: bool) -> FirefoxOptions:
-    opts = FirefoxOptions()
-    if headless:
-        opts.add_argument("--headless")
-    opts.add_argument("--window-size=1366,900")
-    opts.add_argument("--disable-gpu")
-    opts.add_argument("--no-sandbox")
-    opts.add_argument("--disable-dev-shm-usage")
-    opts.add_argument("--lang=en-US")
-    opts.add_argument("--disable-notifications")
-    opts.add_argument("--no-default-browser-check")
-    opts.add_argument("--disable-extensions")
-    opts.add_argument("--disable-popup-blocking")
-    opts.set_preference("dom.webnotifications.enabled", False)
-    opts.set_preference("general.useragent.override",
-                       "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:129.0) Gecko/20100101 Firefox/129.0")
-    return opts
-
-def make_driver(headless: bool = True) -> webdriver.Firefox:
-    """Create a Firefox WebDriver suitable for Celery / headless environments."""
-    try:
-        service = FirefoxService(
-            executable_path=GeckoDriverManager().install(),
-            log_output=open(os.devnull, 'w')  # suppress geckodriver logs
-        )
-
-        driver = webdriver.Firefox(service=service, options=build_firefox_options(headless=True))
-        driver.set_page_load_timeout(60)
-
-        # Hide webdriver detection
-        try:
-            driver.execute_script(
-                "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"
-            )
-        except Exception as e:
-            logger.warning(f"Failed to hide webdriver: {e}")
-
-        return driver
-
-    except Exception as e:
-        logger.error(f"Failed to start Firefox WebDriver: {e}", exc_info=True)
-        raise
-
 def accept_cookies_if_present(driver: webdriver.Firefox):
     try:
         btn = WebDriverWait(driver, 6).until(
@@ -92,8 +66,8 @@ def accept_cookies_if_present(driver: webdriver.Firefox):
 
 # ---------------------- Listing Pages ----------------------
 
-def scrape_listing_page(driver: webdriver.Firefox, page_idx: int) -> List[Dict]:
-    url = f"{BASE_URL}?page={page_idx}"
+def scrape_listing_page(driver: webdriver.Firefox, page_idx: int, base_url: str = BASE_URL) -> List[Dict]:
+    url = f"{base_url}?page={page_idx}"
     logger.info(f"Scraping listing page {page_idx + 1}: {url}")
     driver.get(url)
     try:
@@ -120,25 +94,22 @@ def scrape_listing_page(driver: webdriver.Firefox, page_idx: int) -> List[Dict]:
     logger.info(f"Found {len(rows)} publications on page {page_idx + 1}")
     return rows
 
-def gather_all_listing_links(max_pages: int, headless_listing: bool = False) -> List[Dict]:
-    driver = make_driver(headless_listing)
-    try:
-        driver.get(BASE_URL)
+def iter_listing_pages(max_pages: int, base_url: str = BASE_URL,
+                       cutoff: Optional[http_scraper.KnownLinkCutoff] = None, start_page: int = 0):
+    """Yield (page index, rows) for each listing page as soon as it is scraped."""
+    with driver_pool.driver() as driver:
+        driver.get(base_url)
         accept_cookies_if_present(driver)
-        all_rows: List[Dict] = []
-        for i in range(max_pages):
+        for i in range(start_page, max_pages):
             logger.info(f"Processing listing page {i + 1}/{max_pages}")
-            rows = scrape_listing_page(driver, i)
+            rows = scrape_listing_page(driver, i, base_url)
             if not rows:
                 logger.info(f"Empty at page {i + 1}; stopping early.")
-                break
-            all_rows.extend(rows)
-        # Dedupe by link
-        uniq = {r["link"]: r for r in all_rows}
-        logger.info(f"Collected {len(uniq)} unique publication links")
-        return list(uniq.values())
-    finally:
-        driver.quit()
+                return
+            yield i, rows
+            if cutoff is not None and cutoff.reached(rows):
+                logger.info(f"{cutoff.threshold} known links in a row at page {i + 1}; stopping early.")
+                return
 
 # ---------------------- Detail Pages ----------------------
 
@@ -209,97 +180,484 @@ def extract_detail_for_link(driver: webdriver.Firefox, link: str, title_hint: st
         "abstract": abstract_txt or ""
     }
 
-def worker_detail_batch(batch: List[Dict], headless: bool, delay: float) -> List[Dict]:
-    driver = make_driver(headless)
-    results: List[Dict] = []
-    try:
-        for i, item in enumerate(batch, 1):
-            try:
+def detail_worker(work: WorkQueue, delay: float, page_timeout: int, emit: Callable[[Tuple[str, object]], None],
+                  progress: Optional[ScrapeProgress] = None):
+    """Pull links until the queue is drained, borrowing a warm browser from the pool for each page."""
+    while True:
+        job = work.get()
+        if job is None:
+            return
+        item = job['item']
+        start = time.monotonic()
+        try:
+            # A browser that raises is retired by the pool; the retry gets a fresh one
+            with driver_pool.driver(page_timeout) as driver:
                 rec = extract_detail_for_link(driver, item["link"], item.get("title", ""), delay)
-                results.append(rec)
-                logger.info(f"[WORKER] {i}/{len(batch)} OK: {rec['title'][:60]}")
-            except WebDriverException as e:
-                logger.error(f"[WORKER] Error scraping {item['link']}: {e}")
-    finally:
-        driver.quit()
-    return results
+        except WebDriverException as e:
+            retried = work.errored(job, e)
+            if progress is not None:
+                progress.detail_done(time.monotonic() - start, RETRY if retried else FAILED)
+            continue
+        emit(('record', rec))
+        work.succeeded(job)
+        if progress is not None:
+            progress.detail_done(time.monotonic() - start)
+        logger.info(f"[WORKER] {work.done}/{work.total} OK: {rec['title'][:60]}")
+
+def run_detail_workers(work: WorkQueue, workers: int, delay: float, emit: Callable[[Tuple[str, object]], None],
+                       progress: Optional[ScrapeProgress] = None):
+    """Run ``workers`` browser threads against a shared work queue until it is closed and drained."""
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='selenium') as executor:
+        futures = [
+            executor.submit(detail_worker, work, delay, settings.SCRAPE_PAGE_TIMEOUT, emit, progress)
+            for _ in range(workers)
+        ]
+        for fut in as_completed(futures):
+            fut.result()
 
-def chunk(items: List[Dict], n: int) -> List[List[Dict]]:
-    if n <= 1:
-        return [items]
-    size = ceil(len(items) / n)
-    return [items[i:i + size] for i in range(0, len(items), size)]
+# ---------------------- Scrape Stages ----------------------
 
-# ---------------------- Celery Task ----------------------
+def listing_pages(session, base_url: str, max_pages: int,
+                  cutoff: Optional[http_scraper.KnownLinkCutoff] = None, start_page: int = 0):
+    """Yield listing rows page by page, over HTTP when a session is given and
+    with Selenium from the first page that fails to parse."""
+    next_page = start_page
+    if session is not None:
+        try:
+            for page, rows in http_scraper.iter_listing_pages(session, base_url, max_pages, cutoff, start_page):
+                next_page = page + 1
+                yield rows
+            return
+        except (requests.RequestException, http_scraper.PageNotParsed) as e:
+            logger.warning(f"[HTTP] Listing scrape failed at page {next_page + 1}, falling back to Selenium: {e}")
+    for _, rows in iter_listing_pages(max_pages, base_url, cutoff, start_page=next_page):
+        yield rows
+
+def select_for_scrape(rows: List[Dict], incremental: bool) -> Tuple[List[Dict], int]:
+    """Drop recently scraped links in incremental mode and attach the stored
+    HTTP validators to the rest; returns (rows to fetch, number skipped)."""
+    if not incremental:
+        return rows, 0
+    # Only publications we already have need their stored state
+    state = scrape_state(r['link'] for r in rows)
+    rows, recent = split_recent(rows, state, settings.SCRAPE_RECHECK_AFTER)
+    for r in rows:
+        stored = state.get(r['link'])
+        if stored:
+            r['validators'] = {'etag': stored['etag'], 'last_modified': stored['last_modified']}
+    return rows, len(recent)
+
+def event_link(event: Tuple[str, object]) -> str:
+    """Link of a ('record', rec) or ('not_modified', link) pipeline event."""
+    kind, payload = event
+    return payload['link'] if kind == 'record' else payload
+
+def save_scrape_batch(events: List[Tuple[str, object]], incremental: bool) -> Dict:
+    """Persist ('record', rec) / ('not_modified', link) events and queue index deltas for changed rows."""
+    records = [payload for kind, payload in events if kind == 'record']
+    not_modified = [payload for kind, payload in events if kind == 'not_modified']
+    # Index updates are issued explicitly, so signals are skipped
+    with suppress_index_updates():
+        changed, failed = save_scraped(records, not_modified, incremental,
+                                       chunk_size=settings.SCRAPE_PERSIST_CHUNK_SIZE)
+    if incremental and changed:
+        changed_ids = Publication.objects.filter(link__in=changed).values_list('id', flat=True)
+        schedule_index_updates(list(changed_ids))
+    return {'count': len(records), 'changed': len(changed), 'not_modified': len(not_modified), 'failed_urls': failed}
+
+# ---------------------- Celery Tasks ----------------------
+
+@worker_process_shutdown.connect
+def close_driver_pool(**kwargs):
+    driver_pool.close()
+
+@shared_task
+def update_tfidf_index():
+    """Apply queued Publication changes to the TF-IDF index incrementally."""
+    # Clear the debounce flag first so changes made from now on schedule a new run
+    cache.delete(INDEX_UPDATE_SCHEDULED_KEY)
+    applied = apply_index_updates()
+    if applied is None and cache.add(INDEX_UPDATE_SCHEDULED_KEY, True, timeout=settings.SEARCH_INDEX_UPDATE_DEBOUNCE + 60):
+        update_tfidf_index.apply_async(countdown=settings.SEARCH_INDEX_UPDATE_DEBOUNCE)
+    return applied
+
+@shared_task
+def rebuild_tfidf_index():
+    """Full rebuild requested by the search path (stale or missing index)."""
+    try:
+        return rebuild_index_single_flight()
+    finally:
+        cache.delete(INDEX_REBUILD_SCHEDULED_KEY)
 
 @shared_task(bind=True)
-def run_full_scrape(self, max_pages: int = 50, workers: int = 8, delay: float = 0.35, headless_listing: bool = False):
-    logger.info(f"Starting scrape task: max_pages={max_pages}, workers={workers}, delay={delay}")
+def run_full_scrape(self, max_pages: int = 50, workers: int = 8, delay: float = 0.35, headless_listing: bool = False,
+                    backend: Optional[str] = None, base_url: str = BASE_URL, incremental: Optional[bool] = None,
+                    distributed: Optional[bool] = None):
+    """Scrape, persist and re-index publications.
+
+    ``backend`` is 'http' (pooled HTTP client + lxml, Selenium only for pages
+    that fail to parse) or 'selenium'; defaults to settings.SCRAPE_BACKEND.
+
+    ``incremental`` (default settings.SCRAPE_INCREMENTAL) stops the listing
+    after a run of known links, skips recently scraped pages, revalidates
+    the rest with conditional requests and only re-indexes publications
+    whose content changed. Otherwise every page is fetched and the index is
+    rebuilt from scratch.
+
+    The stages run as a pipeline: each listing page is queued for the detail
+    workers as soon as it is parsed, and scraped records are saved in
+    batches while scraping continues. Bounded queues apply backpressure, so
+    memory stays flat and rows saved before a crash are kept.
+
+    With ``distributed`` (default settings.SCRAPE_DISTRIBUTED) the task is
+    replaced by a canvas of subtasks spread over all Celery workers; see
+    distributed_scrape().
+
+    Browsers always run headless; ``headless_listing`` is only accepted so
+    calls with the old signature keep working.
+    """
+    backend = backend or settings.SCRAPE_BACKEND
+    if incremental is None:
+        incremental = settings.SCRAPE_INCREMENTAL
+    if distributed is None:
+        distributed = settings.SCRAPE_DISTRIBUTED
+    if distributed:
+        return self.replace(distributed_scrape(
+            max_pages=max_pages, workers=workers, delay=delay, backend=backend, base_url=base_url, incremental=incremental, task_id=self.request.id,
+        ))
+    mode = 'incremental' if incremental else 'full'
+    logger.info(f"Starting {mode} scrape task: max_pages={max_pages}, workers={workers}, delay={delay}, backend={backend}")
     start_time = time.time()
+    progress = ScrapeProgress(self, settings.SCRAPE_PROGRESS_INTERVAL)
+    stats = {'listed': 0, 'skipped_recent': 0, 'count': 0, 'changed': 0, 'not_modified': 0}
+    failed_urls: List[str] = []
 
-    # Stage 1: Listing
-    listing = gather_all_listing_links(max_pages, headless_listing)
-    if not listing:
+    # Stage 3: batched writer, fed by the detail workers below
+    def write_batch(events: List[Tuple[str, object]]):
+        with progress.stage('saving'):
+            try:
+                saved = save_scrape_batch(events, incremental)
+            except Exception:
+                # BatchWriter logs the error and keeps the batch; its links are reported as failed
+                progress.write_failed(len(events))
+                raise
+        for key in ('count', 'changed', 'not_modified'):
+            stats[key] += saved[key]
+        failed_urls.extend(saved['failed_urls'])
+        progress.saved(saved['count'] + saved['not_modified'])
+        logger.info(f"Saved {saved['count']} publications ({saved['changed']} changed), {stats['count']} so far")
+
+    cutoff = http_scraper.KnownLinkCutoff(known_links, settings.SCRAPE_KNOWN_RUN_STOP) if incremental else None
+    session = http_scraper.make_session(pool_size=workers) if backend == 'http' else None
+
+    # Stage 1 feeds stage 2 page by page; put() blocks while the detail queue is full,
+    # and gives up once ``alive`` reports that no detail worker is left to drain it
+    def feed(work: WorkQueue, alive: Callable[[], bool]):
+        seen = set()
+        try:
+            with progress.stage('listing'):
+                for rows in listing_pages(session, base_url, max_pages, cutoff):
+                    rows = [r for r in rows if r['link'] not in seen]
+                    seen.update(r['link'] for r in rows)
+                    stats['listed'] += len(rows)
+                    progress.page_listed(len(rows))
+                    rows, skipped = select_for_scrape(rows, incremental)
+                    stats['skipped_recent'] += skipped
+                    progress.queued(len(rows))
+                    for r in rows:
+                        work.put(r, alive=alive)
+        finally:
+            progress.listing_done = True
+            work.close()
+            if backend != 'http':
+                # Runs in its own thread for the Selenium backend
+                connections.close_all()
+
+    # Stage 2: detail workers pull from the listing queue and push into the writer
+    fallback: List[Dict] = []
+    with BatchWriter(write_batch, settings.SCRAPE_WRITE_BATCH_SIZE, maxsize=settings.SCRAPE_QUEUE_SIZE) as writer:
+        if session is not None:
+            work = WorkQueue(maxsize=settings.SCRAPE_QUEUE_SIZE)
+            with progress.stage('details'):
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='http') as executor:
+                    futures = [
+                        executor.submit(http_scraper.detail_worker, session, work, delay, writer.put,
+                                        fallback.append, progress)
+                        for _ in range(workers)
+                    ]
+                    feed(work, alive=lambda: not all(fut.done() for fut in futures))
+                    for fut in as_completed(futures):
+                        fut.result()
+            session.close()
+            if fallback:
+                logger.info(f"{len(fallback)} detail pages left for the Selenium fallback")
+                progress.queued(len(fallback))
+                work = WorkQueue(settings.SCRAPE_DETAIL_MAX_RETRIES, settings.SCRAPE_RETRY_BACKOFF, items=fallback)
+                with progress.stage('selenium_fallback'):
+                    run_detail_workers(work, max(1, min(workers, len(fallback))), delay, writer.put, progress)
+                failed_urls.extend(item['link'] for item in work.failed)
+        else:
+            work = WorkQueue(settings.SCRAPE_DETAIL_MAX_RETRIES, settings.SCRAPE_RETRY_BACKOFF,
+                             maxsize=settings.SCRAPE_QUEUE_SIZE)
+            details_finished = threading.Event()
+            with progress.stage('details'), ThreadPoolExecutor(max_workers=1) as executor:
+                # Browsers start while the listing is still being walked
+                listing = executor.submit(feed, work, lambda: not details_finished.is_set())
+                try:
+                    run_detail_workers(work, workers, delay, writer.put, progress)
+                finally:
+                    details_finished.set()
+                listing.result()
+            failed_urls.extend(item['link'] for item in work.failed)
+    failed_urls.extend(event_link(event) for event in writer.failed)
+    write_errors = [str(e) for e in writer.errors]
+
+    if not stats['listed']:
         logger.warning("No publications found during listing phase")
         return {'status': 'No publications found', 'elapsed_time': time.time() - start_time}
 
-    # Stage 2: Detail scraping in parallel
-    batches = chunk(listing, workers)
-    all_results: List[Dict] = []
+    # Stage 4: Rebuild TF-IDF cache; incremental runs queued deltas per batch above
+    if not incremental:
+        try:
+            logger.info("Rebuilding TF-IDF cache after scraping...")
+            with progress.stage('indexing'):
+                progress.publish(force=True)
+                # Wait out any build already in flight: it may predate the rows saved above
+                rebuilt = rebuild_index_single_flight(wait=settings.SEARCH_INDEX_BUILD_LOCK_TIMEOUT, trigger='scrape')
+            if rebuilt:
+                logger.info("TF-IDF cache rebuilt successfully")
+        except Exception as e:
+            logger.error(f"Failed to rebuild TF-IDF cache: {e}")
 
-    # ThreadPoolExecutor for non-blocking scraping
-    with ThreadPoolExecutor(max_workers=workers) as executor:
-        futures = [executor.submit(worker_detail_batch, batch, True, delay) for batch in batches]
-        for fut in as_completed(futures):
-            all_results.extend(fut.result() or [])
-            logger.info(f"Batch completed, total results so far: {len(all_results)}")
+    elapsed_time = time.time() - start_time
+    snapshot = progress.snapshot()
+    logger.info(f"Scrape task completed in {elapsed_time:.2f}s, {stats['count']} publications processed, "
+                f"{stats['changed']} changed, {len(failed_urls)} failed; stage seconds: {snapshot['stage_seconds']}")
+    if write_errors:
+        logger.error(f"{len(write_errors)} batches could not be saved: {write_errors}")
+    return {
+        'status': 'Completed with write errors' if write_errors else 'Completed',
+        'mode': mode,
+        **stats,
+        'backend': backend,
+        'selenium_fallbacks': len(fallback),
+        'failed_urls': failed_urls,
+        'write_errors': write_errors,
+        'elapsed_time': elapsed_time,
+        'stage_seconds': snapshot['stage_seconds'],
+        'pages_per_sec': snapshot['pages_per_sec'],
+        'workers': snapshot['workers'],
+    }
 
-    # Stage 3: Save to DB
-    failed_urls = []
-    with transaction.atomic():
-        for rec in all_results:
-            try:
-                pub, created = Publication.objects.get_or_create(
-                    link=rec['link'],
-                    defaults={
-                        'title': rec['title'],
-                        'published_date': rec['published_date'],
-                        'abstract': rec['abstract']
-                    }
-                )
-                if not created:
-                    pub.title = rec['title']
-                    pub.published_date = rec['published_date']
-                    pub.abstract = rec['abstract']
-                    pub.save()
-
-                pub.authors.clear()
-                for auth in rec['authors']:
-                    author, _ = Author.objects.get_or_create(
-                        name=auth['name'],
-                        defaults={'profile_url': auth.get('profile_url')}
-                    )
-                    if auth.get('profile_url') and author.profile_url != auth['profile_url']:
-                        author.profile_url = auth['profile_url']
-                        author.save()
-                    pub.authors.add(author)
-            except Exception as e:
-                logger.error(f"Failed to save publication {rec['link']}: {e}")
-                failed_urls.append(rec['link'])
-
-    # Stage 4: Rebuild TF-IDF cache
+# ---------------------- Distributed Scrape ----------------------
+
+def distributed_scrape(**options) -> Signature:
+    """Canvas for a scrape spread across Celery workers.
+
+    Listing shards of SCRAPE_LISTING_SHARD_PAGES pages run as a group; their
+    links are split into detail batches of SCRAPE_DETAIL_BATCH_SIZE that run
+    as a chord, each saving its own results, and the chord callback
+    aggregates the stats and rebuilds the index for full scrapes.
+
+    Incremental runs list in a single shard: the known-link cutoff has to
+    see the pages in order to stop the listing, and shards starting further
+    down would each fetch pages the cutoff makes unnecessary.
+    """
+    options['started_at'] = time.time()
+    shard = options['max_pages'] if options['incremental'] else settings.SCRAPE_LISTING_SHARD_PAGES
+    shards = group(
+        scrape_listing_shard.s(first, min(first + shard, options['max_pages']), options)
+        for first in range(0, options['max_pages'], shard)
+    )
+    return shards | dispatch_detail_batches.s(options)
+
+def report_distributed_progress(options: Dict, stage: str, done: int = 0):
+    """Publish progress under the id of the run_full_scrape task that was replaced."""
+    task_id = options.get('task_id')
+    if not task_id:
+        return
+    total = options.get('details_total', 0)
+    details_elapsed = time.time() - options.get('details_started_at', options['started_at'])
+    rate = done / details_elapsed if done and details_elapsed > 0 else 0.0
     try:
-        logger.info("Rebuilding TF-IDF cache after scraping...")
-        build_tfidf_and_index()
-        logger.info("TF-IDF cache rebuilt successfully")
+        run_full_scrape.update_state(task_id=task_id, state=PROGRESS, meta={
+            'stage': [stage],
+            'distributed': True,
+            'links_listed': options.get('listed', 0),
+            'details_queued': total,
+            'details_done': done,
+            'batches': options.get('batches', 0),
+            'elapsed': round(time.time() - options['started_at'], 3),
+            'pages_per_sec': round(rate, 3),
+            'eta_seconds': round((total - done) / rate, 1) if rate else None,
+        })
     except Exception as e:
-        logger.error(f"Failed to rebuild TF-IDF cache: {e}")
+        logger.debug(f"Failed to publish scrape progress: {e}")
+
+@shared_task
+def scrape_listing_shard(first_page: int, last_page: int, options: Dict) -> Dict:
+    """Listing pages [first_page, last_page), already filtered for an incremental run."""
+    started = time.monotonic()
+    incremental = options['incremental']
+    session = http_scraper.make_session() if options['backend'] == 'http' else None
+    # Incremental runs have a single shard, so this cutoff covers the whole listing
+    cutoff = http_scraper.KnownLinkCutoff(known_links, settings.SCRAPE_KNOWN_RUN_STOP) if incremental else None
+    rows: List[Dict] = []
+    try:
+        for page_rows in listing_pages(session, options['base_url'], last_page, cutoff,
+                                       start_page=first_page):
+            rows.extend(page_rows)
+    finally:
+        if session is not None:
+            session.close()
+    uniq = list({r['link']: r for r in rows}.values())
+    selected, skipped = select_for_scrape(uniq, incremental)
+    logger.info(f"Listing shard {first_page}-{last_page}: {len(uniq)} links, {skipped} scraped recently")
+    return {'rows': selected, 'listed': len(uniq), 'skipped_recent': skipped, 'seconds': time.monotonic() - started}
 
-    elapsed_time = time.time() - start_time
-    logger.info(f"Scrape task completed in {elapsed_time:.2f}s, {len(all_results)} publications processed, {len(failed_urls)} failed")
+@shared_task(bind=True)
+def dispatch_detail_batches(self, shards: List[Dict], options: Dict):
+    rows = list({r['link']: r for shard in shards for r in shard['rows']}.values())
+    summary = {
+        'listed': sum(shard['listed'] for shard in shards),
+        'skipped_recent': sum(shard['skipped_recent'] for shard in shards),
+        'listing_seconds': sum(shard['seconds'] for shard in shards),
+    }
+    size = settings.SCRAPE_DETAIL_BATCH_SIZE
+    batches = [rows[i:i + size] for i in range(0, len(rows), size)]
+    logger.info(f"Dispatching {len(rows)} detail pages in {len(batches)} batches")
+    options = dict(options, listed=summary['listed'], details_total=len(rows), batches=len(batches),
+                   details_started_at=time.time())
+    report_distributed_progress(options, 'details')
+    if not batches:
+        return finalize_scrape([], summary, options)
+    return self.replace(chord(
+        (scrape_detail_batch.s(batch, options) for batch in batches),
+        finalize_scrape.s(summary, options),
+    ))
+
+def scrape_claimed(items: List[Dict], options: Dict, progress: ScrapeProgress) -> Dict:
+    """Scrape and save the detail pages a batch has claimed."""
+    events: List[Tuple[str, object]] = []
+    lock = threading.Lock()
+
+    def emit(event):
+        with lock:
+            events.append(event)
+
+    workers, delay = options['workers'], options['delay']
+    fallback: List[Dict] = items
+    if options['backend'] == 'http' and items:
+        fallback = []
+        session = http_scraper.make_session(pool_size=workers)
+        work = WorkQueue(items=items)
+        with progress.stage('details'), ThreadPoolExecutor(max_workers=workers, thread_name_prefix='http') as executor:
+            futures = [
+                executor.submit(http_scraper.detail_worker, session, work, delay, emit, fallback.append, progress)
+                for _ in range(min(workers, len(items)))
+            ]
+            for fut in as_completed(futures):
+                fut.result()
+        session.close()
+    failed: List[str] = []
+    if fallback:
+        work = WorkQueue(settings.SCRAPE_DETAIL_MAX_RETRIES, settings.SCRAPE_RETRY_BACKOFF, items=fallback)
+        with progress.stage('selenium_fallback'):
+            run_detail_workers(work, max(1, min(workers, len(fallback))), delay, emit, progress)
+        failed = [item['link'] for item in work.failed]
+
+    with progress.stage('saving'):
+        saved = save_scrape_batch(events, options['incremental'])
+    saved['failed_urls'] += failed
+    saved['selenium_fallbacks'] = len(fallback) if options['backend'] == 'http' else 0
+    return saved
+
+@shared_task(bind=True, rate_limit=settings.SCRAPE_DETAIL_BATCH_RATE_LIMIT, acks_late=True)
+def scrape_detail_batch(self, items: List[Dict], options: Dict) -> Dict:
+    """Scrape and save one batch of detail pages.
+
+    Safe to run more than once: rows are upserted by link, unchanged content
+    is detected, and links claimed by another worker are skipped. Claims
+    hold the task id, so a batch redelivered after its worker died takes
+    its own claims over instead of skipping them. Errors are returned in
+    the result rather than raised, so one bad batch does not fail the chord
+    and the scrape is still finalized.
+    """
+    owner = self.request.id or uuid4().hex
+    claims = {
+        item['link']: SCRAPE_LINK_CLAIM_KEY.format(hashlib.sha1(item['link'].encode('utf-8')).hexdigest())
+        for item in items
+    }
+
+    def claim(key: str) -> bool:
+        return cache.add(key, owner, timeout=settings.SCRAPE_LINK_CLAIM_TIMEOUT) or cache.get(key) == owner
+
+    claimed = [item for item in items if claim(claims[item['link']])]
+    progress = ScrapeProgress()
+    try:
+        saved = scrape_claimed(claimed, options, progress)
+    except Exception as e:
+        logger.error(f"Detail batch of {len(claimed)} links failed: {e}", exc_info=True)
+        saved = {'count': 0, 'changed': 0, 'not_modified': 0, 'selenium_fallbacks': 0,
+                 'failed_urls': [item['link'] for item in claimed], 'error': f"{type(e).__name__}: {e}"}
+    finally:
+        cache.delete_many([claims[item['link']] for item in claimed])
+        if options.get('task_id'):
+            key = SCRAPE_PROGRESS_KEY.format(options['task_id'])
+            cache.add(key, 0, timeout=SCRAPE_PROGRESS_TIMEOUT)
+            report_distributed_progress(options, 'details', cache.incr(key, len(items)))
+    saved['claimed_elsewhere'] = len(items) - len(claimed)
+    saved['stage_seconds'] = progress.timings()
+    return saved
+
+@shared_task
+def finalize_scrape(batches: List[Dict], summary: Dict, options: Dict) -> Dict:
+    """Chord callback: aggregate batch stats and rebuild the index after a full scrape."""
+    incremental = options['incremental']
+    if not summary['listed']:
+        logger.warning("No publications found during listing phase")
+        return {'status': 'No publications found', 'elapsed_time': time.time() - options['started_at']}
+    if options.get('task_id'):
+        cache.delete(SCRAPE_PROGRESS_KEY.format(options['task_id']))
+    summary = dict(summary)
+    # Summed over shards and batches, i.e. worker-seconds rather than wall time
+    stage_seconds = {'listing': summary.pop('listing_seconds', 0.0)}
+    totals = dict(summary, count=0, changed=0, not_modified=0, selenium_fallbacks=0, claimed_elsewhere=0)
+    failed_urls: List[str] = []
+    batch_errors: List[str] = []
+    for batch in batches:
+        for key in ('count', 'changed', 'not_modified', 'selenium_fallbacks', 'claimed_elsewhere'):
+            totals[key] += batch[key]
+        failed_urls.extend(batch['failed_urls'])
+        if batch.get('error'):
+            batch_errors.append(batch['error'])
+        for stage, seconds in batch['stage_seconds'].items():
+            stage_seconds[stage] = stage_seconds.get(stage, 0.0) + seconds
+
+    if not incremental:
+        try:
+            logger.info("Rebuilding TF-IDF cache after scraping...")
+            report_distributed_progress(options, 'indexing')
+            started = time.monotonic()
+            if rebuild_index_single_flight(wait=settings.SEARCH_INDEX_BUILD_LOCK_TIMEOUT, trigger='scrape'):
+                logger.info("TF-IDF cache rebuilt successfully")
+            stage_seconds['indexing'] = time.monotonic() - started
+        except Exception as e:
+            logger.error(f"Failed to rebuild TF-IDF cache: {e}")
+
+    elapsed_time = time.time() - options['started_at']
+    logger.info(f"Distributed scrape completed in {elapsed_time:.2f}s, {totals['count']} publications processed, "
+                f"{totals['changed']} changed, {len(failed_urls)} failed")
+    if batch_errors:
+        logger.error(f"{len(batch_errors)} detail batches failed: {batch_errors}")
     return {
-        'status': 'Completed',
-        'count': len(all_results),
+        'status': 'Completed with batch errors' if batch_errors else 'Completed',
+        'mode': 'incremental' if incremental else 'full',
+        'distributed': True,
+        **totals,
+        'backend': options['backend'],
         'failed_urls': failed_urls,
-        'elapsed_time': elapsed_time
+        'batch_errors': batch_errors,
+        'elapsed_time': elapsed_time,
+        'stage_seconds': {stage: round(seconds, 3) for stage, seconds in stage_seconds.items()},
     }
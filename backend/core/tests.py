@@ -1,3 +1,869 @@
-from django.test import TestCase
+import time
+import hashlib
+import tempfile
+from string import Template
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import requests
+from celery import current_app
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+
+from .analyzer import get_analyzer
+from .authors import AuthorIndex
+from .bm25 import FIELDS, Bm25Model
+from .benchmark import SyntheticCorpus, isolated_settings, percentiles, run_benchmark, run_scrape_benchmark
+from .fixture_server import PurePortalFixtureServer, DETAIL_PREFIX, TESTDATA_DIR
+from .http_scraper import PageNotParsed, parse_detail, parse_listing
+from .metrics import Histogram
+from .models import Author, Publication
+from .persistence import persist_publications
+from .pipeline import BatchWriter, QueueAbandoned, WorkQueue
+from .result_cache import result_cache
+from .search_index import tfidf_index
+from .utils import (
+    INDEX_CACHE_TIMEOUT, INDEX_QUEUE_GAP_KEY, INDEX_QUEUE_GAP_TIMEOUT, INDEX_QUEUE_ITEM_KEY, INDEX_QUEUE_SEQ_KEY,
+    apply_index_updates, build_tfidf_and_index, index_build_lock, pending_index_updates, queue_index_update,
+    suppress_index_updates,
+)
+from .suggest import SuggestBuilder
+from . import driver_pool, tasks
+from .tasks import SCRAPE_LINK_CLAIM_KEY, run_full_scrape, scrape_detail_batch
+from .tfidf import TermCounter, TfidfModel
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'search-tests'}}
+
+
+class SyntheticCorpusTests(SimpleTestCase):
+    def test_documents_are_reproducible_per_slice(self):
+        corpus = SyntheticCorpus(50, seed=3)
+        everything = list(corpus.documents())
+        self.assertEqual(list(corpus.documents(20, 30)), everything[20:30])
+        self.assertEqual(list(SyntheticCorpus(50, seed=3).documents()), everything)
+        self.assertEqual(len({d['link'] for d in everything}), 50)
+
+    def test_abstract_lengths_and_queries(self):
+        corpus = SyntheticCorpus(400, seed=1)
+        lengths = sorted(len(d['abstract'].split()) for d in corpus.documents() if d['abstract'])
+        self.assertTrue(120 <= lengths[len(lengths) // 2] <= 230)
+        queries = corpus.queries(20)
+        self.assertEqual(queries, corpus.queries(20))
+        self.assertTrue(all(1 <= len(q.split()) <= 3 for q in queries))
+
+    def test_percentiles(self):
+        stats = percentiles([i / 1000 for i in range(1, 101)])
+        self.assertEqual(stats['count'], 100)
+        self.assertLessEqual(stats['p50_ms'], stats['p95_ms'])
+        self.assertLessEqual(stats['p95_ms'], stats['p99_ms'])
+        self.assertLessEqual(stats['p99_ms'], stats['max_ms'])
+
+
+@override_settings(CACHES=LOCMEM_CACHE, SEARCH_INDEX_BUILD_PROCESSES=1)
+class SearchIndexTestCase(TestCase):
+    """Searches against an index published to a temporary directory and a local-memory cache."""
+
+    def setUp(self):
+        self.index_dir = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(SEARCH_INDEX_DIR=self.index_dir.name)
+        self.settings_override.enable()
+        cache.clear()
+        tfidf_index.clear()
+        result_cache.clear()
+
+    def tearDown(self):
+        tfidf_index.clear()
+        self.settings_override.disable()
+        self.index_dir.cleanup()
+
+    def publish(self, publications, trigger='test'):
+        """Save (title, abstract, author names) rows as publications 1, 2, ... and build the index.
+
+        Returns the created authors by name.
+        """
+        authors = {}
+        with suppress_index_updates():
+            for n, (title, abstract, names) in enumerate(publications, 1):
+                pub = Publication.objects.create(id=n, title=title, abstract=abstract,
+                                                 link=f"https://portal.test/{n}", published_date=str(2000 + n))
+                for name in names:
+                    if name not in authors:
+                        authors[name] = Author.objects.create(
+                            name=name, profile_url=f"https://portal.test/persons/{len(authors) + 1}")
+                    authors[name].publications.add(pub)
+        build_tfidf_and_index(trigger)
+        return authors
+
+
+class SearchBenchmarkTests(SearchIndexTestCase):
+    """Small end-to-end run of the search benchmark; larger corpora go through the benchmark_search command."""
+
+    def test_benchmark_1k(self):
+        run = run_benchmark(1000, num_queries=50, seed=7, repeat=2)
+        build = run['build']
+        self.assertEqual(build['num_docs'], 1000)
+        self.assertGreater(build['seconds'], 0)
+        self.assertGreater(build['peak_rss_mb'], 0)
+        self.assertEqual(set(run['queries']), {'tfidf', 'bm25'})
+        for stats in run['queries'].values():
+            self.assertEqual(stats['errors'], 0)
+            self.assertEqual(stats['miss']['count'], 50)
+            self.assertEqual(stats['hit']['count'], 100)
+            for phase in ('miss', 'hit'):
+                self.assertLessEqual(stats[phase]['p50_ms'], stats[phase]['p95_ms'])
+                self.assertLessEqual(stats[phase]['p95_ms'], stats[phase]['p99_ms'])
+
+    def test_compact_page_payload(self):
+        run_benchmark(300, num_queries=5, seed=2, rankings=('bm25',), limit=5, fields='doc_id,title,score,snippet')
+        query = SyntheticCorpus(300, seed=2).queries(1)[0]
+        response = self.client.get('/api/search/', {'query': query, 'limit': 5, 'fields': 'doc_id,score,snippet'})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertLessEqual(len(body['results']), 5)
+        for hit in body['results']:
+            self.assertEqual(list(hit), ['doc_id', 'score', 'snippet'])
+
+    def test_bm25_ranking(self):
+        for n, (title, abstract) in enumerate(BM25_DOCS):
+            Publication.objects.create(id=n + 1, title=title, abstract=abstract, link=f"https://portal.test/{n}")
+        with self.settings(SEARCH_BM25_K1=1.2, SEARCH_BM25_FIELDS=BM25_FIELDS):
+            build_tfidf_and_index('test')
+        for ranking in ('bm25', 'tfidf'):
+            response = self.client.get('/api/search/', {'query': 'bond', 'ranking': ranking, 'fields': 'doc_id,score'})
+            results = response.json()['results']
+            if ranking == 'bm25':
+                self.assertEqual([hit['doc_id'] for hit in results], [1, 3])
+                # Impacts are stored as float32
+                self.assertAlmostEqual(results[0]['score'], BM25_BOND_SCORES[0], places=5)
+                self.assertAlmostEqual(results[1]['score'], BM25_BOND_SCORES[2], places=5)
+            else:
+                # TF-IDF only sees abstracts, where the third publication repeats the term
+                self.assertEqual([hit['doc_id'] for hit in results], [3, 1])
+
+class SearchMetricsTests(SearchIndexTestCase):
+    def setUp(self):
+        super().setUp()
+        self.publish([
+            ('Bond markets', 'Bond risk and tax', ['Smith, A.']),
+            ('Tax policy', 'Equity', ['Smith, A.', 'Khan, B.']),
+            ('Equity', 'Bond bond equity', []),
+        ], trigger='manual')
+
+    def samples(self):
+        """Every sample of /metrics, keyed by the metric name and labels."""
+        body = self.client.get('/metrics').content.decode()
+        return {line.rpartition(' ')[0]: float(line.rpartition(' ')[2])
+                for line in body.splitlines() if line and not line.startswith('#')}
+
+    def test_server_timing_phases(self):
+        params = {'query': 'bond', 'fields': 'doc_id'}
+        miss = self.client.get('/api/search/', params, HTTP_X_SEARCH_PROFILE='1')['Server-Timing']
+        hit = self.client.get('/api/search/', params, HTTP_X_SEARCH_PROFILE='1')['Server-Timing']
+        entries = [entry.split(';') for entry in miss.split(', ')]
+        self.assertEqual([name for name, _ in entries], ['index', 'analyze', 'result_cache', 'vectorize', 'score',
+                                                         'hydrate', 'total', 'cache', 'ranking'])
+        durations = {name: float(value[len('dur='):]) for name, value in entries if value.startswith('dur=')}
+        self.assertEqual(len(durations), 7)
+        self.assertLessEqual(sum(d for name, d in durations.items() if name != 'total'), durations['total'] + 0.01)
+        self.assertEqual(entries[-2:], [['cache', 'desc="miss"'], ['ranking', 'desc="tfidf"']])
+        # A repeated query is answered from the result cache without scoring or loading rows
+        self.assertEqual(hit.split(', ')[-2:], ['cache;desc="local"', 'ranking;desc="tfidf"'])
+        self.assertEqual([entry.split(';')[0] for entry in hit.split(', ')][:4],
+                         ['index', 'analyze', 'result_cache', 'total'])
+        self.assertFalse(self.client.get('/api/search/', params).has_header('Server-Timing'))
+
+    def test_metrics_values(self):
+        before = self.samples()
+        for query in ('bond', 'bond', 'tax'):
+            self.client.get('/api/search/', {'query': query, 'fields': 'doc_id'})
+        after = self.samples()
+
+        def delta(name):
+            return after[name] - before.get(name, 0)
+
+        self.assertEqual(delta('search_phase_seconds_count{phase="total"}'), 3)
+        self.assertEqual(delta('search_phase_seconds_count{phase="score"}'), 2)
+        self.assertEqual(after['search_result_cache_requests_total{tier="miss"}'], 2)
+        self.assertEqual(after['search_result_cache_requests_total{tier="local"}'], 1)
+        self.assertEqual(after['search_result_cache_entries'], 2)
+        self.assertEqual(after['search_index_documents{ranking="tfidf"}'], 3)
+        self.assertEqual(after['search_index_documents{ranking="bm25"}'], 3)
+        # bond, risk, tax, equity; 'and' is a stop word
+        self.assertEqual(after['search_index_vocabulary_terms{ranking="tfidf"}'], 4)
+        self.assertEqual(after['search_author_index_authors'], 2)
+        self.assertEqual(after['search_index_builds_total{trigger="manual"}'], 1)
+        self.assertEqual(after['search_index_builds_total{trigger="delta"}'], 0)
+        self.assertEqual(after['search_index_updates_pending'], 0)
+
+
+class SearchPagingTests(SearchIndexTestCase):
+    def setUp(self):
+        super().setUp()
+        # Publication n repeats 'bond' n times, so the TF-IDF ranking is 12, 11, ..., 1
+        self.publish([(f"Study {n}", ' '.join(['bond'] * n + ['equity', 'market']), ['Smith, A.', 'Khan, B.'])
+                      for n in range(1, 13)])
+
+    def search(self, **params):
+        return self.client.get('/api/search/', {'query': 'bond', 'ranking': 'tfidf', 'fields': 'doc_id', **params})
+
+    def doc_ids(self, **params):
+        return [hit['doc_id'] for hit in self.search(**params).json()['results']]
+
+    def test_pages(self):
+        first = self.search(limit=5).json()
+        self.assertEqual([hit['doc_id'] for hit in first['results']], [12, 11, 10, 9, 8])
+        self.assertEqual((first['offset'], first['limit'], first['next_offset']), (0, 5, 5))
+        self.assertEqual(self.doc_ids(limit=5, offset=5), [7, 6, 5, 4, 3])
+        last = self.search(limit=5, offset=10).json()
+        self.assertEqual(([hit['doc_id'] for hit in last['results']], last['next_offset']), ([2, 1], None))
+        self.assertEqual(self.search(limit=12).json()['next_offset'], None)
+
+    def test_out_of_range_values_are_clamped(self):
+        for params, expected in (({'limit': 0}, (0, 1)), ({'limit': 10_000}, (0, 100)),
+                                 ({'offset': -3}, (0, 50)), ({'offset': 10_000}, (1000, 50))):
+            body = self.search(**params).json()
+            self.assertEqual((body['offset'], body['limit']), expected, params)
+        self.assertEqual(self.doc_ids(limit=0), [12])
+        self.assertEqual(self.doc_ids(offset=-3), list(range(12, 0, -1)))
+        self.assertEqual(self.doc_ids(offset=10_000), [])
+
+    def test_bad_values_are_rejected(self):
+        for params in ({'limit': 'ten'}, {'offset': '1.5'}, {'fields': 'doc_id,bogus'}, {'facets': 'years'},
+                       {'ranking': 'pagerank'}):
+            response = self.search(**params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('error', response.json())
+
+    def test_fields_projection(self):
+        # Requested order, surrounding spaces ignored
+        hit = self.search(limit=1, fields=' title, doc_id').json()['results'][0]
+        self.assertEqual(hit, {'title': 'Study 12', 'doc_id': 12})
+        # The default is every field but the snippet
+        hit = self.search(limit=1, fields='').json()['results'][0]
+        self.assertEqual(list(hit), ['doc_id', 'score', 'title', 'link', 'published_date', 'abstract', 'authors'])
+        self.assertEqual((hit['link'], hit['published_date']), ('https://portal.test/12', '2012'))
+        self.assertEqual(sorted(a['name'] for a in hit['authors']), ['Khan, B.', 'Smith, A.'])
+        hit = self.search(limit=1, fields='doc_id,snippet').json()['results'][0]
+        self.assertEqual(list(hit), ['doc_id', 'snippet'])
+        self.assertIn('bond', hit['snippet'].lower())
+
+
+class IndexRefreshTests(SearchIndexTestCase):
+    def test_expired_payload_still_triggers_refresh(self):
+        self.publish([('Bond risk', None, [])])
+        self.assertIsNotNone(tfidf_index.get())
+        # Past the payload's expiry (unseen by any request) the resident copy keeps serving and asks for a rebuild
+        later = time.time() + INDEX_CACHE_TIMEOUT + 1
+        with mock.patch('time.time', return_value=later), \
+                mock.patch('core.search_index.request_index_rebuild') as rebuild:
+            self.assertIsNotNone(tfidf_index.get())
+        rebuild.assert_called_once_with("cached index close to expiry")
+
+
+# (title, abstract) of a tiny corpus whose BM25F scores are worked out by hand below
+BM25_DOCS = [
+    ('Bond', 'Bond risk and tax'),
+    ('Risk of tax', 'Equity'),
+    ('Tax', 'Bond bond, equity equity'),
+]
+BM25_FIELDS = {'title': {'weight': 2.0, 'b': 0.75}, 'abstract': {'weight': 1.0, 'b': 0.5}}
+
+
+def _bm25_bond_score(title_tf, title_norm, abstract_tf, abstract_norm):
+    # 'bond' occurs in 2 of 3 documents
+    idf = np.log(1 + (3 - 2 + 0.5) / (2 + 0.5))
+    tf = 2.0 * title_tf / title_norm + 1.0 * abstract_tf / abstract_norm
+    return idf * tf * (1.2 + 1) / (tf + 1.2)
+
+
+# Field lengths after stop words: titles 1, 2, 1 (average 4/3), abstracts 3, 1, 4 (average 8/3);
+# a field's norm is 1 - b + b * length / average
+BM25_BOND_SCORES = [
+    _bm25_bond_score(1, 0.25 + 0.75 * 1 / (4 / 3), 1, 0.5 + 0.5 * 3 / (8 / 3)),
+    0.0,
+    _bm25_bond_score(0, 0.25 + 0.75 * 1 / (4 / 3), 2, 0.5 + 0.5 * 4 / (8 / 3)),
+]
+
+
+class Bm25Tests(SimpleTestCase):
+    def test_hand_computed_scores(self):
+        analyzer = get_analyzer()
+        vocabulary = {}
+        counters = [TermCounter(vocabulary) for _ in FIELDS]
+        for fields in BM25_DOCS:
+            for counter, text in zip(counters, fields):
+                counter.add(analyzer.analyze(text))
+        model = Bm25Model(vocabulary, {n: c.matrix() for n, c in zip(FIELDS, counters)}, [1, 2, 3], 1.2, BM25_FIELDS)
+        hits = dict(model.to_index().search(model.vectorize(analyzer.analyze('bond'))))
+        self.assertEqual(set(hits), {1, 3})
+        # Impacts are stored as float32
+        self.assertAlmostEqual(hits[1], BM25_BOND_SCORES[0], places=5)
+        self.assertAlmostEqual(hits[3], BM25_BOND_SCORES[2], places=5)
+        # A repeated query term counts twice
+        twice = dict(model.to_index().search(model.vectorize(analyzer.analyze('bond bond'))))
+        self.assertAlmostEqual(twice[3], 2 * BM25_BOND_SCORES[2], places=5)
+
+
+class EarlyTerminationTests(SimpleTestCase):
+    """MaxScore must return exactly the exhaustive ranking, for any page."""
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        # Zipf-like term frequencies: a few very common terms and a long tail
+        vocabulary = [f"t{i}" for i in range(300)]
+        probabilities = 1.0 / np.arange(1, len(vocabulary) + 1)
+        probabilities /= probabilities.sum()
+        self.docs = [
+            [list(rng.choice(vocabulary, size=rng.integers(3, 12), p=probabilities)),
+             list(rng.choice(vocabulary, size=rng.integers(20, 120), p=probabilities))]
+            for _ in range(400)
+        ]
+        self.queries = [list(rng.choice(vocabulary[:150], size=6, replace=False)) for _ in range(20)]
+        doc_ids = list(range(1000, 1000 + len(self.docs)))
+
+        bm25_vocabulary = {}
+        counters = [TermCounter(bm25_vocabulary) for _ in FIELDS]
+        for fields in self.docs:
+            for counter, tokens in zip(counters, fields):
+                counter.add(tokens)
+        fields = {'title': {'weight': 2.0, 'b': 0.5}, 'abstract': {'weight': 1.0, 'b': 0.75}}
+        self.models = {
+            'tfidf': TfidfModel.fit(doc_ids, (title + abstract for title, abstract in self.docs)),
+            'bm25': Bm25Model(bm25_vocabulary, {n: c.matrix() for n, c in zip(FIELDS, counters)}, doc_ids, 1.2, fields),
+        }
+
+    def test_maxscore_matches_exhaustive_search(self):
+        for name, model in self.models.items():
+            index = model.to_index()
+            with self.assertLogs('core.engine', 'DEBUG') as logs:
+                for query in self.queries:
+                    vector = index.vectorize(query)
+                    full = dict(index.search(vector, k=index.num_docs))
+                    for k, offset in ((10, 0), (10, 5), (7, 23)):
+                        with self.subTest(ranking=name, query=query, k=k, offset=offset):
+                            exhaustive = index.search(vector, k=k, offset=offset)
+                            pruned = index.search(vector, k=k, offset=offset, early_termination=True)
+                            self.assertEqual(len(pruned), len(exhaustive))
+                            np.testing.assert_allclose([s for _, s in pruned], [s for _, s in exhaustive])
+                            for doc_id, score in pruned:
+                                self.assertAlmostEqual(full[doc_id], score)
+            # The comparison is only meaningful if some queries were actually pruned
+            self.assertTrue(any('MaxScore pruning' in line for line in logs.output), name)
+
+
+class AuthorIndexTests(SearchIndexTestCase):
+    def setUp(self):
+        super().setUp()
+        names = {10: 'Smith, Jane', 11: 'Smith, John', 12: 'Doe, Jane'}
+        self.index = AuthorIndex.build(names, np.array([[10, 1], [11, 1], [10, 2], [12, 3], [11, 3], [99, 4]]))
+
+    def test_names_ids_and_documents(self):
+        index = self.index
+        self.assertEqual(index.author_ids[index.match_name('jane smith')].tolist(), [10])
+        self.assertEqual(index.author_ids[index.match_name('Smith')].tolist(), [10, 11])
+        self.assertEqual(index.match_name('nobody').tolist(), [])
+        self.assertEqual(index.documents(index.match_name('smith')).tolist(), [1, 2, 3])
+        self.assertEqual(index.documents(index.match_ids([12, 404])).tolist(), [3])
+
+    def test_facets_and_delta(self):
+        self.assertEqual(self.index.facets(np.array([1, 2, 3, 5]), 2),
+                         [{'id': 10, 'name': 'Smith, Jane', 'count': 2}, {'id': 11, 'name': 'Smith, John', 'count': 2}])
+        updated = self.index.apply_delta([1], {13: 'Roe, Richard'}, np.array([[13, 1]]))
+        self.assertEqual(updated.documents(updated.match_name('roe')).tolist(), [1])
+        self.assertEqual(updated.documents(updated.match_ids([10])).tolist(), [2])
+        self.assertEqual(updated.facets(np.array([1, 2, 3]), 5)[0], {'id': 10, 'name': 'Smith, Jane', 'count': 1})
+
+    def search(self, query, **params):
+        return self.client.get('/api/search/', {'query': query, 'ranking': 'bm25', 'fields': 'doc_id', **params})
+
+    def test_author_filter_and_facets(self):
+        authors = self.publish([
+            ('Bond pricing', 'Bond yields and spreads', ['Smith, Jane', 'Doe, Jane', 'Roe, Richard']),
+            ('Bond risk', 'Default risk of a bond', ['Smith, Jane', 'Doe, Jane']),
+            ('Equity markets', 'A bond and equity comparison', ['Smith, Jane']),
+            ('Tax policy', 'Taxes and growth', ['Doe, Jane']),
+        ])
+        smith, doe, roe = authors['Smith, Jane'], authors['Doe, Jane'], authors['Roe, Richard']
+        body = self.search('bond', facets='authors').json()
+        ranked = [hit['doc_id'] for hit in body['results']]
+        self.assertCountEqual(ranked, [1, 2, 3])
+        self.assertEqual(body['facets']['authors'], [{'id': smith.id, 'name': 'Smith, Jane', 'count': 3},
+                                                     {'id': doe.id, 'name': 'Doe, Jane', 'count': 2},
+                                                     {'id': roe.id, 'name': 'Roe, Richard', 'count': 1}])
+
+        # Filters keep the rank order and facets count only the filtered matches
+        body = self.search('bond', author_id=doe.id, facets='authors').json()
+        self.assertEqual([hit['doc_id'] for hit in body['results']], [d for d in ranked if d in (1, 2)])
+        self.assertEqual(body['facets']['authors'], [{'id': smith.id, 'name': 'Smith, Jane', 'count': 2},
+                                                     {'id': doe.id, 'name': 'Doe, Jane', 'count': 2},
+                                                     {'id': roe.id, 'name': 'Roe, Richard', 'count': 1}])
+        self.assertEqual(self.search('bond', author='jane').json()['results'], self.search('bond').json()['results'])
+        self.assertEqual([hit['doc_id'] for hit in self.search('bond', author='richard').json()['results']], [1])
+        either = self.search('bond', author_id=f"{roe.id},{doe.id}").json()['results']
+        self.assertEqual([hit['doc_id'] for hit in either], [d for d in ranked if d in (1, 2)])
+        # Name words and ids must both match
+        self.assertEqual(self.search('bond', author='smith', author_id=roe.id).json()['results'], [])
+        self.assertEqual(self.search('tax', author_id=smith.id).json()['results'], [])
+        self.assertEqual(self.search('bond', author_id='x').status_code, 400)
+
+    def test_authorship_changes_reach_author_filter(self):
+        authors = self.publish([
+            ('Tax policy', 'Taxes and growth', ['Smith, Jane']),
+            ('Tax havens', 'Offshore tax avoidance', ['Doe, Jane']),
+        ])
+        doe = authors['Doe, Jane']
+        pub = Publication.objects.get(id=1)
+
+        def filtered(**params):
+            return [hit['doc_id'] for hit in self.search('tax', **params).json()['results']]
+
+        self.assertEqual(filtered(author_id=doe.id), [2])
+        # Signals queue the publication; applying the queue (a no-op if the update already ran) publishes it
+        doe.publications.add(pub)
+        apply_index_updates()
+        self.assertCountEqual(filtered(author_id=doe.id), [1, 2])
+        self.assertEqual(self.search('tax', author_id=doe.id, facets='authors').json()['facets']['authors'],
+                         [{'id': doe.id, 'name': 'Doe, Jane', 'count': 2},
+                          {'id': authors['Smith, Jane'].id, 'name': 'Smith, Jane', 'count': 1}])
+
+        doe.name = 'Zelda Quux'
+        doe.save()
+        apply_index_updates()
+        self.assertCountEqual(filtered(author='zelda'), [1, 2])
+        self.assertEqual(filtered(author='doe'), [])
+
+        pub.authors.remove(doe)
+        apply_index_updates()
+        self.assertEqual(filtered(author_id=doe.id), [2])
+        self.assertEqual(filtered(author='zelda'), [2])
+
+
+class SuggestIndexTests(SimpleTestCase):
+    def build(self, **kwargs):
+        builder = SuggestBuilder(get_analyzer())
+        for title in ('Monetary policy rules', 'Monetary unions', 'Money and credit', 'Policy learning'):
+            builder.add_title(title)
+        builder.add_authors([('Moore, A.', 3), ('Moore, A.', 2), ('Nobody', 0)])
+        vocabulary = {'monetari': 0, 'polici': 1, 'money': 2}
+        builder.add_terms(vocabulary, np.array([7, 5, 1]), min_df=2)
+        return builder.build(**kwargs)
+
+    def test_prefix_completions_by_weight(self):
+        index = self.build(top_prefix_length=0, top_size=2, top_min_range=1)
+        self.assertEqual([(s['text'], s['kind'], s['weight']) for s in index.suggest('mo', 3)],
+                         [('monetary', 'term', 7), ('Moore, A.', 'author', 5), ('Monetary policy rules', 'title', 1)])
+        self.assertEqual(index.suggest('money', 5), [{'text': 'Money and credit', 'kind': 'title', 'weight': 1}])
+        # The last word is completed as a term once the whole query runs out of matches
+        self.assertEqual([s['text'] for s in index.suggest('Monetary unions, pol', 5)], ['monetary unions policy'])
+        self.assertEqual(index.suggest('xyz', 5), [])
+
+    def test_precomputed_prefixes_match_ranges(self):
+        computed = self.build(top_prefix_length=0, top_size=2, top_min_range=1)
+        precomputed = self.build(top_prefix_length=2, top_size=2, top_min_range=1)
+        self.assertIn('mo', precomputed.top)
+        for prefix in ('m', 'mo', 'p'):
+            self.assertEqual(precomputed.suggest(prefix, 2), computed.suggest(prefix, 2))
+
+
+class SuggestViewTests(SearchIndexTestCase):
+    def setUp(self):
+        super().setUp()
+        # No abstracts, so the titles are also the TF-IDF documents that frequent terms come from
+        self.publish([
+            ('Monetary policy rules', None, ['Moore, A.']),
+            ('Monetary unions', None, ['Moore, A.']),
+            ('Money and credit', None, ['Moore, A.', 'Khan, B.']),
+            ('Policy learning', None, []),
+        ])
+
+    def suggest(self, **params):
+        return self.client.get('/api/search/suggest/', params)
+
+    def test_completions(self):
+        body = self.suggest(q='Mo', limit=3).json()
+        self.assertEqual(body, {'query': 'Mo', 'suggestions': [
+            {'text': 'Moore, A.', 'kind': 'author', 'weight': 3},
+            {'text': 'monetary', 'kind': 'term', 'weight': 2},
+            {'text': 'Monetary policy rules', 'kind': 'title', 'weight': 1},
+        ]})
+        self.assertEqual(self.suggest(q='money').json()['suggestions'],
+                         [{'text': 'Money and credit', 'kind': 'title', 'weight': 1}])
+        # The last word is completed as a term once the whole query runs out of matches
+        self.assertEqual(self.suggest(q='Monetary unions, pol').json()['suggestions'],
+                         [{'text': 'monetary unions policy', 'kind': 'term', 'weight': 2}])
+        self.assertEqual(self.suggest(q='xyz').json()['suggestions'], [])
+
+    def test_parameters(self):
+        self.assertEqual(self.suggest(q='  ').json(), {'query': '  ', 'suggestions': []})
+        self.assertEqual(len(self.suggest(q='m', limit=0).json()['suggestions']), 1)
+        response = self.suggest(q='m', limit='x')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.json())
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class IndexQueueTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_entries_in_flight_are_not_retired(self):
+        queue_index_update(11)
+        # A writer numbered entry 2 but has not written its key yet
+        cache.incr(INDEX_QUEUE_SEQ_KEY)
+        queue_index_update(13)
+        keys, upto, doc_ids = pending_index_updates()
+        self.assertEqual((len(keys), upto, doc_ids), (1, 1, {11, 13}))
+
+        cache.set(INDEX_QUEUE_ITEM_KEY.format(2), 12)
+        keys, upto, doc_ids = pending_index_updates()
+        self.assertEqual((len(keys), upto, doc_ids), (3, 3, {11, 12, 13}))
+
+    def test_lost_entries_are_skipped_after_timeout(self):
+        cache.add(INDEX_QUEUE_SEQ_KEY, 0, timeout=None)
+        cache.incr(INDEX_QUEUE_SEQ_KEY)
+        queue_index_update(13)
+        self.assertEqual(pending_index_updates()[1], 0)
+        gap = cache.get(INDEX_QUEUE_GAP_KEY)
+        cache.set(INDEX_QUEUE_GAP_KEY, {**gap, 'since': gap['since'] - INDEX_QUEUE_GAP_TIMEOUT}, timeout=None)
+        keys, upto, doc_ids = pending_index_updates()
+        self.assertEqual((upto, doc_ids), (2, {13}))
+
+    def test_delta_waits_for_running_build(self):
+        queue_index_update(11)
+        with index_build_lock() as acquired:
+            self.assertTrue(acquired)
+            self.assertIsNone(apply_index_updates())
+        self.assertEqual(pending_index_updates()[2], {11})
+
+
+class PersistenceTests(TestCase):
+    def record(self, n, title=None, authors=('Smith, A.', 'Khan, B.')):
+        return {
+            'title': title or f"Publication {n}", 'link': f"https://portal.test/en/publications/{n}",
+            'published_date': '2021', 'abstract': f"Abstract {n}",
+            'authors': [{'name': name, 'profile_url': f"https://portal.test/en/persons/{name[:4].lower()}"}
+                        for name in authors],
+        }
+
+    def authors_of(self, n):
+        pub = Publication.objects.get(link=self.record(n)['link'])
+        return sorted(pub.authors.values_list('name', flat=True))
+
+    def test_upsert_by_link(self):
+        self.assertEqual(persist_publications([self.record(1), self.record(2)]), [])
+        first = Publication.objects.get(link=self.record(1)['link'])
+        # A repeated link within one batch is saved once, last record winning
+        persist_publications([self.record(1, 'Stale'), self.record(1, 'Renamed'), self.record(3)])
+        self.assertEqual(Publication.objects.count(), 3)
+        first.refresh_from_db()
+        self.assertEqual(first.title, 'Renamed')
+        self.assertEqual(Author.objects.count(), 2)
+
+    def test_author_links_are_diffed(self):
+        persist_publications([self.record(1), self.record(2)])
+        Through = Author.publications.through
+        kept = Through.objects.get(publication__link=self.record(1)['link'], author__name='Khan, B.').pk
+        persist_publications([self.record(1, authors=('Khan, B.', 'Patel, C.')), self.record(2, authors=())])
+        self.assertEqual(self.authors_of(1), ['Khan, B.', 'Patel, C.'])
+        self.assertEqual(self.authors_of(2), [])
+        # The unchanged link is left in place rather than deleted and re-inserted
+        self.assertTrue(Through.objects.filter(pk=kept).exists())
+
+    def test_failed_chunk_is_saved_record_by_record(self):
+        bad = dict(self.record(2), link=None)
+        with self.assertLogs('core.persistence', 'WARNING'):
+            failed = persist_publications([self.record(1), bad, self.record(3)], chunk_size=10)
+        self.assertEqual(failed, [None])
+        self.assertEqual(sorted(Publication.objects.values_list('title', flat=True)), ['Publication 1', 'Publication 3'])
+        self.assertEqual(self.authors_of(3), ['Khan, B.', 'Smith, A.'])
+
+
+class PipelineTests(SimpleTestCase):
+    def test_failed_batches_are_kept(self):
+        def flush(batch):
+            if 'bad' in batch:
+                raise ValueError('bad row')
+
+        with self.assertLogs('core.pipeline', 'ERROR'), BatchWriter(flush, batch_size=2) as writer:
+            for item in ('a', 'b', 'bad', 'c', 'd'):
+                writer.put(item)
+        self.assertEqual(writer.failed, ['bad', 'c'])
+        self.assertEqual([str(e) for e in writer.errors], ['bad row'])
+
+    def test_put_gives_up_without_consumers(self):
+        work = WorkQueue(maxsize=1)
+        work.put({'link': 'a'})
+        start = time.monotonic()
+        with self.assertRaises(QueueAbandoned):
+            work.put({'link': 'b'}, alive=lambda: time.monotonic() - start < 0.1)
+
+    def test_retries_back_off_then_give_up(self):
+        failures = {'flaky': 2, 'broken': 3}
+        work = WorkQueue(max_retries=2, backoff=0.05, items=[{'link': 'flaky'}, {'link': 'broken'}])
+        attempts = {'flaky': [], 'broken': []}
+        errored_at = {}
+        with self.assertLogs('core.pipeline', 'WARNING') as logs:
+            while True:
+                job = work.get()
+                if job is None:
+                    break
+                link = job['item']['link']
+                if job['attempt']:
+                    # Each retry waits backoff * 2**(attempt - 1) after the failure before it
+                    delay = 0.05 * 2 ** (job['attempt'] - 1)
+                    self.assertAlmostEqual(job['not_before'] - errored_at[link], delay, delta=0.02)
+                    self.assertGreaterEqual(time.monotonic(), job['not_before'])
+                attempts[link].append(job['attempt'])
+                if len(attempts[link]) <= failures[link]:
+                    errored_at[link] = time.monotonic()
+                    retried = work.errored(job, RuntimeError('timeout'))
+                    self.assertEqual(retried, job['attempt'] < 2)
+                else:
+                    work.succeeded(job)
+        self.assertEqual(attempts, {'flaky': [0, 1, 2], 'broken': [0, 1, 2]})
+        self.assertEqual(work.failed, [{'link': 'broken'}])
+        self.assertEqual((work.total, work.done), (2, 2))
+        self.assertTrue(logs.output[-1].startswith('ERROR:core.pipeline:Giving up on broken'))
+
+
+class FakeDriver:
+    def __init__(self):
+        self.timeouts = []
+
+    def set_page_load_timeout(self, seconds):
+        self.timeouts.append(seconds)
+
+    def execute_script(self, script):
+        return 1
+
+    def quit(self):
+        pass
+
+
+class DriverPoolTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(driver_pool, 'make_driver', side_effect=FakeDriver)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pool = driver_pool.DriverPool(size=1, max_age=60, max_pages=10, page_timeout=45)
+
+    def test_each_loan_sets_its_page_timeout(self):
+        with self.pool.driver(5) as first:
+            pass
+        with self.pool.driver() as second:
+            pass
+        self.assertIs(first, second)
+        self.assertEqual(first.timeouts, [5, 45])
+        self.assertEqual(self.pool.stats(), {'idle': 1, 'alive': 1, 'started': 1, 'reused': 1})
+
+    def test_browsers_launched_with_other_prefs_are_replaced(self):
+        with self.settings(SCRAPE_BLOCK_RESOURCES=('images',)):
+            with self.pool.driver() as first:
+                pass
+        with self.pool.driver() as second:
+            pass
+        self.assertIsNot(first, second)
+        self.assertEqual(self.pool.stats(), {'idle': 1, 'alive': 1, 'started': 2, 'reused': 0})
+
+
+class ParserTests(SimpleTestCase):
+    """The HTTP scraper's parsers against the saved portal markup."""
+
+    PORTAL = 'https://pureportal.coventry.ac.uk/en/organisations/fbl/publications/'
+
+    def render(self, template: str, **values) -> str:
+        return Template((TESTDATA_DIR / template).read_text()).substitute(**values)
+
+    def test_listing(self):
+        items = [
+            self.render('listing_item.html', href='/en/publications/bond-risk', title='Bond &amp; equity risk',
+                        person='Smith, A.', person_href='/en/persons/smith', date='3 Mar 2021'),
+            self.render('listing_item.html', href='https://pureportal.coventry.ac.uk/en/publications/tax',
+                        title='  Tax &nbsp;policy ', person='Khan, B.', person_href='/en/persons/khan', date='1 Jan 2020'),
+        ]
+        page = self.render('listing.html', results=''.join(items), pagination='page 1')
+        self.assertEqual(parse_listing(page, self.PORTAL), [
+            {'title': 'Bond & equity risk', 'link': 'https://pureportal.coventry.ac.uk/en/publications/bond-risk'},
+            {'title': 'Tax policy', 'link': 'https://pureportal.coventry.ac.uk/en/publications/tax'},
+        ])
+
+    def test_empty_and_unrendered_listings(self):
+        self.assertEqual(parse_listing((TESTDATA_DIR / 'listing_empty.html').read_text(), self.PORTAL), [])
+        with self.assertRaises(PageNotParsed):
+            parse_listing('<html><body><div id="app"></div></body></html>', self.PORTAL)
+
+    def test_detail(self):
+        link = 'https://pureportal.coventry.ac.uk/en/publications/bond-risk'
+        persons = [
+            self.render('detail_person.html', href='/en/persons/smith', name='Smith, A.', sep=','),
+            self.render('detail_person.html', href='/en/persons/o-neil', name='O&#8217;Neil, C.', sep=','),
+            # Listed twice on the page, kept once
+            self.render('detail_person.html', href='/en/persons/smith', name='Smith, A.', sep=''),
+        ]
+        page = self.render('detail.html', title='Bond &amp; equity risk', persons=''.join(persons),
+                           date='3 Mar 2021', abstract='<p>First paragraph of the abstract.</p><p>Second one.</p>')
+        self.assertEqual(parse_detail(page, link, 'Listing title'), {
+            'title': 'Bond & equity risk',
+            'link': link,
+            'authors': [
+                {'name': 'Smith, A.', 'profile_url': 'https://pureportal.coventry.ac.uk/en/persons/smith'},
+                {'name': 'O\u2019Neil, C.', 'profile_url': 'https://pureportal.coventry.ac.uk/en/persons/o-neil'},
+            ],
+            'published_date': '3 Mar 2021',
+            'abstract': 'First paragraph of the abstract.\nSecond one.',
+        })
+
+    def test_detail_without_abstract_or_title(self):
+        page = self.render('detail.html', title='Short', persons='', date='2019', abstract='n/a')
+        record = parse_detail(page, self.PORTAL, 'Listing title')
+        self.assertEqual((record['authors'], record['published_date'], record['abstract']), ([], '2019', ''))
+        with self.assertRaises(PageNotParsed):
+            parse_detail('<html><body><div id="app"></div></body></html>', self.PORTAL)
+
+
+class HistogramTests(SimpleTestCase):
+    def test_cumulative_buckets(self):
+        histogram = Histogram('test_seconds', 'Test.', 'phase', (0.1, 1.0))
+        for seconds in (0.05, 0.5, 0.5, 3.0):
+            histogram.observe('a', seconds)
+        lines = histogram.render()
+        self.assertIn('test_seconds_bucket{phase="a",le="0.1"} 1', lines)
+        self.assertIn('test_seconds_bucket{phase="a",le="1.0"} 3', lines)
+        self.assertIn('test_seconds_bucket{phase="a",le="+Inf"} 4', lines)
+        self.assertIn('test_seconds_count{phase="a"} 4', lines)
+
+
+class FixtureServerTests(SimpleTestCase):
+    def test_latency_errors_and_depth(self):
+        with PurePortalFixtureServer(45, page_size=20, detail_latency=0.05, error_rate=1.0, error_status=502) as server:
+            self.assertEqual(server.listing_depth, 3)
+            host = server.base_url.split('/en/')[0]
+            start = time.perf_counter()
+            response = requests.get(f"{host}{DETAIL_PREFIX}3", timeout=5)
+            self.assertGreaterEqual(time.perf_counter() - start, 0.05)
+            self.assertEqual(response.status_code, 502)
+            self.assertEqual(server.errors_served, 1)
+
+        with PurePortalFixtureServer(45, page_size=20) as server:
+            self.assertEqual(requests.get(f"{server.base_url}?page=2", timeout=5).text.count(DETAIL_PREFIX), 5)
+
+
+class ScrapeBenchmarkTests(TransactionTestCase):
+    """Scrape runs save from a writer thread, so rows must be committed."""
+
+    def test_scrape_benchmark_with_errors(self):
+        with isolated_settings():
+            report = run_scrape_benchmark(60, [1, 3], page_size=20, detail_latency=0.01, error_rate=0.1, seed=1)
+        self.assertEqual(report['fixture']['listing_pages'], 3)
+        self.assertEqual([run['workers'] for run in report['runs']], [1, 3])
+        for run in report['runs']:
+            self.assertEqual(run['saved'], 60)
+            self.assertEqual(run['failed'], 0)
+            self.assertGreater(run['pages_per_sec'], 0)
+            self.assertIn('details', run['stage_seconds'])
+        self.assertGreater(sum(run['errors_served'] for run in report['runs']), 0)
+        self.assertEqual(Publication.objects.count(), 60)
+
+
+@override_settings(SCRAPE_KNOWN_RUN_STOP=20, SCRAPE_RECHECK_AFTER=0)
+class IncrementalScrapeTests(TransactionTestCase):
+    def scrape(self, server, incremental):
+        return run_full_scrape.apply(kwargs={
+            'max_pages': server.listing_depth + 1, 'workers': 2, 'delay': 0.0, 'backend': 'http',
+            'base_url': server.base_url, 'incremental': incremental, 'distributed': False,
+        }).get()
+
+    def test_full_then_incremental(self):
+        with isolated_settings(), PurePortalFixtureServer(60, page_size=20) as server:
+            full = self.scrape(server, incremental=False)
+            self.assertEqual((full['listed'], full['count'], full['changed']), (60, 60, 60))
+            self.assertEqual(Publication.objects.exclude(etag='').count(), 60)
+
+            # Five new publications at the top of the listing; one stored row lost its ETag
+            server.num_publications = 65
+            host = server.base_url.split('/en/')[0]
+            Publication.objects.filter(link=f"{host}{DETAIL_PREFIX}30").update(etag='')
+            not_modified_before = server.not_modified_served
+
+            result = self.scrape(server, incremental=True)
+            # Page 1 holds 5 new and 15 known links, page 2 completes a run of 20 known ones
+            self.assertEqual(result['listed'], 40)
+            self.assertEqual(result['not_modified'], 34)
+            self.assertEqual(server.not_modified_served - not_modified_before, 34)
+            # Publication 30 was fetched in full but its content hash matched
+            self.assertEqual((result['count'], result['changed']), (6, 5))
+            self.assertEqual(result['failed_urls'], [])
+            self.assertEqual(Publication.objects.count(), 65)
+            self.assertNotEqual(Publication.objects.get(link=f"{host}{DETAIL_PREFIX}30").etag, '')
+
+
+@override_settings(SCRAPE_LISTING_SHARD_PAGES=1, SCRAPE_DETAIL_BATCH_SIZE=25)
+class DistributedScrapeTests(TransactionTestCase):
+    """The group -> dispatch -> chord -> finalize_scrape canvas, run eagerly."""
+
+    def setUp(self):
+        eager = current_app.conf.task_always_eager
+        current_app.conf.task_always_eager = True
+        self.addCleanup(setattr, current_app.conf, 'task_always_eager', eager)
+
+    def scrape(self, server, incremental=False):
+        return run_full_scrape.apply(kwargs={
+            'max_pages': server.listing_depth + 1, 'workers': 2, 'delay': 0.0, 'backend': 'http',
+            'base_url': server.base_url, 'incremental': incremental, 'distributed': True,
+        }).get()
+
+    def claim_key(self, link):
+        return SCRAPE_LINK_CLAIM_KEY.format(hashlib.sha1(link.encode('utf-8')).hexdigest())
+
+    def test_full_scrape(self):
+        with isolated_settings(), PurePortalFixtureServer(60, page_size=20) as server:
+            result = self.scrape(server)
+            self.assertEqual(result['status'], 'Completed')
+            self.assertTrue(result['distributed'])
+            self.assertEqual((result['listed'], result['count'], result['changed']), (60, 60, 60))
+            self.assertEqual((result['failed_urls'], result['batch_errors']), ([], []))
+            self.assertIn('indexing', result['stage_seconds'])
+            self.assertEqual(tfidf_index.get()['indexes']['tfidf'].num_docs, 60)
+
+    @override_settings(SCRAPE_KNOWN_RUN_STOP=20, SCRAPE_RECHECK_AFTER=0)
+    def test_incremental_listing_stops_once(self):
+        with isolated_settings(), PurePortalFixtureServer(60, page_size=20) as server:
+            self.scrape(server)
+            server.num_publications = 65
+            result = self.scrape(server, incremental=True)
+            # One listing pass up to the run of 20 known links, not one per shard
+            self.assertEqual(result['listed'], 40)
+            self.assertEqual((result['count'], result['changed'], result['not_modified']), (5, 5, 35))
+
+    def test_failed_batch_is_reported_and_scrape_finalized(self):
+        save = tasks.save_scrape_batch
+
+        def save_unless_first(events, incremental):
+            if any(kind == 'record' and rec['link'].endswith(f"{DETAIL_PREFIX}59") for kind, rec in events):
+                raise RuntimeError('database went away')
+            return save(events, incremental)
+
+        with isolated_settings(), PurePortalFixtureServer(60, page_size=20) as server, \
+                mock.patch.object(tasks, 'save_scrape_batch', side_effect=save_unless_first), \
+                self.assertLogs('core.tasks', 'ERROR'):
+            result = self.scrape(server)
+        self.assertEqual(result['status'], 'Completed with batch errors')
+        self.assertEqual(result['batch_errors'], ['RuntimeError: database went away'])
+        # The first batch holds the 25 newest publications
+        self.assertEqual((result['count'], len(result['failed_urls'])), (35, 25))
+        self.assertIn('indexing', result['stage_seconds'])
+        self.assertEqual(Publication.objects.count(), 35)
+
+    def test_redelivered_batch_takes_over_its_own_claims(self):
+        with isolated_settings(), PurePortalFixtureServer(3, page_size=20) as server:
+            host = server.base_url.split('/en/')[0]
+            items = [{'link': f"{host}{DETAIL_PREFIX}{n}", 'title': ''} for n in range(3)]
+            options = {'workers': 1, 'delay': 0.0, 'backend': 'http', 'incremental': False}
+            # Left behind by this task's first delivery, and by another task still running
+            cache.set(self.claim_key(items[0]['link']), 'batch-1')
+            cache.set(self.claim_key(items[1]['link']), 'batch-2')
+
+            saved = scrape_detail_batch.apply(args=(items, options), task_id='batch-1').get()
+            self.assertEqual((saved['count'], saved['claimed_elsewhere']), (2, 1))
+            self.assertIsNone(cache.get(self.claim_key(items[0]['link'])))
+            self.assertEqual(cache.get(self.claim_key(items[1]['link'])), 'batch-2')
@@ -0,0 +1,137 @@
+# core/tfidf.py
+import logging
+from array import array
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
+import scipy.sparse as sp
+
+from .engine import InvertedIndex, query_vector
+
+logger = logging.getLogger(__name__)
+
+# Fraction of the corpus that may change through deltas before every
+# document is re-weighted with fresh IDF values.
+IDF_REFRESH_RATIO = 0.1
+
+
+def smooth_idf(df: np.ndarray, n_docs: int) -> np.ndarray:
+    """Same smoothed IDF as sklearn's TfidfTransformer default."""
+    return np.log((1.0 + n_docs) / (1.0 + df)) + 1.0
+
+
+def weigh(counts: sp.csr_matrix, idf: np.ndarray) -> sp.csr_matrix:
+    """Raw term counts -> L2-normalised TF-IDF rows."""
+    weights = counts.astype(np.float64).multiply(idf[:counts.shape[1]]).tocsr()
+    norms = np.sqrt(np.asarray(weights.multiply(weights).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sp.csr_matrix(sp.diags(1.0 / norms) @ weights)
+
+
+class TermCounter:
+    """Builds a sparse (documents x terms) count matrix one document at a time.
+
+    Several counters may share one ``vocabulary``; their matrices then agree
+    on column ids (pad with ``resize`` to the final vocabulary size).
+    """
+
+    def __init__(self, vocabulary: Dict[str, int]):
+        self.vocabulary = vocabulary
+        # Typed arrays keep the running postings compact while streaming
+        self.indptr, self.indices, self.data = array('q', [0]), array('i'), array('i')
+
+    def add(self, tokens: List[str]):
+        row: Dict[int, int] = {}
+        for token in tokens:
+            col = self.vocabulary.setdefault(token, len(self.vocabulary))
+            row[col] = row.get(col, 0) + 1
+        self.indices.extend(row.keys())
+        self.data.extend(row.values())
+        self.indptr.append(len(self.indices))
+
+    def matrix(self) -> sp.csr_matrix:
+        return sp.csr_matrix(
+            (np.frombuffer(self.data, dtype=np.int32), np.frombuffer(self.indices, dtype=np.int32),
+             np.frombuffer(self.indptr, dtype=np.int64)),
+            shape=(len(self.indptr) - 1, len(self.vocabulary)),
+        )
+
+
+class TfidfModel:
+    """Term counts plus derived TF-IDF weights that can be updated in place.
+
+    Keeping raw counts lets changed publications be re-counted and swapped in
+    without re-tokenizing the rest of the corpus. IDF is refreshed lazily:
+    rows added by a delta are weighted with the current IDF, untouched rows
+    keep theirs until enough of the corpus has changed.
+    """
+
+    def __init__(self, vocabulary: Dict[str, int], counts: sp.csr_matrix, doc_ids: Sequence[int]):
+        self.vocabulary = vocabulary
+        self.counts = counts
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        self.changes_since_refresh = 0
+        self.refresh_idf()
+
+    @classmethod
+    def fit(cls, doc_ids: Sequence[int], token_lists: Iterable[List[str]]) -> 'TfidfModel':
+        """Fit on a stream of token lists.
+
+        ``doc_ids`` is only read once ``token_lists`` is exhausted, so a
+        generator may fill it while the corpus is being streamed.
+        """
+        vocabulary: Dict[str, int] = {}
+        counts = cls._count(vocabulary, token_lists)
+        return cls(vocabulary, counts, doc_ids)
+
+    @staticmethod
+    def _count(vocabulary: Dict[str, int], token_lists: Iterable[List[str]]) -> sp.csr_matrix:
+        """Count tokens per document, growing ``vocabulary`` with unseen terms."""
+        counter = TermCounter(vocabulary)
+        for tokens in token_lists:
+            counter.add(tokens)
+        return counter.matrix()
+
+    @property
+    def num_docs(self) -> int:
+        return len(self.doc_ids)
+
+    def document_frequency(self) -> np.ndarray:
+        return np.bincount(self.counts.indices, minlength=len(self.vocabulary))
+
+    def refresh_idf(self):
+        """Recompute IDF from the current counts and re-weight every document."""
+        self.idf = smooth_idf(self.document_frequency(), self.num_docs)
+        self.weights = weigh(self.counts, self.idf)
+        self.changes_since_refresh = 0
+
+    def apply_delta(self, upserts: Dict[int, List[str]], deletes: Iterable[int] = ()):
+        """Replace/insert the given documents' tokens and drop deleted ids."""
+        removed = set(deletes) | set(upserts)
+        keep = ~np.isin(self.doc_ids, list(removed)) if removed else np.ones(self.num_docs, dtype=bool)
+        new_counts = self._count(self.vocabulary, upserts.values())
+        n_terms = len(self.vocabulary)
+
+        # New terms widen the matrices; existing rows simply gain empty columns
+        counts = self.counts[keep]
+        counts.resize((counts.shape[0], n_terms))
+        weights = self.weights[keep]
+        weights.resize((weights.shape[0], n_terms))
+
+        self.counts = sp.vstack([counts, new_counts], format='csr')
+        self.doc_ids = np.concatenate([self.doc_ids[keep], np.asarray(list(upserts), dtype=np.int64)])
+        self.changes_since_refresh += len(removed)
+
+        if self.changes_since_refresh > IDF_REFRESH_RATIO * max(self.num_docs, 1):
+            logger.info(f"Refreshing IDF after {self.changes_since_refresh} changed documents")
+            self.refresh_idf()
+        else:
+            self.idf = smooth_idf(self.document_frequency(), self.num_docs)
+            self.weights = sp.vstack([weights, weigh(new_counts, self.idf)], format='csr')
+
+    def vectorize(self, tokens: List[str]) -> sp.csr_matrix:
+        return query_vector(self.vocabulary, self.idf, tokens)
+
+    def to_index(self) -> InvertedIndex:
+        return InvertedIndex.from_tfidf(self.weights, self.doc_ids, self.vocabulary, self.idf)
+
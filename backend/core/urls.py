@@ -1,8 +1,11 @@
 from django.urls import path
-from .views import SearchArticleView, StartScrapeView, ScrapeStatusView
+from .views import SearchArticleView, SearchCacheStatsView, StartScrapeView, ScrapeStatusView, MetricsView, SuggestView
 
 urlpatterns = [
     path('search/', SearchArticleView.as_view(), name='search'),
+    path('search/suggest/', SuggestView.as_view(), name='search-suggest'),
+    path('search/cache-stats/', SearchCacheStatsView.as_view(), name='search-cache-stats'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
     path('scrape/', StartScrapeView.as_view(), name='start-scrape'),
     path('scrape/status/<str:task_id>/', ScrapeStatusView.as_view(), name='scrape-status'),
 ]
@@ -1,58 +1,391 @@
 # core/utils.py
+import math
 import pickle
+import itertools
+import random
+import time
 import logging
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from nltk.stem import PorterStemmer
+import threading
+from uuid import uuid4
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+from django.conf import settings
 from django.core.cache import cache
-from .models import Publication
+import numpy as np
+from .models import Publication, Author
+from .tfidf import TfidfModel, TermCounter
+from .bm25 import Bm25Model, FIELDS
+from .engine import TFIDF, BM25
+from .suggest import SuggestBuilder
+from .authors import AuthorIndex
+from .segment import write_segment, current_generation
+from .analyzer import ensure_nltk_resources, get_analyzer
+from .metrics import record_index_build
 
 logger = logging.getLogger(__name__)
 
 TFIDF_CACHE_KEY = 'tfidf_data'
-DOCUMENTS_CACHE_KEY = 'documents_data'
+# Small generation counter bumped on every rebuild so worker processes can tell
+# whether their resident copy of the index is stale without fetching it.
+TFIDF_VERSION_KEY = 'tfidf_version'
+# Full count models per ranking, only read by the incremental updater (never by search workers)
+TFIDF_MODEL_CACHE_KEY = 'tfidf_model'
+# When the cached payload expires and how long a full build takes, used to
+# refresh the index shortly before expiry (probabilistic early expiration).
+# Kept without a timeout, so a payload that expired unnoticed still does.
+TFIDF_META_KEY = 'tfidf_meta'
+# Suggestion index of the last full build; deltas publish it again unchanged
+SUGGEST_CACHE_KEY = 'tfidf_suggest'
+# Author postings of the current generation, patched by deltas
+AUTHORS_CACHE_KEY = 'tfidf_authors'
+INDEX_CACHE_TIMEOUT = 24 * 60 * 60
 
-def ensure_nltk_resources():
-    """Download NLTK resources if not already present."""
+# Queue of changed publication ids: a monotonically increasing sequence number
+# plus one key per entry, so it works with any cache backend supporting incr().
+INDEX_QUEUE_SEQ_KEY = 'tfidf_queue_seq'
+INDEX_QUEUE_DONE_KEY = 'tfidf_queue_done'
+INDEX_QUEUE_ITEM_KEY = 'tfidf_queue:{}'
+# Entries are numbered (incr) before their key is written, so a missing key
+# may still be in flight. The first missing one is recorded here; once it has
+# been missing for INDEX_QUEUE_GAP_TIMEOUT seconds, entries numbered before
+# it was seen are treated as lost (expired, or their writer died).
+INDEX_QUEUE_GAP_KEY = 'tfidf_queue_gap'
+INDEX_QUEUE_GAP_TIMEOUT = 60
+INDEX_UPDATE_SCHEDULED_KEY = 'tfidf_update_scheduled'
+# Held by the single process allowed to run a full rebuild
+INDEX_BUILD_LOCK_KEY = 'tfidf_build_lock'
+INDEX_REBUILD_SCHEDULED_KEY = 'tfidf_rebuild_scheduled'
+
+_signal_state = threading.local()
+
+def _cached_object(key: str):
+    raw = cache.get(key)
+    return pickle.loads(raw) if raw else None
+
+def publish_index(models: Dict[str, object], build_seconds: Optional[float] = None, suggest=None, authors=None) -> int:
+    """Store a new index generation (one index per ranking model) in the cache and return its id.
+
+    Without ``suggest`` or ``authors`` the ones last published are published again.
+    """
+    generation = time.time_ns()
+    if build_seconds is None:
+        # Deltas keep the cost of the last full build for refresh scheduling
+        build_seconds = (cache.get(TFIDF_META_KEY) or {}).get('build_seconds', 0.0)
+    if suggest is None:
+        suggest = _cached_object(SUGGEST_CACHE_KEY)
+    if authors is None:
+        authors = _cached_object(AUTHORS_CACHE_KEY)
+    indexes = {ranking: model.to_index() for ranking, model in models.items()}
+    if settings.SEARCH_INDEX_DIR:
+        # Workers on this host memory-map the segment instead of unpickling
+        try:
+            write_segment(indexes, settings.SEARCH_INDEX_DIR, generation, keep=settings.SEARCH_INDEX_KEEP_SEGMENTS,
+                          suggest=suggest, authors=authors)
+        except OSError as e:
+            logger.error(f"Failed to write TF-IDF index segment: {e}")
+    try:
+        # Only the postings are shipped to search workers; they score
+        # queries without touching the full matrix.
+        cache.set(TFIDF_CACHE_KEY, pickle.dumps({
+            'indexes': indexes,
+            'suggest': suggest,
+            'authors': authors,
+            'generation': generation
+        }), timeout=INDEX_CACHE_TIMEOUT)
+        cache.set(TFIDF_MODEL_CACHE_KEY, pickle.dumps(models), timeout=INDEX_CACHE_TIMEOUT)
+        if suggest is not None:
+            cache.set(SUGGEST_CACHE_KEY, pickle.dumps(suggest), timeout=INDEX_CACHE_TIMEOUT)
+        if authors is not None:
+            cache.set(AUTHORS_CACHE_KEY, pickle.dumps(authors), timeout=INDEX_CACHE_TIMEOUT)
+        cache.set(TFIDF_META_KEY, {
+            'generation': generation,
+            'expires_at': time.time() + INDEX_CACHE_TIMEOUT,
+            'build_seconds': build_seconds,
+        }, timeout=None)
+        # Publish the new generation only once the payload is in place
+        cache.set(TFIDF_VERSION_KEY, generation, timeout=None)
+    except Exception as e:
+        logger.error(f"Failed to cache TF-IDF data: {e}")
+        raise
+    return generation
+
+def build_tfidf_and_index(trigger: str = 'manual') -> Dict[str, object]:
+    """Build every ranking model from the database and publish them; returns ranking -> model.
+
+    ``trigger`` (one of metrics.BUILD_TRIGGERS) labels the build in the metrics.
+    """
+    start_time = time.time()
+    analyzer = get_analyzer()
+
+    # Everything queued so far is covered by the rows read below
+    queued_upto = cache.get(INDEX_QUEUE_SEQ_KEY, 0)
+
+    # Stream only the columns we index; raw text never outlives its batch
+    total = Publication.objects.count()
+    rows = Publication.objects.values_list('id', 'abstract', 'title').iterator(
+        chunk_size=settings.SEARCH_INDEX_BUILD_CHUNK_SIZE
+    )
+    doc_ids: List[int] = []
+    has_abstract: List[bool] = []
+    suggest = SuggestBuilder(analyzer)
+
+    def texts():
+        # Title and abstract are analyzed separately for BM25F
+        for pub_id, abstract, title in rows:
+            doc_ids.append(pub_id)
+            has_abstract.append(bool(abstract))
+            suggest.add_title(title)
+            yield title or ''
+            yield abstract or ''
+
+    token_lists = iter(analyzer.analyze_iter(texts(), processes=settings.SEARCH_INDEX_BUILD_PROCESSES, total=2 * total))
+    # BM25 counts each field in the same pass that feeds the TF-IDF model
+    bm25_vocabulary: Dict[str, int] = {}
+    field_counters = [TermCounter(bm25_vocabulary) for _ in FIELDS]
+
+    def tfidf_tokens():
+        for doc, title_tokens in enumerate(token_lists):
+            abstract_tokens = next(token_lists)
+            field_counters[0].add(title_tokens)
+            field_counters[1].add(abstract_tokens)
+            # The TF-IDF document is the abstract, or the title when there is none
+            yield abstract_tokens if has_abstract[doc] else title_tokens
+
+    tfidf = TfidfModel.fit(doc_ids, tfidf_tokens())
+    bm25 = Bm25Model(
+        bm25_vocabulary, {name: c.matrix() for name, c in zip(FIELDS, field_counters)}, doc_ids,
+        settings.SEARCH_BM25_K1, settings.SEARCH_BM25_FIELDS,
+    )
+    models = {TFIDF: tfidf, BM25: bm25}
+
+    authors = build_author_index()
+    # Type-ahead suggestions: titles, author names and frequent terms
+    suggest.add_authors(zip(authors.names, np.diff(authors.author_ptr).tolist()))
+    suggest.add_terms(tfidf.vocabulary, tfidf.document_frequency(), settings.SEARCH_SUGGEST_MIN_TERM_DF)
+    suggest_index = suggest.build(
+        settings.SEARCH_SUGGEST_TOP_PREFIX_LENGTH, settings.SEARCH_SUGGEST_MAX_LIMIT,
+        settings.SEARCH_SUGGEST_TOP_MIN_RANGE,
+    )
+
+    if tfidf.num_docs:
+        publish_index(models, build_seconds=time.time() - start_time, suggest=suggest_index, authors=authors)
+        record_index_build(trigger, time.time() - start_time)
+        if queued_upto > cache.get(INDEX_QUEUE_DONE_KEY, 0):
+            cache.set(INDEX_QUEUE_DONE_KEY, queued_upto, timeout=None)
+
+    return models
+
+def author_links(publication_ids: Optional[Iterable[int]] = None) -> np.ndarray:
+    """(author id, publication id) rows of the authorship table, optionally for some publications only."""
+    links = Author.publications.through.objects.all()
+    if publication_ids is not None:
+        links = links.filter(publication_id__in=publication_ids)
+    rows = links.values_list('author_id', 'publication_id').iterator(chunk_size=settings.SEARCH_INDEX_BUILD_CHUNK_SIZE)
+    return np.fromiter(itertools.chain.from_iterable(rows), dtype=np.int64).reshape(-1, 2)
+
+def build_author_index() -> AuthorIndex:
+    # Names first: links to authors created after this read are dropped rather than left nameless
+    names = dict(Author.objects.values_list('id', 'name').iterator(chunk_size=settings.SEARCH_INDEX_BUILD_CHUNK_SIZE))
+    return AuthorIndex.build(names, author_links())
+
+@contextmanager
+def index_build_lock(timeout: Optional[int] = None, wait: float = 0):
+    """Cross-process lock around full rebuilds; yields whether it was acquired.
+
+    cache.add is atomic on Redis, so only one process wins. The timeout
+    releases the lock if its holder dies mid-build. With ``wait`` the caller
+    polls for up to that many seconds while another build is in flight.
+    """
+    token = uuid4().hex
+    timeout = timeout or settings.SEARCH_INDEX_BUILD_LOCK_TIMEOUT
+    deadline = time.monotonic() + wait
+    acquired = cache.add(INDEX_BUILD_LOCK_KEY, token, timeout=timeout)
+    while not acquired and time.monotonic() < deadline:
+        time.sleep(0.5)
+        acquired = cache.add(INDEX_BUILD_LOCK_KEY, token, timeout=timeout)
+    try:
+        yield acquired
+    finally:
+        if acquired and cache.get(INDEX_BUILD_LOCK_KEY) == token:
+            cache.delete(INDEX_BUILD_LOCK_KEY)
+
+def index_available() -> bool:
+    """Whether some generation has been published to the cache or to disk."""
+    if cache.get(TFIDF_VERSION_KEY) is not None:
+        return True
+    return bool(settings.SEARCH_INDEX_DIR) and current_generation(settings.SEARCH_INDEX_DIR) is not None
+
+def wait_for_index(timeout: float) -> bool:
+    """Poll until some index generation is available or ``timeout`` seconds pass."""
+    deadline = time.monotonic() + timeout
+    while not index_available():
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.5)
+    return True
+
+def rebuild_index_single_flight(wait: float = 0, trigger: str = 'search') -> bool:
+    """Run a full rebuild unless another process is already running one.
+
+    Returns True if this call performed the rebuild.
+    """
+    with index_build_lock(wait=wait) as acquired:
+        if not acquired:
+            logger.info("TF-IDF rebuild already in progress elsewhere, skipping")
+            return False
+        build_tfidf_and_index(trigger)
+        return True
+
+def request_index_rebuild(reason: str):
+    """Ask a Celery worker for a background rebuild; repeated requests coalesce."""
+    if not cache.add(INDEX_REBUILD_SCHEDULED_KEY, True, timeout=settings.SEARCH_INDEX_BUILD_LOCK_TIMEOUT):
+        return
+    logger.info(f"Requesting background TF-IDF rebuild: {reason}")
+    from .tasks import rebuild_tfidf_index
+    try:
+        rebuild_tfidf_index.delay()
+    except Exception as e:
+        cache.delete(INDEX_REBUILD_SCHEDULED_KEY)
+        logger.error(f"Failed to schedule TF-IDF rebuild: {e}")
+
+def should_refresh_early(meta: Optional[Dict], beta: float = 1.0) -> bool:
+    """XFetch-style probabilistic early expiration of the cached index.
+
+    The closer the payload is to expiring, and the longer a build takes, the
+    more likely a given request is to trigger the refresh, so exactly one of
+    many concurrent requests tends to do it ahead of the deadline.
+    """
+    if not meta:
+        return False
+    gap = meta.get('build_seconds', 0.0) * beta * -math.log(1.0 - random.random())
+    return time.time() + gap >= meta['expires_at']
+
+def warm_up_index():
+    """Build the index at startup unless one exists or another process is building it."""
+    try:
+        if index_available():
+            return
+        logger.info("Initializing TF-IDF index at startup")
+        if rebuild_index_single_flight(trigger='warmup'):
+            logger.info("TF-IDF index initialized successfully")
+    except Exception as e:
+        logger.error(f"Failed to initialize TF-IDF index at startup: {e}")
+
+# ---------------------- Incremental Updates ----------------------
+
+@contextmanager
+def suppress_index_updates():
+    """Ignore Publication signals in this thread, e.g. while a scrape persists
+    many rows that are followed by a single full rebuild."""
+    previous = getattr(_signal_state, 'suppressed', False)
+    _signal_state.suppressed = True
     try:
-        nltk.data.find('corpora/stopwords')
-        nltk.data.find('tokenizers/punkt_tab')
-    except LookupError:
-        logger.info("Downloading NLTK stopwords and punkt")
-        nltk.download('stopwords', quiet=True)
-        nltk.download('punkt', quiet=True)
-
-def build_tfidf_and_index():
-    ensure_nltk_resources()
-
-    stemmer = PorterStemmer()
-    stop_words = set(stopwords.words('english'))
-
-    def pre_process(text):
-        tokens = word_tokenize(text.lower())
-        return [stemmer.stem(token) for token in tokens if token.isalnum() and token not in stop_words]
-
-    publications = Publication.objects.all()
-    documents = {pub.id: pub.abstract or pub.title for pub in publications}
-
-    corpus = [' '.join(pre_process(text)) for text in documents.values()]
-    
-    from sklearn.feature_extraction.text import TfidfVectorizer
-    tfidf_matrix = None
-    vectorizer = TfidfVectorizer()
-    
-    if corpus:
-        tfidf_matrix = vectorizer.fit_transform(corpus)
+        yield
+    finally:
+        _signal_state.suppressed = previous
+
+def index_updates_suppressed() -> bool:
+    return getattr(_signal_state, 'suppressed', False)
+
+def queue_index_update(doc_id: int):
+    cache.add(INDEX_QUEUE_SEQ_KEY, 0, timeout=None)
+    seq = cache.incr(INDEX_QUEUE_SEQ_KEY)
+    cache.set(INDEX_QUEUE_ITEM_KEY.format(seq), doc_id, timeout=INDEX_CACHE_TIMEOUT)
+
+def schedule_index_update(doc_id: int):
+    """Queue a changed publication and make sure one debounced update job is pending."""
+    schedule_index_updates([doc_id])
+
+def schedule_index_updates(doc_ids: Iterable[int]):
+    for doc_id in doc_ids:
+        queue_index_update(doc_id)
+    debounce = settings.SEARCH_INDEX_UPDATE_DEBOUNCE
+    # Only the first change inside the debounce window schedules a job;
+    # later ones are picked up by that same job.
+    if cache.add(INDEX_UPDATE_SCHEDULED_KEY, True, timeout=debounce + 60):
+        from .tasks import update_tfidf_index
         try:
-            cache.set(TFIDF_CACHE_KEY, pickle.dumps({
-                'vectorizer': vectorizer,
-                'tfidf_matrix': tfidf_matrix,
-                'doc_ids': list(documents.keys())
-            }), timeout=24*60*60)
-            cache.set(DOCUMENTS_CACHE_KEY, documents, timeout=24*60*60)
+            update_tfidf_index.apply_async(countdown=debounce)
         except Exception as e:
-            logger.error(f"Failed to cache TF-IDF data: {e}")
-            raise
+            cache.delete(INDEX_UPDATE_SCHEDULED_KEY)
+            logger.error(f"Failed to schedule TF-IDF index update: {e}")
+
+def pending_index_updates():
+    """Return (queue keys to retire, sequence number they reach, set of queued publication ids).
+
+    Keys are only retired up to the entry before the first missing key that
+    may still be in flight; publication ids queued after it are returned too
+    (re-applying them later is harmless) but stay queued.
+    """
+    done = cache.get(INDEX_QUEUE_DONE_KEY, 0)
+    last = cache.get(INDEX_QUEUE_SEQ_KEY, 0)
+    keys = [INDEX_QUEUE_ITEM_KEY.format(seq) for seq in range(done + 1, last + 1)]
+    if not keys:
+        return keys, done, set()
+    values = cache.get_many(keys)
+
+    gap = cache.get(INDEX_QUEUE_GAP_KEY)
+    lost_upto = gap['last'] if gap and time.time() - gap['since'] >= INDEX_QUEUE_GAP_TIMEOUT else 0
+    upto = last
+    for seq, key in enumerate(keys, done + 1):
+        if key not in values and seq > lost_upto:
+            upto = seq - 1
+            if not gap or gap['seq'] != seq:
+                cache.set(INDEX_QUEUE_GAP_KEY, {'seq': seq, 'last': last, 'since': time.time()}, timeout=None)
+            break
+    return keys[:upto - done], upto, set(values.values())
+
+def apply_index_updates() -> Optional[int]:
+    """Apply queued publication changes to the current index as a delta.
+
+    Reading the models, patching and publishing happen under the build lock,
+    so a delta never overwrites a newer full build. Returns the number of
+    documents applied, or None when the queue could not be drained (another
+    process holds the lock); the queue is then kept for the next run.
+    """
+    start_time = time.time()
+    keys, last, doc_ids = pending_index_updates()
+    if not doc_ids:
+        if keys:
+            # Entries lost before being applied; nothing left to do for them
+            cache.set(INDEX_QUEUE_DONE_KEY, last, timeout=None)
+        return 0
+
+    with index_build_lock() as acquired:
+        if not acquired:
+            logger.info("TF-IDF index build in progress, applying queued updates later")
+            return None
+        raw_model = cache.get(TFIDF_MODEL_CACHE_KEY)
+        models = pickle.loads(raw_model) if raw_model is not None else None
+        authors = _cached_object(AUTHORS_CACHE_KEY)
+        if isinstance(models, dict) and set(models) == {TFIDF, BM25} and authors is not None:
+            upserts, deletes = _apply_delta(models, authors, doc_ids)
+            cache.set(INDEX_QUEUE_DONE_KEY, last, timeout=None)
+            cache.delete_many(keys)
+            record_index_build('delta', time.time() - start_time)
+            logger.info(f"Applied incremental TF-IDF update: {len(upserts)} upserted, {len(deletes)} deleted")
+            return len(doc_ids)
+
+    # The full build marks everything queued so far as done
+    logger.info("No current TF-IDF model to update incrementally, running full rebuild")
+    if not rebuild_index_single_flight(trigger='delta_fallback'):
+        return None
+    return len(doc_ids)
+
+def _apply_delta(models: Dict[str, object], authors: AuthorIndex, doc_ids):
+    """Patch ``models`` and ``authors`` with the current rows of ``doc_ids`` and publish them."""
+    analyzer = get_analyzer()
+    upserts: Dict[int, List[str]] = {}
+    field_upserts: Dict[int, Tuple[List[str], List[str]]] = {}
+    for pub_id, abstract, title in Publication.objects.filter(id__in=doc_ids).values_list('id', 'abstract', 'title'):
+        title_tokens, abstract_tokens = analyzer.analyze(title or ''), analyzer.analyze(abstract or '')
+        field_upserts[pub_id] = (title_tokens, abstract_tokens)
+        upserts[pub_id] = abstract_tokens if abstract else title_tokens
+    deletes = doc_ids - upserts.keys()
 
-    return documents, vectorizer, tfidf_matrix
+    models[TFIDF].apply_delta(upserts, deletes)
+    models[BM25].apply_delta(field_upserts, deletes)
+    links = author_links(doc_ids)
+    names = dict(Author.objects.filter(id__in=set(links[:, 0].tolist())).values_list('id', 'name'))
+    publish_index(models, authors=authors.apply_delta(doc_ids, names, links))
+    return upserts, deletes
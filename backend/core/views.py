@@ -1,20 +1,26 @@
-from django.core.cache import cache
+import time
+import numpy as np
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from .models import Publication, Author
-from .utils import build_tfidf_and_index
+from .search_index import tfidf_index
+from .analyzer import get_analyzer
+from .engine import BM25, TFIDF
+from .result_cache import result_cache
+from .progress import PROGRESS
+from .metrics import phase_timer, render_metrics, suggest_phase_seconds
 from rest_framework import status
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
-from nltk.stem import PorterStemmer
-from sklearn.metrics.pairwise import cosine_similarity
-import pickle
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.db.models import Prefetch
 from .tasks import run_full_scrape
 from celery.result import AsyncResult
 
 class StartScrapeView(APIView):
     def get(self, request, *args, **kwargs):
-        task = run_full_scrape.delay(max_pages=50, workers=12, delay=0.35)  # start Celery task
+        # ?mode=full re-fetches every page and rebuilds the index from scratch
+        incremental = request.GET.get('mode') != 'full'
+        task = run_full_scrape.delay(max_pages=50, workers=12, delay=0.35, incremental=incremental)  # start Celery task
         return Response({"task_id": task.id}, status=status.HTTP_202_ACCEPTED)
 
 class ScrapeStatusView(APIView):
@@ -23,58 +29,234 @@ class ScrapeStatusView(APIView):
         return Response({
             'task_id': task.id,
             'status': task.status,
+            # Stage, counters, throughput and ETA published by run_full_scrape while it runs
+            'progress': task.info if task.status == PROGRESS else None,
             'result': task.result if task.status == 'SUCCESS' else None
         })
-class SearchArticleView(APIView):
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.stemmer = PorterStemmer()
-        self.stop_words = set(stopwords.words('english'))
+class SearchCacheStatsView(APIView):
+    def get(self, request):
+        return Response(result_cache.stats())
+
+class MetricsView(APIView):
+    """Prometheus scrape endpoint; phase histograms and gauges are per process, like cache-stats."""
+    def get(self, request):
+        if not settings.SEARCH_METRICS_ENABLED:
+            raise Http404
+        return HttpResponse(
+            render_metrics(tfidf_index.loaded(), result_cache.stats()),
+            content_type='text/plain; version=0.0.4; charset=utf-8',
+        )
+
+# Fields a search may return (?fields=doc_id,title,score,snippet); the default is every field but snippet
+SEARCH_FIELDS = ('doc_id', 'score', 'title', 'link', 'published_date', 'abstract', 'authors', 'snippet')
+DEFAULT_SEARCH_FIELDS = ('doc_id', 'score', 'title', 'link', 'published_date', 'abstract', 'authors')
+# Publication columns needed to render each field
+FIELD_COLUMNS = {'title': ('title',), 'link': ('link',), 'published_date': ('published_date',),
+                 'abstract': ('abstract',), 'snippet': ('abstract', 'title')}
+
+def int_param(request, name, default, minimum, maximum):
+    """Integer query parameter clamped to [minimum, maximum]; raises ValueError if not a number."""
+    raw = request.GET.get(name)
+    if raw in (None, ''):
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        raise ValueError(f"'{name}' must be an integer")
+    return min(max(value, minimum), maximum)
 
-    def pre_process(self, text):
-        tokens = word_tokenize(text.lower())
-        return [self.stemmer.stem(token) for token in tokens if token.isalnum() and token not in self.stop_words]
+def int_list_param(request, name):
+    """Comma-separated integers, e.g. ?author_id=3,17; raises ValueError otherwise."""
+    raw = request.GET.get(name, '')
+    try:
+        return sorted({int(value) for value in raw.split(',') if value.strip()})
+    except ValueError:
+        raise ValueError(f"'{name}' must be a comma-separated list of integers")
 
+# Facets a search may count over its matches (?facets=authors)
+SEARCH_FACETS = ('authors',)
+# Ranking models a search may ask for (?ranking=tfidf|bm25)
+SEARCH_RANKINGS = (TFIDF, BM25)
+
+class SearchArticleView(APIView):
     def get(self, request):
         query = request.GET.get('query', '').strip()
+        try:
+            limit = int_param(request, 'limit', settings.SEARCH_RESULTS_LIMIT, 1, settings.SEARCH_MAX_RESULTS_LIMIT)
+            offset = int_param(request, 'offset', 0, 0, settings.SEARCH_MAX_RESULTS_OFFSET)
+            # ?author= matches names containing every given word, ?author_id= exact authors; both must hold
+            author = request.GET.get('author', '').strip()
+            author_ids = int_list_param(request, 'author_id')
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        fields = request.GET.get('fields')
+        fields = tuple(f.strip() for f in fields.split(',') if f.strip()) if fields else DEFAULT_SEARCH_FIELDS
+        unknown = [f for f in fields if f not in SEARCH_FIELDS]
+        if unknown:
+            return Response({'error': f"Unknown fields: {', '.join(unknown)}"}, status=status.HTTP_400_BAD_REQUEST)
+        facets = request.GET.get('facets')
+        facets = tuple(sorted({f.strip() for f in facets.split(',') if f.strip()})) if facets else ()
+        unknown = [f for f in facets if f not in SEARCH_FACETS]
+        if unknown:
+            return Response({'error': f"Unknown facets: {', '.join(unknown)}"}, status=status.HTTP_400_BAD_REQUEST)
+        ranking = request.GET.get('ranking', '').strip() or settings.SEARCH_RANKING
+        if ranking not in SEARCH_RANKINGS:
+            return Response({'error': f"Unknown ranking: {ranking}"}, status=status.HTTP_400_BAD_REQUEST)
+        by_author = bool(author or author_ids)
+
+        page = {'offset': offset, 'limit': limit, 'next_offset': None}
+        if facets:
+            page['facets'] = {facet: [] for facet in facets}
         if not query:
-            return Response({'results': []})
-
-        # Lazy cache rebuild
-        tfidf_data = cache.get('tfidf_data')
-        documents = cache.get('documents_data')
-
-        if not tfidf_data or not documents:
-            documents, vectorizer, tfidf_matrix = build_tfidf_and_index()
-        else:
-            tfidf_data = pickle.loads(tfidf_data)
-            vectorizer = tfidf_data['vectorizer']
-            tfidf_matrix = tfidf_data['tfidf_matrix']
-            doc_ids = tfidf_data['doc_ids']
-
-        if not documents or tfidf_matrix is None:
-            return Response({'results': []})
-
-        # Query vector
-        processed_query = ' '.join(self.pre_process(query))
-        query_vector = vectorizer.transform([processed_query])
-        similarities = cosine_similarity(query_vector, tfidf_matrix).flatten()
-
-        # Top results
-        ranked_docs = sorted(zip(doc_ids, similarities), key=lambda x: x[1], reverse=True)[:50]
+            return Response({'results': [], **page})
+
+        # Phase timings feed the metrics histograms and, on request, a Server-Timing header
+        profile = settings.SEARCH_PROFILE_HEADER_ENABLED and request.headers.get('X-Search-Profile') == '1'
+        timer = phase_timer(settings.SEARCH_METRICS_ENABLED or profile)
+
+        # Resident index, reloaded only when a new generation is published
+        with timer.phase('index'):
+            tfidf_data = tfidf_index.get()
+        if not tfidf_data or tfidf_data.get('index') is None:
+            return Response({'results': [], **page})
+
+        start_time = time.perf_counter()
+        if ranking not in tfidf_data['indexes']:
+            # Index published before this ranking existed
+            ranking = settings.SEARCH_RANKING
+        index = tfidf_data['indexes'][ranking]
+        generation = tfidf_data['generation']
+        author_index = tfidf_data.get('authors')
+        if (by_author or facets) and author_index is None:
+            # Index published before author postings existed
+            return Response({'error': "Author filters and facets are unavailable until the index is rebuilt"},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        with timer.phase('analyze'):
+            tokens = get_analyzer().analyze(query)
+
+        # Repeated queries are answered from the result cache for this generation
+        cache_key = result_cache.make_key(
+            generation, tokens, ranking=ranking, offset=offset, limit=limit, fields=','.join(fields),
+            author=author.lower(), author_id=','.join(map(str, author_ids)), facets=','.join(facets),
+        )
+        with timer.phase('result_cache'):
+            cached, tier = result_cache.get(cache_key, generation)
+        if cached is None:
+            with timer.phase('vectorize'):
+                query_vector = index.vectorize(tokens)
+            # Only the requested page is ranked and loaded; one extra hit tells
+            # whether there is a next page
+            if by_author or facets:
+                # Author filters score only the authors' publications; facets
+                # need every match, so neither can stop early
+                rows = None
+                if by_author:
+                    with timer.phase('filter'):
+                        rows = index.rows_of(self.author_documents(author_index, author, author_ids))
+                with timer.phase('score'):
+                    rows, scores = index.match(query_vector, rows)
+                    ranked_docs = index.rank(rows, scores, k=limit + 1, offset=offset)
+                if facets:
+                    with timer.phase('facets'):
+                        cached_facets = {
+                            'authors': author_index.facets(index.doc_ids[rows], settings.SEARCH_AUTHOR_FACET_SIZE),
+                        }
+            else:
+                with timer.phase('score'):
+                    ranked_docs = index.search(
+                        query_vector,
+                        k=limit + 1,
+                        early_termination=settings.SEARCH_EARLY_TERMINATION,
+                        offset=offset,
+                    )
+            has_more = len(ranked_docs) > limit and ranked_docs[limit][1] > 0
+            with timer.phase('hydrate'):
+                cached = {'results': self.hydrate(ranked_docs[:limit], fields, tokens), 'has_more': has_more}
+            if facets:
+                cached['facets'] = cached_facets
+            with timer.phase('result_cache'):
+                result_cache.set(cache_key, generation, cached)
+        result_cache.record(tier, time.perf_counter() - start_time)
+
+        if cached['has_more']:
+            page['next_offset'] = offset + limit
+        if facets:
+            page['facets'] = cached['facets']
+        response = Response({'results': cached['results'], **page})
+        timer.finish(record=settings.SEARCH_METRICS_ENABLED)
+        if profile:
+            timer.note('cache', tier)
+            timer.note('ranking', ranking)
+            response['Server-Timing'] = timer.server_timing()
+        return response
+
+    @staticmethod
+    def author_documents(author_index, author: str, author_ids):
+        """Sorted ids of the publications by authors matching both ``author`` (name words) and ``author_ids``."""
+        positions = None
+        if author:
+            positions = author_index.match_name(author)
+        if author_ids:
+            by_id = author_index.match_ids(author_ids)
+            positions = by_id if positions is None else np.intersect1d(positions, by_id)
+        return author_index.documents(positions)
+
+    def hydrate(self, ranked_docs, fields=DEFAULT_SEARCH_FIELDS, tokens=()):
+        """Load the ranked publications (and authors, if requested) in at most two queries, keeping rank order.
+
+        Only the columns behind ``fields`` are selected.
+        """
+        doc_ids = [doc_id for doc_id, score in ranked_docs if score > 0]
+        columns = {column for f in fields for column in FIELD_COLUMNS.get(f, ())}
+        publications = Publication.objects.only('id', *columns)
+        if 'authors' in fields:
+            publications = publications.prefetch_related(
+                Prefetch('authors', queryset=Author.objects.only('id', 'name', 'profile_url'))
+            )
+        publications = publications.in_bulk(doc_ids) if doc_ids else {}
+
+        analyzer = get_analyzer()
         results = []
         for doc_id, score in ranked_docs:
-            if score > 0:
-                pub = Publication.objects.get(id=doc_id)
-                authors = list(pub.authors.values('name', 'profile_url'))
-                results.append({
-                    'doc_id': doc_id,
-                    'score': score,
-                    'title': pub.title,
-                    'link': pub.link,
-                    'published_date': pub.published_date,
-                    'abstract': pub.abstract,
-                    'authors': authors
-                })
-
-        return Response({'results': results})
+            pub = publications.get(doc_id)
+            # Skip hits deleted since the index was built
+            if score <= 0 or pub is None:
+                continue
+            values = {'doc_id': doc_id, 'score': score}
+            for field in fields:
+                if field == 'authors':
+                    values[field] = [{'name': a.name, 'profile_url': a.profile_url} for a in pub.authors.all()]
+                elif field == 'snippet':
+                    values[field] = analyzer.snippet(pub.abstract or pub.title, tokens, settings.SEARCH_SNIPPET_LENGTH)
+                elif field not in values:
+                    values[field] = getattr(pub, field)
+            results.append({field: values[field] for field in fields})
+        return results
+
+class SuggestView(APIView):
+    """Type-ahead completions of ?q= from the resident suggestion index; never touches the database."""
+    def get(self, request):
+        query = request.GET.get('q', '')
+        try:
+            limit = int_param(request, 'limit', settings.SEARCH_SUGGEST_LIMIT, 1, settings.SEARCH_SUGGEST_MAX_LIMIT)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if not query.strip():
+            return Response({'query': query, 'suggestions': []})
+
+        profile = settings.SEARCH_PROFILE_HEADER_ENABLED and request.headers.get('X-Search-Profile') == '1'
+        timer = phase_timer(settings.SEARCH_METRICS_ENABLED or profile, suggest_phase_seconds)
+        with timer.phase('index'):
+            tfidf_data = tfidf_index.get()
+        suggest = tfidf_data.get('suggest') if tfidf_data else None
+        if suggest is None:
+            # No index yet, or one published before suggestions existed
+            return Response({'query': query, 'suggestions': []})
+        with timer.phase('suggest'):
+            suggestions = suggest.suggest(query, limit)
+
+        response = Response({'query': query, 'suggestions': suggestions})
+        timer.finish(record=settings.SEARCH_METRICS_ENABLED)
+        if profile:
+            response['Server-Timing'] = timer.server_timing()
+        return response
@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
 import { FontAwesomeIcon } from '@fortawesome/react-fontawesome';
 import { faSearch } from '@fortawesome/free-solid-svg-icons';
 import ResultsPage from './ResultsPage';
@@ -12,6 +12,26 @@ const ScholarSearch = () => {
   const [error, setError] = useState(null);
   const [taskId, setTaskId] = useState(null);
   const [status, setStatus] = useState('');
+  const [suggestions, setSuggestions] = useState([]);
+
+  // Type-ahead: ask the suggest endpoint once typing pauses
+  useEffect(() => {
+    if (isSearching || !query.trim()) {
+      setSuggestions([]);
+      return;
+    }
+    const timer = setTimeout(async () => {
+      try {
+        const res = await axios.get(
+          `${import.meta.env.VITE_API_URL}/search/suggest/?q=${encodeURIComponent(query)}`
+        );
+        setSuggestions(res.data.suggestions);
+      } catch (err) {
+        setSuggestions([]);
+      }
+    }, 150);
+    return () => clearTimeout(timer);
+  }, [query, isSearching]);
 
   const handleSearch = async (e) => {
     e.preventDefault();
@@ -22,7 +42,7 @@ const ScholarSearch = () => {
         const response = await axios.get(
           `${import.meta.env.VITE_API_URL}/search/?query=${encodeURIComponent(query)}`
         );
-        setResults(response.data);
+        setResults(response.data.results);
       } catch (err) {
         setError('Failed to fetch results. Please try again.');
         setResults([]);
@@ -80,6 +100,7 @@ const ScholarSearch = () => {
     <LandingPage
       query={query}
       setQuery={setQuery}
+      suggestions={suggestions}
       onSearch={handleSearch}
       startScrape={startScrape}
       scrapeStatus={status}
@@ -88,7 +109,7 @@ const ScholarSearch = () => {
 };
 
 // --- Landing Page Component ---
-const LandingPage = ({ query, setQuery, onSearch, startScrape, scrapeStatus }) => (
+const LandingPage = ({ query, setQuery, suggestions, onSearch, startScrape, scrapeStatus }) => (
   <div className="flex flex-col min-h-screen bg-white text-gray-800">
     <header className="flex justify-end items-center p-4 text-sm text-gray-600">
       <nav className="flex items-center space-x-4">
@@ -123,7 +144,14 @@ const LandingPage = ({ query, setQuery, onSearch, startScrape, scrapeStatus }) =
           placeholder="Search"
           value={query}
           onChange={(e) => setQuery(e.target.value)}
+          list="search-suggestions"
+          autoComplete="off"
         />
+        <datalist id="search-suggestions">
+          {suggestions.map((s) => (
+            <option key={`${s.kind}:${s.text}`} value={s.text} />
+          ))}
+        </datalist>
         <button
           type="submit"
           className="flex items-center justify-center p-4 bg-sky-500 rounded-r-full text-white hover:bg-sky-600 transition-colors"